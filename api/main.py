@@ -1,12 +1,47 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Query, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import secrets
+import time
+import uuid
 import uvicorn
 import os
 
-from api.models.sepsis import SepsisInput, SepsisResponse, HealthCheck, ErrorResponse
-from api.services.sepsis_service import sepsis_service
+from config import (
+    MODEL_LOAD_MODE, EVENT_HEARTBEAT_SECONDS, MAX_BATCH_SIZE, ADMIN_TOKEN, PROFILE_MAX_SECONDS,
+    RATE_LIMIT_ENABLED
+)
+from api.models.sepsis import (
+    SepsisInput, SepsisResponse, SepsisBatchInput, SepsisBatchResponse, SepsisExplanationResponse,
+    HealthCheck, ErrorResponse, TrajectoryResponse, WardTopResponse, OutcomeBatch, OutcomeResponse
+)
+from api.services.sepsis_service import sepsis_service, MODEL_STATUS_READY, TENANT_HEADER
+from api.services.trajectory_store import trajectory_store
+from api.services.ward_index import ward_index, WARDS
+from api.services.event_bus import risk_event_bus, format_sse
+from api.services.tracing import tracer
+from api.services.drift_monitor import drift_monitor
+from api.services.outcome_tracker import outcome_tracker
+from api.services.profiler import profiler, to_collapsed, to_speedscope
+from api.services.log import setup_logging, bind_context, reset_context, get_logging_stats
+from api.services.columnar import (
+    request_format, response_format, decode_batch, encode_batch, UnsupportedFormat, PayloadError,
+    MEDIA_TYPES, FORMAT_JSON, FORMAT_ARROW, FORMAT_MSGPACK
+)
+from api.services.admission import (
+    rate_limiter, inference_limiter, AdmissionRejected, identify_client, lowest_priority,
+    retry_after_header, PRIORITY_ALERT, PRIORITY_STANDARD, PRIORITY_BATCH
+)
+
+setup_logging()
+logger = logging.getLogger("sepsis_sentinel.api")
 
 # Configuração da aplicação
 app = FastAPI(
@@ -26,10 +61,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def admission_middleware(request: Request, call_next):
+    """Rate limit por cliente nos endpoints de predição (429 antes de ler o corpo)"""
+    if not request.url.path.startswith("/predict"):
+        return await call_next(request)
+    
+    client_id, priority = identify_client(request.headers, request.client.host if request.client else "unknown")
+    request.state.client_priority = priority
+    
+    if RATE_LIMIT_ENABLED:
+        allowed, retry_after = await rate_limiter.acquire(client_id)
+        if not allowed:
+            return JSONResponse(
+                status_code=429,
+                content=ErrorResponse(
+                    error="Limite de requisições excedido",
+                    timestamp=datetime.now().isoformat()
+                ).dict(),
+                headers={"Retry-After": retry_after_header(retry_after)}
+            )
+    
+    return await call_next(request)
+
+@app.middleware("http")
+async def tracing_middleware(request: Request, call_next):
+    """Abre o span raiz da requisição e propaga request id e traceparent (também nos logs)"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    request.state.request_id = request_id
+    request.state.start_time_unix_nano = time.time_ns()
+    
+    with tracer.start_trace(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get("traceparent"),
+        request_id=request_id,
+        **{"http.method": request.method, "http.target": request.url.path}
+    ) as span:
+        log_token = bind_context(request_id=request_id, trace_id=getattr(span, "trace_id", None))
+        try:
+            response = await call_next(request)
+        finally:
+            reset_context(log_token)
+        span.set_attribute("http.status_code", response.status_code)
+    
+    response.headers["X-Request-ID"] = request_id
+    if getattr(span, "trace_id", None):
+        response.headers["traceparent"] = f"00-{span.trace_id}-{span.span_id}-01"
+    return response
+
+# Schema JSON do lote para a documentação (o corpo é lido manualmente por causa dos formatos colunares)
+_BATCH_INPUT_SCHEMA = SepsisBatchInput.model_json_schema(ref_template="#/components/schemas/{model}")
+_BATCH_INPUT_SCHEMA.pop("$defs", None)
+
+async def _run_inference(request: Request, max_priority: str, func, *args, **kwargs):
+    """
+    Executa a inferência em uma thread, dentro do limite global de concorrência
+    
+    A classe de prioridade é a do cliente, limitada pelo teto do endpoint
+    (ex.: lotes nunca passam à frente de alertas).
+    """
+    priority = lowest_priority(getattr(request.state, "client_priority", PRIORITY_STANDARD), max_priority)
+    try:
+        async with inference_limiter.slot(priority):
+            return await run_in_threadpool(func, *args, **kwargs)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def _record_request_parsing(request: Request):
+    """Registra o tempo entre a chegada da requisição e o endpoint (leitura do corpo + Pydantic)"""
+    tracer.record_span("api.parse_and_validate", request.state.start_time_unix_nano)
+
 @app.on_event("startup")
 async def startup_event():
-    print("🚀 Iniciando Sepsis Sentinel API...")
-    print(f"📊 Status do modelo: {'✅ Carregado' if sepsis_service.model_loaded else '❌ Não carregado'}")
+    logger.info("Iniciando Sepsis Sentinel API", extra={"model_load_mode": MODEL_LOAD_MODE})
+    
+    if MODEL_LOAD_MODE == "eager":
+        sepsis_service.load_model()
+    else:
+        # A porta é aberta imediatamente; /health responde "loading" até o modelo ficar pronto
+        asyncio.get_running_loop().run_in_executor(None, sepsis_service.load_model)
+        logger.info("Modelo carregando em segundo plano")
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -42,9 +153,13 @@ async def root():
     }
 
 @app.get("/health", response_model=HealthCheck, tags=["Health"])
-async def health_check():
+async def health_check(response: Response):
+    """Readiness: 200 quando o modelo está pronto, 503 enquanto carrega ou em falha"""
     service_status = sepsis_service.get_health_status()
     
+    if service_status["status"] != MODEL_STATUS_READY:
+        response.status_code = 503
+    
     return HealthCheck(
         status=service_status["status"],
         timestamp=service_status["timestamp"],
@@ -58,7 +173,7 @@ async def get_model_info():
     return sepsis_service.get_model_info()
 
 @app.post("/predict", response_model=SepsisResponse, tags=["Prediction"])
-async def predict_sepsis(input_data: SepsisInput):
+async def predict_sepsis(input_data: SepsisInput, request: Request):
     """
     Faz predição de risco de sepse para um paciente
     
@@ -75,10 +190,18 @@ async def predict_sepsis(input_data: SepsisInput):
     - **unit2**: Unidade 2 (0=Não, 1=Sim)
     - **hosp_adm_time**: Tempo de internação (horas)
     - **iculos**: Tempo na UTI (horas)
+    
+    Até `MAX_IMPUTED_FEATURES` campos podem ser omitidos: são preenchidos pela
+    mediana da unidade do paciente e listados em `imputed_fields`.
+    
+    O header `X-Tenant-ID` (hospital) e a unidade escolhem o modelo no registro.
     """
+    _record_request_parsing(request)
+    
     try:
         # Valida os dados de entrada
-        validation_result = sepsis_service.validate_input_data(input_data.dict())
+        with tracer.span("service.validate_input_data"):
+            validation_result = sepsis_service.validate_input_data(input_data.dict())
         if not validation_result["valid"]:
             raise HTTPException(
                 status_code=400, 
@@ -86,11 +209,14 @@ async def predict_sepsis(input_data: SepsisInput):
             )
         
         # Faz a predição
-        result = sepsis_service.predict_sepsis_risk(input_data.dict())
+        result = await _run_inference(
+            request, PRIORITY_ALERT, sepsis_service.predict_sepsis_risk, input_data.dict(),
+            tenant=request.headers.get(TENANT_HEADER)
+        )
         
         if not result["success"]:
             raise HTTPException(
-                status_code=500,
+                status_code=500 if sepsis_service.model_loaded else 503,
                 detail=result["error"]
             )
         
@@ -98,6 +224,8 @@ async def predict_sepsis(input_data: SepsisInput):
             prediction=result["prediction"],
             risk_level=result["risk_level"],
             message=result["message"],
+            imputed_fields=result["imputed_fields"],
+            model=result["model"],
             success=result["success"]
         )
         
@@ -109,8 +237,345 @@ async def predict_sepsis(input_data: SepsisInput):
             detail=f"Erro interno do servidor: {str(e)}"
         )
 
+@app.post("/predict/explain", response_model=SepsisExplanationResponse, tags=["Prediction"])
+async def explain_sepsis(input_data: SepsisInput, request: Request):
+    """
+    Faz predição de risco de sepse e mostra quanto cada campo contribuiu
+    
+    A probabilidade é decomposta pelos caminhos percorridos nas árvores da
+    floresta: `base_value` + soma das contribuições = `raw_prediction`
+    (igual a `prediction` quando o modelo não tem calibração).
+    """
+    _record_request_parsing(request)
+    
+    with tracer.span("service.validate_input_data"):
+        validation_result = sepsis_service.validate_input_data(input_data.dict())
+    if not validation_result["valid"]:
+        raise HTTPException(
+            status_code=400, 
+            detail=validation_result["message"]
+        )
+    
+    result = await _run_inference(
+        request, PRIORITY_STANDARD, sepsis_service.explain_sepsis_risk, input_data.dict(),
+        tenant=request.headers.get(TENANT_HEADER)
+    )
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=500 if sepsis_service.model_loaded else 503,
+            detail=result["error"]
+        )
+    
+    return result
+
+@app.post(
+    "/predict/batch",
+    response_model=SepsisBatchResponse,
+    response_model_exclude_none=True,
+    tags=["Prediction"],
+    openapi_extra={"requestBody": {"required": True, "content": {
+        MEDIA_TYPES[FORMAT_JSON]: {"schema": _BATCH_INPUT_SCHEMA},
+        MEDIA_TYPES[FORMAT_ARROW]: {"schema": {"type": "string", "format": "binary"}},
+        MEDIA_TYPES[FORMAT_MSGPACK]: {"schema": {"type": "string", "format": "binary"}},
+    }}}
+)
+async def predict_sepsis_batch(
+    request: Request,
+    include_messages: bool = Query(False, description="Inclui nível de risco e mensagem por paciente")
+):
+    """
+    Faz predição de risco de sepse para vários pacientes em uma única chamada ao modelo
+    
+    Por padrão retorna apenas probabilidades e códigos numéricos de risco
+    (0=Baixo, 1=Moderado, 2=Alto, 3=Crítico); use `include_messages=true`
+    para receber também os nomes dos níveis e as mensagens descritivas.
+    
+    Além de JSON, aceita e retorna lotes colunares em Arrow IPC
+    (`application/vnd.apache.arrow.stream`) ou MessagePack
+    (`application/x-msgpack`), escolhidos por `Content-Type` e `Accept`.
+    
+    Os limites fisiológicos são verificados no lote inteiro de uma vez;
+    valores inválidos retornam 422 com a linha e o campo de cada erro.
+    
+    Com o registro de modelos, as linhas são agrupadas pelo modelo de destino
+    (header `X-Tenant-ID` e unidade de cada paciente), com uma chamada por modelo.
+    """
+    try:
+        input_format = request_format(request.headers.get("content-type"))
+        output_format = response_format(request.headers.get("accept"))
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    body = await request.body()
+    
+    if input_format == FORMAT_JSON:
+        try:
+            input_data = SepsisBatchInput.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        n_rows = len(input_data.patients)
+    else:
+        try:
+            with tracer.span("api.decode_columnar", format=input_format):
+                batch = decode_batch(body, input_format)
+        except UnsupportedFormat as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except PayloadError as e:
+            return JSONResponse(
+                status_code=422,
+                content={"detail": e.errors or [{"message": str(e)}], "error": str(e)}
+            )
+        n_rows = batch.n_rows
+    _record_request_parsing(request)
+    
+    if n_rows == 0:
+        raise HTTPException(status_code=422, detail="O lote deve ter pelo menos um paciente")
+    if n_rows > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote acima do limite de {MAX_BATCH_SIZE} pacientes"
+        )
+    
+    if input_format == FORMAT_JSON:
+        patients = [patient.dict() for patient in input_data.patients]
+        patient_ids = [patient["patient_id"] for patient in patients]
+        result = await _run_inference(
+            request, PRIORITY_BATCH, sepsis_service.predict_batch,
+            patients, include_messages=include_messages, tenant=request.headers.get(TENANT_HEADER)
+        )
+    else:
+        patient_ids = batch.patient_ids
+        result = await _run_inference(
+            request, PRIORITY_BATCH, sepsis_service.predict_batch_columns,
+            batch.columns, batch.n_rows, batch.patient_ids, include_messages=include_messages,
+            tenant=request.headers.get(TENANT_HEADER)
+        )
+    
+    if not result["success"]:
+        if "validation_errors" in result:
+            return JSONResponse(status_code=422, content={
+                "detail": result["validation_errors"],
+                "error": result["error"],
+                "invalid_rows": result["invalid_rows"]
+            })
+        raise HTTPException(
+            status_code=500 if sepsis_service.model_loaded else 503,
+            detail=result["error"]
+        )
+    
+    if output_format == FORMAT_JSON:
+        if input_format != FORMAT_JSON:
+            result["predictions"] = result["predictions"].tolist()
+            result["risk_codes"] = result["risk_codes"].tolist()
+            if "imputed_codes" in result:
+                result["imputed_codes"] = result["imputed_codes"].tolist()
+        return result
+    
+    try:
+        with tracer.span("api.encode_columnar", format=output_format):
+            content = encode_batch(result, output_format, patient_ids if any(patient_ids or []) else None)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    return Response(content=content, media_type=MEDIA_TYPES[output_format])
+
+@app.get("/patients/{patient_id}/trajectory", response_model=TrajectoryResponse, tags=["Patients"])
+async def get_patient_trajectory(
+    patient_id: str,
+    start: Optional[datetime] = Query(None, description="Início da janela (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Fim da janela (ISO 8601)"),
+    points: int = Query(200, ge=1, le=2000, description="Número máximo de pontos retornados")
+):
+    """
+    Retorna a evolução do risco de sepse de um paciente
+    
+    A série é reamostrada em até `points` intervalos; cada ponto traz a
+    probabilidade média, a máxima e o pior nível de risco do intervalo.
+    """
+    trajectory = trajectory_store.get_trajectory(
+        patient_id,
+        start=start.timestamp() if start else None,
+        end=end.timestamp() if end else None,
+        points=points
+    )
+    
+    if trajectory is None:
+        raise HTTPException(status_code=404, detail=f"Paciente {patient_id} sem predições registradas")
+    
+    return trajectory
+
+@app.get("/wards/{unit}/top", response_model=WardTopResponse, tags=["Patients"])
+async def get_ward_top_patients(
+    unit: str,
+    k: int = Query(10, ge=1, le=500, description="Quantidade de pacientes retornados")
+):
+    """
+    Retorna os K pacientes de maior risco atual de uma unidade
+    
+    - **unit**: unit1, unit2, other (nenhuma das duas) ou all
+    """
+    top = ward_index.get_top(unit, k)
+    
+    if top is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unidade desconhecida: {unit}. Use uma de: {', '.join(WARDS)}"
+        )
+    
+    return top
+
+@app.get("/events/risk", tags=["Patients"])
+async def stream_risk_events(
+    unit: Optional[str] = Query(None, description="Filtra por unidade (unit1/unit2/other)"),
+    escalations_only: bool = Query(False, description="Envia apenas aumentos de risco")
+):
+    """
+    Stream (Server-Sent Events) de mudanças de nível de risco dos pacientes
+    
+    Um evento `risk_transition` é enviado quando o nível de risco de um
+    paciente muda entre predições (ex.: Moderado → Alto). Conexões que não
+    consomem os eventos a tempo são encerradas.
+    """
+    subscriber = risk_event_bus.subscribe(unit, escalations_only)
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                
+                if event is None:
+                    # Assinante lento: encerra a conexão para que o cliente reconecte
+                    yield "event: overflow\ndata: {}\n\n"
+                    break
+                yield format_sse(event)
+        finally:
+            risk_event_bus.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/traces", tags=["Monitoring"])
+async def get_recent_traces(
+    limit: int = Query(100, ge=1, le=1000, description="Quantidade máxima de spans"),
+    trace_id: Optional[str] = Query(None, description="Filtra por trace")
+):
+    """Retorna os spans mais recentes do exportador em memória"""
+    if tracer.exporter is None:
+        raise HTTPException(status_code=404, detail="Rastreamento desativado (TRACE_EXPORTER=none)")
+    
+    return {
+        "sample_rate": tracer.sample_rate,
+        "spans": tracer.exporter.get_spans(limit, trace_id)
+    }
+
+@app.get("/monitoring/drift", tags=["Monitoring"])
+async def get_drift_report():
+    """
+    Compara as distribuições ao vivo com a referência do treinamento
+    
+    Para cada feature e para a probabilidade prevista: quantis atuais e de
+    referência, PSI (faixas dos decis da referência) e KS. Status por PSI:
+    ok (< 0.1), warning (0.1-0.25) ou drift (>= 0.25).
+    """
+    return await run_in_threadpool(drift_monitor.report)
+
+@app.post("/outcomes", response_model=OutcomeResponse, tags=["Monitoring"])
+async def ingest_outcomes(outcomes: OutcomeBatch):
+    """
+    Recebe desfechos (SepsisLabel) que chegam depois das predições
+    
+    Cada desfecho rotula as predições do paciente (registradas com
+    `patient_id`) feitas até `timestamp`, desde o último desfecho aplicado
+    e no máximo OUTCOME_LOOKBACK_HOURS antes dele.
+    """
+    items = [
+        {
+            "patient_id": outcome.patient_id,
+            "sepsis_label": outcome.sepsis_label,
+            "timestamp": outcome.timestamp.timestamp() if outcome.timestamp else None
+        }
+        for outcome in outcomes.outcomes
+    ]
+    return await run_in_threadpool(outcome_tracker.ingest, items)
+
+@app.get("/monitoring/performance", tags=["Monitoring"])
+async def get_live_performance():
+    """
+    AUROC e precisão/recall por nível de risco das predições já rotuladas
+    
+    As métricas cobrem as predições feitas nas últimas PERFORMANCE_WINDOW_HOURS
+    horas e são mantidas incrementalmente a cada desfecho recebido. A precisão
+    e o recall de um nível consideram alerta as predições daquele nível ou acima.
+    """
+    return await run_in_threadpool(outcome_tracker.report)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Permite acesso apenas com o token de administração configurado"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Endpoints de administração desativados")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+
+@app.post("/admin/profile", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def profile_worker(
+    seconds: float = Query(10, gt=0, description="Duração da coleta (segundos)"),
+    interval_ms: float = Query(5, ge=1, le=100, description="Intervalo entre amostras (ms)"),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$", description="collapsed ou speedscope")
+):
+    """
+    Faz profiling por amostragem deste worker durante N segundos
+    
+    Amostra as pilhas de todas as threads (event loop e executores). Retorna
+    pilhas colapsadas (para flamegraph.pl/speedscope) ou JSON do speedscope.
+    """
+    if seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Duração máxima: {PROFILE_MAX_SECONDS:.0f} segundos")
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="Já existe um profiling em andamento")
+    
+    # A coleta roda em outra thread para que o event loop continue atendendo (e seja amostrado)
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, profiler.profile, seconds, interval_ms / 1000
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    headers = {
+        "X-Profile-Samples": str(result["n_samples"]),
+        "X-Profile-Duration": f"{result['duration']:.3f}"
+    }
+    if format == "speedscope":
+        return JSONResponse(to_speedscope(result), headers=headers)
+    return PlainTextResponse(to_collapsed(result), headers=headers)
+
+@app.get("/admin/admission", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def get_admission_stats():
+    """Ocupação e rejeições do limite de inferências simultâneas deste worker"""
+    return inference_limiter.get_stats()
+
+@app.get("/admin/logging", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def get_log_stats():
+    """Registros de log descartados (fila cheia) e suprimidos (rate limit) neste worker"""
+    return get_logging_stats()
+
+@app.post("/admin/drift/reset", tags=["Admin"], dependencies=[Depends(require_admin)])
+async def reset_drift_monitor():
+    """Descarta as distribuições acumuladas pelo monitor de drift (ex.: após um retreino)"""
+    drift_monitor.reset()
+    return {"reset": True, "timestamp": datetime.now().isoformat()}
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
+    logger.exception("Erro não tratado em %s %s", request.method, request.url.path, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content=ErrorResponse(
@@ -128,7 +593,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         content=ErrorResponse(
             error=exc.detail,
             timestamp=datetime.now().isoformat()
-        ).dict()
+        ).dict(),
+        headers=getattr(exc, "headers", None)
     )
 
 if __name__ == "__main__":
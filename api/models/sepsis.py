@@ -1,58 +1,73 @@
 """
 Modelos Pydantic para a API de detecção de sepse
 """
-from pydantic import BaseModel, Field, validator
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator, ValidationInfo
+from typing import Optional, List, Dict
+from datetime import datetime
 
-class SepsisInput(BaseModel):
-    """Modelo para dados de entrada do paciente"""
+from ml.limits import FIELDS, LIMITS, MAP_TOLERANCE, check_value, expected_map, is_missing, map_message
+
+def _limited(field: str, description: str):
+    """Campo com a faixa de ml.limits documentada no schema (ausente = imputado)"""
+    return Field(None, description=description, json_schema_extra=LIMITS[field].json_schema())
+
+class SepsisRecord(BaseModel):
+    """
+    Dados de um paciente sem as regras fisiológicas
+    
+    Usado nos lotes: os limites de ml.limits são aplicados depois, à matriz
+    inteira e de forma vetorizada, em vez de um validador por linha.
+    Campos ausentes (até MAX_IMPUTED_FEATURES) são imputados pela mediana
+    da unidade do paciente.
+    """
     
     # Sinais vitais
-    hr: float = Field(..., ge=0, le=300, description="Frequência cardíaca (bpm)")
-    o2sat: float = Field(..., ge=0, le=100, description="Saturação de oxigênio (%)")
-    temp: float = Field(..., ge=30, le=45, description="Temperatura corporal (°C)")
+    hr: Optional[float] = _limited("hr", "Frequência cardíaca (bpm)")
+    o2sat: Optional[float] = _limited("o2sat", "Saturação de oxigênio (%)")
+    temp: Optional[float] = _limited("temp", "Temperatura corporal (°C)")
     
     # Pressão arterial
-    sbp: float = Field(..., ge=0, le=300, description="Pressão sistólica (mmHg)")
-    dbp: float = Field(..., ge=0, le=200, description="Pressão diastólica (mmHg)")
-    map: float = Field(..., ge=0, le=200, description="Pressão arterial média (mmHg)")
+    sbp: Optional[float] = _limited("sbp", "Pressão sistólica (mmHg)")
+    dbp: Optional[float] = _limited("dbp", "Pressão diastólica (mmHg)")
+    map: Optional[float] = _limited("map", "Pressão arterial média (mmHg)")
     
     # Respiração
-    resp: float = Field(..., ge=0, le=100, description="Taxa respiratória (rpm)")
+    resp: Optional[float] = _limited("resp", "Taxa respiratória (rpm)")
     
     # Dados demográficos
-    age: float = Field(..., ge=0, le=150, description="Idade (anos)")
-    gender: int = Field(..., ge=0, le=1, description="Gênero (0=Feminino, 1=Masculino)")
+    age: Optional[float] = _limited("age", "Idade (anos)")
+    gender: Optional[int] = _limited("gender", "Gênero (0=Feminino, 1=Masculino)")
     
     # Dados hospitalares
-    unit1: int = Field(..., ge=0, le=1, description="Unidade 1 (0=Não, 1=Sim)")
-    unit2: int = Field(..., ge=0, le=1, description="Unidade 2 (0=Não, 1=Sim)")
-    hosp_adm_time: float = Field(..., ge=0, description="Tempo de internação (horas)")
-    iculos: float = Field(..., ge=0, description="Tempo na UTI (horas)")
+    unit1: Optional[int] = _limited("unit1", "Unidade 1 (0=Não, 1=Sim)")
+    unit2: Optional[int] = _limited("unit2", "Unidade 2 (0=Não, 1=Sim)")
+    hosp_adm_time: Optional[float] = _limited("hosp_adm_time", "Tempo de internação (horas)")
+    iculos: Optional[float] = _limited("iculos", "Tempo na UTI (horas)")
     
-    @validator('map')
-    def validate_map(cls, v, values):
-        """Valida se MAP está dentro do range esperado baseado em SBP e DBP"""
-        if 'sbp' in values and 'dbp' in values:
-            sbp = values['sbp']
-            dbp = values['dbp']
-            expected_map = (sbp + 2 * dbp) / 3
-            if abs(v - expected_map) > 20:
-                raise ValueError(f"MAP deve estar próximo de {(sbp + 2 * dbp) / 3:.1f}")
-        return v
+    # Identificação (opcional) para acompanhar a trajetória do paciente
+    patient_id: Optional[str] = Field(None, max_length=64, description="Identificador do paciente")
+
+class SepsisInput(SepsisRecord):
+    """Modelo para dados de entrada do paciente"""
     
-    @validator('temp')
-    def validate_temp(cls, v):
-        """Valida se a temperatura está em um range fisiológico"""
-        if v < 35 or v > 42:
-            raise ValueError("Temperatura deve estar entre 35°C e 42°C")
+    @field_validator(*FIELDS)
+    @classmethod
+    def validate_limits(cls, v, info: ValidationInfo):
+        """Valida o campo com a tabela de limites fisiológicos (ml.limits)"""
+        message = None if is_missing(v) else check_value(info.field_name, v)
+        if message:
+            raise ValueError(message)
         return v
     
-    @validator('hr')
-    def validate_hr(cls, v):
-        """Valida se a frequência cardíaca está em um range fisiológico"""
-        if v < 40 or v > 200:
-            raise ValueError("Frequência cardíaca deve estar entre 40 e 200 bpm")
+    @field_validator('map')
+    @classmethod
+    def validate_map(cls, v, info: ValidationInfo):
+        """Valida se MAP está dentro do range esperado baseado em SBP e DBP"""
+        sbp = info.data.get('sbp')
+        dbp = info.data.get('dbp')
+        if not any(is_missing(value) for value in (v, sbp, dbp)):
+            if abs(v - expected_map(sbp, dbp)) > MAP_TOLERANCE:
+                raise ValueError(map_message(sbp, dbp))
         return v
 
 class SepsisResponse(BaseModel):
@@ -61,9 +76,111 @@ class SepsisResponse(BaseModel):
     prediction: float = Field(..., ge=0, le=1, description="Probabilidade de sepse (0-1)")
     risk_level: str = Field(..., description="Nível de risco (Baixo/Moderado/Alto/Crítico)")
     message: str = Field(..., description="Mensagem descritiva do resultado")
+    imputed_fields: List[str] = Field(default_factory=list, description="Campos ausentes preenchidos pela mediana da unidade")
+    model: Optional[str] = Field(None, description="Modelo do registro que atendeu a predição")
     success: bool = Field(..., description="Indica se a predição foi bem-sucedida")
     error: Optional[str] = Field(None, description="Mensagem de erro, se houver")
 
+class FeatureContribution(BaseModel):
+    """Contribuição de uma feature para a probabilidade prevista"""
+    
+    feature: str = Field(..., description="Campo de entrada")
+    value: float = Field(..., description="Valor informado")
+    contribution: float = Field(..., description="Variação na probabilidade atribuída ao campo")
+
+class SepsisExplanationResponse(BaseModel):
+    """Modelo para resposta da predição explicada"""
+    
+    prediction: float = Field(..., ge=0, le=1, description="Probabilidade de sepse (0-1)")
+    risk_level: str = Field(..., description="Nível de risco (Baixo/Moderado/Alto/Crítico)")
+    message: str = Field(..., description="Mensagem descritiva do resultado")
+    raw_prediction: float = Field(..., ge=0, le=1, description="Probabilidade do modelo antes da calibração")
+    base_value: float = Field(..., description="Probabilidade média do modelo (ponto de partida)")
+    contributions: List[FeatureContribution] = Field(
+        ..., description="Contribuições ordenadas por impacto; base_value + soma = raw_prediction"
+    )
+    imputed_fields: List[str] = Field(default_factory=list, description="Campos ausentes preenchidos pela mediana da unidade")
+    model: Optional[str] = Field(None, description="Modelo do registro que atendeu a predição")
+    success: bool = Field(..., description="Indica se a predição foi bem-sucedida")
+
+class SepsisBatchInput(BaseModel):
+    """Modelo para predição em lote"""
+    
+    patients: List[SepsisRecord] = Field(..., min_length=1, description="Dados de cada paciente")
+
+class SepsisBatchResponse(BaseModel):
+    """Modelo para resposta da predição em lote"""
+    
+    count: int = Field(..., description="Quantidade de pacientes avaliados")
+    predictions: List[float] = Field(..., description="Probabilidade de sepse de cada paciente")
+    risk_codes: List[int] = Field(..., description="Código do nível de risco (índice em risk_level_legend)")
+    risk_level_legend: List[str] = Field(..., description="Nome do nível de risco de cada código")
+    risk_levels: Optional[List[str]] = Field(None, description="Nível de risco de cada paciente")
+    messages: Optional[List[str]] = Field(None, description="Mensagem descritiva de cada paciente")
+    imputed_rows: Optional[int] = Field(None, description="Pacientes com algum campo imputado")
+    imputed_codes: Optional[List[int]] = Field(
+        None, description="Campos imputados de cada paciente (bit i = imputed_fields_legend[i])"
+    )
+    imputed_fields_legend: Optional[List[str]] = Field(None, description="Campo de cada bit de imputed_codes")
+    models: Optional[Dict[str, int]] = Field(None, description="Pacientes avaliados por cada modelo do registro")
+    success: bool = Field(..., description="Indica se a predição foi bem-sucedida")
+
+class TrajectoryPoint(BaseModel):
+    """Ponto (possivelmente agregado) da trajetória de risco"""
+    
+    timestamp: str = Field(..., description="Timestamp médio do intervalo")
+    prediction: float = Field(..., ge=0, le=1, description="Probabilidade média no intervalo")
+    max_prediction: float = Field(..., ge=0, le=1, description="Probabilidade máxima no intervalo")
+    risk_level: str = Field(..., description="Pior nível de risco no intervalo")
+    count: int = Field(..., description="Quantidade de predições agregadas")
+
+class TrajectoryResponse(BaseModel):
+    """Modelo para resposta da trajetória de risco de um paciente"""
+    
+    patient_id: str = Field(..., description="Identificador do paciente")
+    total_recorded: int = Field(..., description="Total de predições já registradas")
+    stored_points: int = Field(..., description="Predições mantidas no buffer")
+    window_points: int = Field(..., description="Predições dentro da janela consultada")
+    points: List[TrajectoryPoint] = Field(..., description="Série reamostrada")
+
+class WardPatient(BaseModel):
+    """Paciente no ranking de risco de uma unidade"""
+    
+    patient_id: str = Field(..., description="Identificador do paciente")
+    prediction: float = Field(..., ge=0, le=1, description="Probabilidade de sepse mais recente")
+    risk_level: str = Field(..., description="Nível de risco mais recente")
+    timestamp: str = Field(..., description="Timestamp da última predição")
+
+class WardTopResponse(BaseModel):
+    """Modelo para resposta dos pacientes de maior risco de uma unidade"""
+    
+    unit: str = Field(..., description="Unidade consultada (unit1/unit2/other/all)")
+    total_patients: int = Field(..., description="Pacientes monitorados na unidade")
+    patients: List[WardPatient] = Field(..., description="Pacientes em ordem decrescente de risco")
+
+class OutcomeInput(BaseModel):
+    """Desfecho (SepsisLabel) de um paciente, recebido após as predições"""
+    
+    patient_id: str = Field(..., min_length=1, max_length=64, description="Identificador do paciente")
+    sepsis_label: int = Field(..., ge=0, le=1, description="SepsisLabel (0 ou 1)")
+    timestamp: Optional[datetime] = Field(
+        None, description="Instante a que o rótulo se refere (padrão: agora); rotula as predições anteriores"
+    )
+
+class OutcomeBatch(BaseModel):
+    """Modelo para ingestão de desfechos"""
+    
+    outcomes: List[OutcomeInput] = Field(..., min_length=1, description="Desfechos recebidos")
+
+class OutcomeResponse(BaseModel):
+    """Modelo para resposta da ingestão de desfechos"""
+    
+    received: int = Field(..., description="Desfechos recebidos")
+    labeled_predictions: int = Field(..., description="Predições que receberam rótulo")
+    unmatched: int = Field(..., description="Desfechos sem predições do paciente na janela")
+    stale: int = Field(..., description="Desfechos anteriores ao último já aplicado ao paciente")
+    timestamp: str = Field(..., description="Timestamp da ingestão")
+
 class HealthCheck(BaseModel):
     """Modelo para verificação de saúde da API"""
     
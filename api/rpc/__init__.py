@@ -0,0 +1 @@
+# Servidor gRPC (módulos sepsis_pb2* gerados a partir de sepsis.proto)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: api/rpc/sepsis.proto
+# Protobuf Python Version: 4.25.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14\x61pi/rpc/sepsis.proto\x12\tsepsis.v1\"\xb8\x03\n\x0ePredictRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x12\n\npatient_id\x18\x02 \x01(\t\x12\x0f\n\x02hr\x18\x03 \x01(\x01H\x00\x88\x01\x01\x12\x12\n\x05o2sat\x18\x04 \x01(\x01H\x01\x88\x01\x01\x12\x11\n\x04temp\x18\x05 \x01(\x01H\x02\x88\x01\x01\x12\x10\n\x03sbp\x18\x06 \x01(\x01H\x03\x88\x01\x01\x12\x10\n\x03\x64\x62p\x18\x07 \x01(\x01H\x04\x88\x01\x01\x12\x10\n\x03map\x18\x08 \x01(\x01H\x05\x88\x01\x01\x12\x11\n\x04resp\x18\t \x01(\x01H\x06\x88\x01\x01\x12\x10\n\x03\x61ge\x18\n \x01(\x01H\x07\x88\x01\x01\x12\x13\n\x06gender\x18\x0b \x01(\x05H\x08\x88\x01\x01\x12\x12\n\x05unit1\x18\x0c \x01(\x05H\t\x88\x01\x01\x12\x12\n\x05unit2\x18\r \x01(\x05H\n\x88\x01\x01\x12\x1a\n\rhosp_adm_time\x18\x0e \x01(\x01H\x0b\x88\x01\x01\x12\x13\n\x06iculos\x18\x0f \x01(\x01H\x0c\x88\x01\x01\x42\x05\n\x03_hrB\x08\n\x06_o2satB\x07\n\x05_tempB\x06\n\x04_sbpB\x06\n\x04_dbpB\x06\n\x04_mapB\x07\n\x05_respB\x06\n\x04_ageB\t\n\x07_genderB\x08\n\x06_unit1B\x08\n\x06_unit2B\x10\n\x0e_hosp_adm_timeB\t\n\x07_iculos\"\xac\x01\n\x0fPredictResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x12\n\nprediction\x18\x02 \x01(\x01\x12\x11\n\trisk_code\x18\x03 \x01(\x05\x12\x12\n\nrisk_level\x18\x04 \x01(\t\x12\x0f\n\x07message\x18\x05 \x01(\t\x12\r\n\x05\x65rror\x18\x06 \x01(\t\x12\x12\n\nerror_code\x18\x07 \x01(\x05\x12\x16\n\x0eimputed_fields\x18\x08 \x03(\t2\x9f\x01\n\x0fSepsisPredictor\x12@\n\x07Predict\x12\x19.sepsis.v1.PredictRequest\x1a\x1a.sepsis.v1.PredictResponse\x12J\n\rPredictStream\x12\x19.sepsis.v1.PredictRequest\x1a\x1a.sepsis.v1.PredictResponse(\x01\x30\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'api.rpc.sepsis_pb2', _globals)
+if _descriptor._USE_C_DESCRIPTORS == False:
+  DESCRIPTOR._options = None
+  _globals['_PREDICTREQUEST']._serialized_start=36
+  _globals['_PREDICTREQUEST']._serialized_end=476
+  _globals['_PREDICTRESPONSE']._serialized_start=479
+  _globals['_PREDICTRESPONSE']._serialized_end=651
+  _globals['_SEPSISPREDICTOR']._serialized_start=654
+  _globals['_SEPSISPREDICTOR']._serialized_end=813
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,102 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+from api.rpc import sepsis_pb2 as api_dot_rpc_dot_sepsis__pb2
+
+
+class SepsisPredictorStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Predict = channel.unary_unary(
+                '/sepsis.v1.SepsisPredictor/Predict',
+                request_serializer=api_dot_rpc_dot_sepsis__pb2.PredictRequest.SerializeToString,
+                response_deserializer=api_dot_rpc_dot_sepsis__pb2.PredictResponse.FromString,
+                )
+        self.PredictStream = channel.stream_stream(
+                '/sepsis.v1.SepsisPredictor/PredictStream',
+                request_serializer=api_dot_rpc_dot_sepsis__pb2.PredictRequest.SerializeToString,
+                response_deserializer=api_dot_rpc_dot_sepsis__pb2.PredictResponse.FromString,
+                )
+
+
+class SepsisPredictorServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def Predict(self, request, context):
+        """Uma predição por chamada
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PredictStream(self, request_iterator, context):
+        """Fluxo contínuo: cada requisição recebe uma resposta, na mesma ordem;
+        mensagens que chegam juntas são avaliadas em lote
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_SepsisPredictorServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Predict': grpc.unary_unary_rpc_method_handler(
+                    servicer.Predict,
+                    request_deserializer=api_dot_rpc_dot_sepsis__pb2.PredictRequest.FromString,
+                    response_serializer=api_dot_rpc_dot_sepsis__pb2.PredictResponse.SerializeToString,
+            ),
+            'PredictStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.PredictStream,
+                    request_deserializer=api_dot_rpc_dot_sepsis__pb2.PredictRequest.FromString,
+                    response_serializer=api_dot_rpc_dot_sepsis__pb2.PredictResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'sepsis.v1.SepsisPredictor', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class SepsisPredictor(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Predict(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/sepsis.v1.SepsisPredictor/Predict',
+            api_dot_rpc_dot_sepsis__pb2.PredictRequest.SerializeToString,
+            api_dot_rpc_dot_sepsis__pb2.PredictResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def PredictStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/sepsis.v1.SepsisPredictor/PredictStream',
+            api_dot_rpc_dot_sepsis__pb2.PredictRequest.SerializeToString,
+            api_dot_rpc_dot_sepsis__pb2.PredictResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
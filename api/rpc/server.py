@@ -0,0 +1,273 @@
+"""
+Servidor gRPC de predição de sepse
+
+Alternativa binária ao REST para gateways de dispositivos de beira de
+leito. Usa o mesmo núcleo da API HTTP: SepsisService (e o mesmo preditor
+carregado), as mesmas regras de validação do SepsisInput, rate limit por
+cliente e o limite de inferências simultâneas por prioridade.
+
+- Predict: uma predição por chamada (erros viram status gRPC).
+- PredictStream: fluxo bidirecional (o rate limit conta a abertura do
+  fluxo; a vazão é limitada pela concorrência de inferência e pela fila
+  de leitura, que aplica backpressure); as mensagens que já chegaram são
+  avaliadas juntas em um micro-lote (uma chamada ao modelo) e respondidas
+  na mesma ordem. Erros de uma mensagem vão no campo `error` da resposta
+  e não encerram o fluxo.
+
+Execução: `python -m api.rpc.server` (porta GRPC_PORT). Para testes,
+`start_local_server()` sobe o servidor em uma porta efêmera de loopback no
+próprio processo e devolve um canal já conectado.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import grpc
+from pydantic import ValidationError
+
+from config import (
+    GRPC_PORT, GRPC_STREAM_BATCH_SIZE, GRPC_STREAM_BATCH_WAIT_MS, MODEL_LOAD_MODE, RATE_LIMIT_ENABLED
+)
+from ml.risk import RISK_LEVELS
+from api.models.sepsis import SepsisInput
+from api.services.sepsis_service import sepsis_service, SepsisService, TENANT_HEADER
+from api.services.admission import (
+    rate_limiter, inference_limiter, AdmissionRejected, identify_client
+)
+from api.services.log import setup_logging, bind_context, reset_context
+from api.services.tracing import tracer
+from api.rpc import sepsis_pb2, sepsis_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+# Campos numéricos de PredictRequest (mesmos nomes do SepsisInput)
+INPUT_FIELDS = [name for name in SepsisInput.model_fields if name != "patient_id"]
+
+class RequestError(Exception):
+    """Erro de uma requisição com o status gRPC correspondente"""
+
+    def __init__(self, code: grpc.StatusCode, message: str):
+        super().__init__(message)
+        self.code = code
+
+def _to_input(request: sepsis_pb2.PredictRequest) -> Dict[str, Any]:
+    """Converte e valida a mensagem com as regras do SepsisInput"""
+    # Campos não enviados (sem presença) ficam None e são imputados
+    data = {name: getattr(request, name) if request.HasField(name) else None for name in INPUT_FIELDS}
+    data["patient_id"] = request.patient_id or None
+    try:
+        return SepsisInput(**data).dict()
+    except ValidationError as e:
+        message = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, message)
+
+def _peer_host(peer: str) -> str:
+    """'ipv4:10.0.0.1:5000' / 'ipv6:[::1]:5000' -> host"""
+    address = peer.split(":", 1)[-1]
+    return address.rsplit(":", 1)[0].strip("[]")
+
+def _error_response(request_id: str, error: RequestError) -> sepsis_pb2.PredictResponse:
+    return sepsis_pb2.PredictResponse(request_id=request_id, error=str(error), error_code=error.code.value[0])
+
+class SepsisPredictorServicer(sepsis_pb2_grpc.SepsisPredictorServicer):
+    """Implementação das RPCs sobre o SepsisService"""
+
+    def __init__(self, service: SepsisService = sepsis_service):
+        self.service = service
+
+    def _validate(self, request: sepsis_pb2.PredictRequest) -> Dict[str, Any]:
+        data = _to_input(request)
+        validation = self.service.validate_input_data(data)
+        if not validation["valid"]:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, validation["message"])
+        return data
+
+    async def _admit(self, client_id: str):
+        """Aplica o rate limit do cliente (um token por chamada, como uma requisição REST)"""
+        if RATE_LIMIT_ENABLED:
+            allowed, retry_after = await rate_limiter.acquire(client_id)
+            if not allowed:
+                raise RequestError(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                                   f"Limite de requisições excedido (tente em {retry_after:.1f}s)")
+
+    async def _infer(self, priority: str, func, *args, **kwargs):
+        """Executa a inferência em uma thread, dentro do limite de concorrência"""
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        try:
+            async with inference_limiter.slot(priority):
+                result = await asyncio.get_running_loop().run_in_executor(None, call)
+        except AdmissionRejected as e:
+            raise RequestError(grpc.StatusCode.UNAVAILABLE, str(e))
+
+        if not result["success"]:
+            code = grpc.StatusCode.INTERNAL if self.service.model_loaded else grpc.StatusCode.UNAVAILABLE
+            raise RequestError(code, result["error"])
+        return result
+
+    async def Predict(self, request, context):
+        metadata = dict(context.invocation_metadata())
+        client_id, priority = identify_client(metadata, _peer_host(context.peer()))
+
+        with tracer.start_trace("grpc Predict", traceparent=metadata.get("traceparent"),
+                                request_id=request.request_id) as span:
+            log_token = bind_context(request_id=request.request_id or None,
+                                     trace_id=getattr(span, "trace_id", None))
+            try:
+                data = self._validate(request)
+                await self._admit(client_id)
+                result = await self._infer(priority, self.service.predict_sepsis_risk, data,
+                                           tenant=metadata.get(TENANT_HEADER))
+            except RequestError as e:
+                span.set_attribute("rpc.grpc.status_code", e.code.value[0])
+                await context.abort(e.code, str(e))
+            finally:
+                reset_context(log_token)
+
+        return sepsis_pb2.PredictResponse(
+            request_id=request.request_id,
+            prediction=result["prediction"],
+            risk_code=RISK_LEVELS.index(result["risk_level"]),
+            risk_level=result["risk_level"],
+            message=result["message"],
+            imputed_fields=result["imputed_fields"]
+        )
+
+    async def _predict_micro_batch(self, requests: List[sepsis_pb2.PredictRequest], priority: str,
+                                   tenant: Optional[str] = None) -> List[sepsis_pb2.PredictResponse]:
+        """Avalia um micro-lote do fluxo; mensagens inválidas recebem erro individual"""
+        responses: List[Optional[sepsis_pb2.PredictResponse]] = [None] * len(requests)
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        for i, request in enumerate(requests):
+            try:
+                valid.append((i, self._validate(request)))
+            except RequestError as e:
+                responses[i] = _error_response(request.request_id, e)
+
+        if valid:
+            with tracer.start_trace("grpc PredictStream batch", rows=len(valid)):
+                try:
+                    result = await self._infer(priority, self.service.predict_batch,
+                                               [data for _, data in valid], include_messages=True,
+                                               tenant=tenant)
+                except RequestError as e:
+                    for i, _ in valid:
+                        responses[i] = _error_response(requests[i].request_id, e)
+                else:
+                    imputed = result.get("imputed_codes") or [0] * len(valid)
+                    legend = result.get("imputed_fields_legend", [])
+                    for position, (i, _) in enumerate(valid):
+                        responses[i] = sepsis_pb2.PredictResponse(
+                            request_id=requests[i].request_id,
+                            prediction=result["predictions"][position],
+                            risk_code=result["risk_codes"][position],
+                            risk_level=result["risk_levels"][position],
+                            message=result["messages"][position],
+                            imputed_fields=[field for bit, field in enumerate(legend)
+                                            if imputed[position] >> bit & 1]
+                        )
+        return responses
+
+    async def PredictStream(self, request_iterator, context):
+        metadata = dict(context.invocation_metadata())
+        client_id, priority = identify_client(metadata, _peer_host(context.peer()))
+        try:
+            await self._admit(client_id)
+        except RequestError as e:
+            await context.abort(e.code, str(e))
+
+        # Leitura em paralelo ao processamento; a fila limitada aplica backpressure ao cliente
+        pending: "asyncio.Queue[Optional[sepsis_pb2.PredictRequest]]" = asyncio.Queue(
+            maxsize=GRPC_STREAM_BATCH_SIZE * 4
+        )
+
+        async def read_requests():
+            cancelled = False
+            try:
+                async for request in request_iterator:
+                    await pending.put(request)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                if cancelled:
+                    # O consumidor já saiu (ex.: cliente desconectou): a fila pode estar
+                    # cheia e ninguém mais a lê, então o sentinela não pode bloquear
+                    try:
+                        pending.put_nowait(None)
+                    except asyncio.QueueFull:
+                        pass
+                else:
+                    await pending.put(None)
+
+        loop = asyncio.get_running_loop()
+        reader = asyncio.create_task(read_requests())
+        try:
+            finished = False
+            while not finished:
+                request = await pending.get()
+                if request is None:
+                    break
+
+                batch = [request]
+                deadline = loop.time() + GRPC_STREAM_BATCH_WAIT_MS / 1000
+                while len(batch) < GRPC_STREAM_BATCH_SIZE:
+                    try:
+                        request = pending.get_nowait()
+                    except asyncio.QueueEmpty:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            break
+                        try:
+                            request = await asyncio.wait_for(pending.get(), remaining)
+                        except asyncio.TimeoutError:
+                            break
+                    if request is None:
+                        finished = True
+                        break
+                    batch.append(request)
+
+                for response in await self._predict_micro_batch(batch, priority, metadata.get(TENANT_HEADER)):
+                    yield response
+        finally:
+            reader.cancel()
+
+async def create_server(address: str = f"[::]:{GRPC_PORT}") -> Tuple[grpc.aio.Server, int]:
+    """Cria e inicia o servidor; retorna (servidor, porta efetivamente usada)"""
+    server = grpc.aio.server()
+    sepsis_pb2_grpc.add_SepsisPredictorServicer_to_server(SepsisPredictorServicer(), server)
+    port = server.add_insecure_port(address)
+    await server.start()
+    return server, port
+
+async def start_local_server() -> Tuple[grpc.aio.Server, grpc.aio.Channel]:
+    """
+    Sobe o servidor no próprio processo (loopback, porta efêmera) para testes
+
+    Returns:
+        (servidor, canal conectado); use sepsis_pb2_grpc.SepsisPredictorStub(canal)
+    """
+    server, port = await create_server("127.0.0.1:0")
+    channel = grpc.aio.insecure_channel(f"127.0.0.1:{port}")
+    await channel.channel_ready()
+    return server, channel
+
+async def serve():
+    loop = asyncio.get_running_loop()
+    if MODEL_LOAD_MODE == "eager":
+        await loop.run_in_executor(None, sepsis_service.load_model)
+    else:
+        # Enquanto o modelo carrega as RPCs respondem UNAVAILABLE
+        loop.run_in_executor(None, sepsis_service.load_model)
+
+    server, port = await create_server()
+    logger.info("Servidor gRPC iniciado", extra={"port": port})
+    await server.wait_for_termination()
+
+def main():
+    setup_logging()
+    asyncio.run(serve())
+
+if __name__ == "__main__":
+    main()
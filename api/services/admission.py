@@ -0,0 +1,295 @@
+"""
+Controle de admissão dos endpoints de predição
+
+Duas camadas, ambas com rejeição imediata em vez de fila sem limite:
+
+- Rate limit por cliente (API key conhecida ou IP) com token bucket:
+  acima do limite a requisição recebe 429 antes de o corpo ser lido.
+  O estado fica em memória (por worker) ou no Redis (compartilhado entre
+  workers, atualizado atomicamente por um script Lua).
+- Limite global de inferências simultâneas por worker, com classes de
+  prioridade: alertas de beira de leito passam à frente de tráfego padrão
+  e de lotes/auditoria, e a classe batch nunca ocupa todas as vagas. Com a
+  fila cheia ou após o tempo máximo de espera a resposta é 503.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Tuple
+
+from config import (
+    API_KEYS, TRUST_FORWARDED_FOR, TRUSTED_PROXY_HOPS, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_BACKEND, REDIS_URL,
+    MAX_CONCURRENT_INFERENCE, MAX_CONCURRENT_BATCH, ADMISSION_QUEUE_SIZE, ADMISSION_TIMEOUT_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Classes de prioridade (menor valor = atendido primeiro)
+PRIORITY_ALERT = "alert"
+PRIORITY_STANDARD = "standard"
+PRIORITY_BATCH = "batch"
+PRIORITIES = {PRIORITY_ALERT: 0, PRIORITY_STANDARD: 1, PRIORITY_BATCH: 2}
+
+class AdmissionRejected(Exception):
+    """Inferência recusada (fila cheia ou tempo de espera esgotado)"""
+
+class InMemoryRateLimiter:
+    """Token buckets por cliente em memória (LRU limitado)"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Consome `cost` tokens do cliente
+
+        Returns:
+            (permitido, segundos até haver tokens suficientes)
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True, 0.0
+            return False, (cost - bucket[0]) / self.rate
+
+# Token bucket atômico no Redis: KEYS[1]=bucket, ARGV = taxa, capacidade, agora, custo
+_REDIS_TOKEN_BUCKET = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+class RedisRateLimiter:
+    """Token buckets compartilhados entre workers no Redis"""
+
+    def __init__(self, url: str, rate: float, burst: int, prefix: str = "sepsis:ratelimit:"):
+        import redis.asyncio as redis_asyncio
+
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def acquire(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(
+            keys=[self.prefix + key],
+            args=[self.rate, self.burst, time.time(), cost]
+        )
+        if int(allowed):
+            return True, 0.0
+        return False, (cost - float(tokens)) / self.rate
+
+def build_rate_limiter():
+    """Cria o backend configurado; sem Redis disponível, usa o de memória"""
+    if RATE_LIMIT_BACKEND == "redis":
+        if not REDIS_URL:
+            logger.warning("RATE_LIMIT_BACKEND=redis sem REDIS_URL; usando rate limit em memória")
+        else:
+            try:
+                return RedisRateLimiter(REDIS_URL, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+            except ImportError:
+                logger.warning("Pacote redis não instalado; usando rate limit em memória")
+    return InMemoryRateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
+class InferenceLimiter:
+    """Limite de inferências simultâneas com fila de espera por prioridade"""
+
+    def __init__(self, max_concurrent: int, max_batch: int, queue_size: int, timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_batch = max(1, min(max_batch, max_concurrent))
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.active_batch = 0
+        self.rejected = 0
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def _can_run(self, priority: str) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        return priority != PRIORITY_BATCH or self.active_batch < self.max_batch
+
+    def _take(self, priority: str):
+        self.active += 1
+        if priority == PRIORITY_BATCH:
+            self.active_batch += 1
+
+    def _wake_next(self):
+        """Libera as vagas disponíveis para os primeiros da fila (por prioridade e ordem de chegada)"""
+        skipped = []
+        while self._waiters and self.active < self.max_concurrent:
+            entry = heapq.heappop(self._waiters)
+            _, _, priority, future = entry
+            if future.done():
+                continue
+            if priority == PRIORITY_BATCH and self.active_batch >= self.max_batch:
+                skipped.append(entry)
+                continue
+            self._take(priority)
+            future.set_result(True)
+        for entry in skipped:
+            heapq.heappush(self._waiters, entry)
+
+    def _discard(self, future: asyncio.Future):
+        """Remove da fila uma espera que desistiu"""
+        future.cancel()
+        self._waiters = [entry for entry in self._waiters if entry[3] is not future]
+        heapq.heapify(self._waiters)
+
+    def _evict_lower(self, priority: str) -> bool:
+        """Com a fila cheia, recusa a espera mais recente de prioridade menor para abrir lugar"""
+        rank = PRIORITIES[priority]
+        candidates = [entry for entry in self._waiters if entry[0] > rank and not entry[3].done()]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        victim[3].set_exception(AdmissionRejected("Fila de inferência cheia (cedida a maior prioridade)"))
+        return True
+
+    @staticmethod
+    def _granted(future: asyncio.Future) -> bool:
+        """Se a espera recebeu uma vaga (e não foi recusada por _evict_lower)"""
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    def _release(self, priority: str):
+        self.active -= 1
+        if priority == PRIORITY_BATCH:
+            self.active_batch -= 1
+        self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = PRIORITY_STANDARD):
+        """
+        Ocupa uma vaga de inferência durante o bloco
+
+        Raises:
+            AdmissionRejected: fila cheia ou espera acima do tempo máximo
+        """
+        if self._can_run(priority) and not self._has_waiters_ahead(priority):
+            self._take(priority)
+        else:
+            if len(self._waiters) >= self.queue_size and not self._evict_lower(priority):
+                self.rejected += 1
+                raise AdmissionRejected("Fila de inferência cheia")
+
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (PRIORITIES[priority], next(self._sequence), priority, future))
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except AdmissionRejected:
+                self.rejected += 1
+                raise
+            except asyncio.TimeoutError:
+                if self._granted(future):
+                    # A vaga foi concedida no mesmo instante do timeout: devolve-a
+                    self._release(priority)
+                else:
+                    self._discard(future)
+                self.rejected += 1
+                raise AdmissionRejected("Tempo de espera por inferência esgotado")
+            except asyncio.CancelledError:
+                if self._granted(future):
+                    self._release(priority)
+                else:
+                    self._discard(future)
+                raise
+
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def _has_waiters_ahead(self, priority: str) -> bool:
+        """Evita furar a fila: só entra direto se ninguém de prioridade igual ou maior espera"""
+        rank = PRIORITIES[priority]
+        return any(r <= rank and not future.done() for r, _, _, future in self._waiters)
+
+    def get_stats(self) -> Dict[str, Any]:
+        waiting = [priority for _, _, priority, future in self._waiters if not future.done()]
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_batch": self.max_batch,
+            "active": self.active,
+            "active_batch": self.active_batch,
+            "waiting": {name: waiting.count(name) for name in PRIORITIES},
+            "rejected": self.rejected
+        }
+
+def forwarded_client(forwarded_for: str, hops: int = 1) -> str:
+    """
+    IP do cliente em X-Forwarded-For visto pelo proxy confiável mais externo
+
+    Cada proxy acrescenta à direita o IP de quem o chamou; as entradas à
+    esquerda dessas são enviadas pelo próprio cliente e podem ser forjadas
+    (trocá-las a cada requisição renovaria o rate limit).
+    """
+    entries = [entry.strip() for entry in forwarded_for.split(",")]
+    return entries[max(0, len(entries) - hops)]
+
+def identify_client(headers, client_host: str) -> Tuple[str, str]:
+    """
+    Identifica o cliente para o rate limit
+
+    Returns:
+        (identificador do bucket, classe de prioridade); API keys
+        desconhecidas são ignoradas para que trocar de chave não renove o limite
+    """
+    api_key = headers.get("x-api-key")
+    if api_key and api_key in API_KEYS:
+        priority = API_KEYS[api_key]
+        return f"key:{api_key}", priority if priority in PRIORITIES else PRIORITY_STANDARD
+
+    if TRUST_FORWARDED_FOR and headers.get("x-forwarded-for"):
+        client_host = forwarded_client(headers["x-forwarded-for"], TRUSTED_PROXY_HOPS) or client_host
+    return f"ip:{client_host}", PRIORITY_STANDARD
+
+def lowest_priority(*priorities: str) -> str:
+    """A classe menos prioritária entre as informadas (ex.: cliente x teto do endpoint)"""
+    return max(priorities, key=PRIORITIES.__getitem__)
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+# Instâncias globais
+rate_limiter = build_rate_limiter()
+inference_limiter = InferenceLimiter(
+    MAX_CONCURRENT_INFERENCE, MAX_CONCURRENT_BATCH, ADMISSION_QUEUE_SIZE, ADMISSION_TIMEOUT_SECONDS
+)
@@ -0,0 +1,251 @@
+"""
+Payloads colunares (Apache Arrow IPC e MessagePack) para /predict/batch
+
+Integrações de alto volume enviam o lote como colunas em vez de uma lista
+de objetos JSON. O formato é escolhido por negociação de conteúdo:
+Content-Type para a requisição e Accept para a resposta (JSON continua
+sendo o padrão).
+
+- Arrow IPC (stream): `application/vnd.apache.arrow.stream`. Colunas
+  numéricas sem nulos são lidas sem cópia (`to_numpy` sobre o buffer).
+- MessagePack: `application/x-msgpack`, um mapa `{"columns": {campo: valor},
+  "dtypes": {campo: "<f8"}}`, em que cada valor é uma lista ou os bytes
+  crus do array (lidos sem cópia com np.frombuffer).
+
+Aqui só a estrutura é validada (colunas numéricas, mesmo número de
+linhas); os limites fisiológicos são aplicados pelo SepsisService à matriz
+de features (ml.limits), como no lote JSON. Nulos e colunas ausentes são
+valores a imputar; a resposta traz a coluna `imputed` (bits em
+`imputed_fields_legend`) quando algum valor foi imputado.
+
+pyarrow e msgpack são opcionais: sem eles o formato correspondente
+responde 415.
+"""
+import json
+from typing import Dict, Any, List, Optional, NamedTuple
+
+import numpy as np
+
+from ml.limits import MAX_REPORTED_ERRORS
+from api.models.sepsis import SepsisInput
+
+FORMAT_JSON = "json"
+FORMAT_ARROW = "arrow"
+FORMAT_MSGPACK = "msgpack"
+
+MEDIA_TYPES = {
+    FORMAT_JSON: "application/json",
+    FORMAT_ARROW: "application/vnd.apache.arrow.stream",
+    FORMAT_MSGPACK: "application/x-msgpack",
+}
+
+# Variações aceitas de cada formato (Content-Type / Accept)
+_FORMAT_ALIASES = {
+    "application/json": FORMAT_JSON,
+    "application/vnd.apache.arrow.stream": FORMAT_ARROW,
+    "application/vnd.apache.arrow.file": FORMAT_ARROW,
+    "application/x-msgpack": FORMAT_MSGPACK,
+    "application/msgpack": FORMAT_MSGPACK,
+    "application/vnd.msgpack": FORMAT_MSGPACK,
+}
+
+# Campos numéricos do SepsisInput, na ordem do modelo
+INPUT_COLUMNS = [name for name in SepsisInput.model_fields if name != "patient_id"]
+
+class UnsupportedFormat(Exception):
+    """Formato desconhecido ou dependência opcional ausente (415)"""
+
+class PayloadError(ValueError):
+    """Payload colunar malformado ou com valores inválidos (422)"""
+
+    def __init__(self, message: str, errors: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+class ColumnBatch(NamedTuple):
+    """Lote decodificado: colunas numpy por campo, número de linhas e patient_ids"""
+    columns: Dict[str, np.ndarray]
+    n_rows: int
+    patient_ids: Optional[List[Optional[str]]]
+
+def request_format(content_type: Optional[str]) -> str:
+    """Formato do corpo da requisição a partir do Content-Type"""
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    if media_type not in _FORMAT_ALIASES:
+        raise UnsupportedFormat(f"Content-Type não suportado: {media_type}")
+    return _FORMAT_ALIASES[media_type]
+
+def response_format(accept: Optional[str]) -> str:
+    """Formato da resposta a partir do Accept (primeiro tipo suportado; JSON por padrão)"""
+    for item in (accept or "").split(","):
+        media_type = item.split(";")[0].strip().lower()
+        if media_type in _FORMAT_ALIASES:
+            return _FORMAT_ALIASES[media_type]
+    return FORMAT_JSON
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+        return pa
+    except ImportError:
+        raise UnsupportedFormat("Formato Arrow indisponível: instale o pacote pyarrow")
+
+def _import_msgpack():
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        raise UnsupportedFormat("Formato MessagePack indisponível: instale o pacote msgpack")
+
+def _decode_arrow(body: bytes) -> ColumnBatch:
+    pa = _import_pyarrow()
+    buffer = pa.py_buffer(body)
+    try:
+        table = pa.ipc.open_stream(buffer).read_all()
+    except pa.ArrowInvalid:
+        try:
+            table = pa.ipc.open_file(buffer).read_all()
+        except pa.ArrowInvalid as e:
+            raise PayloadError(f"Payload Arrow inválido: {e}")
+
+    columns = {}
+    for name in INPUT_COLUMNS:
+        if name not in table.column_names:
+            continue
+        column = table.column(name)
+        if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+                or pa.types.is_boolean(column.type)):
+            raise PayloadError(f"Coluna '{name}' deve ser numérica (recebido {column.type})")
+        if column.null_count:
+            # Nulos viram NaN (valores a imputar)
+            column = column.cast(pa.float64())
+        array = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+        columns[name] = array.to_numpy(zero_copy_only=False)
+
+    patient_ids = None
+    if "patient_id" in table.column_names:
+        try:
+            patient_ids = table.column("patient_id").cast(pa.string()).to_pylist()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise PayloadError(f"Coluna 'patient_id' inválida: {e}")
+
+    return ColumnBatch(columns, table.num_rows, patient_ids)
+
+def _decode_msgpack(body: bytes) -> ColumnBatch:
+    msgpack = _import_msgpack()
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise PayloadError(f"Payload MessagePack inválido: {e}")
+    if not isinstance(payload, dict) or not isinstance(payload.get("columns"), dict):
+        raise PayloadError("Payload MessagePack deve ter o mapa 'columns'")
+
+    dtypes = payload.get("dtypes") or {}
+    columns = {}
+    for name in INPUT_COLUMNS:
+        value = payload["columns"].get(name)
+        if value is None:
+            continue
+        try:
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                columns[name] = np.frombuffer(value, dtype=np.dtype(dtypes.get(name, "<f8")))
+            else:
+                columns[name] = np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise PayloadError(f"Coluna '{name}' inválida: {e}")
+
+    patient_ids = payload["columns"].get("patient_id")
+    if patient_ids is not None:
+        if not isinstance(patient_ids, list):
+            raise PayloadError("Coluna 'patient_id' deve ser uma lista de textos")
+        wrong_type = [row for row, pid in enumerate(patient_ids) if pid is not None and not isinstance(pid, str)]
+        if wrong_type:
+            raise PayloadError("Valores inválidos no lote", [
+                {"row": row, "field": "patient_id", "message": "Deve ser texto ou nulo"}
+                for row in wrong_type[:MAX_REPORTED_ERRORS]
+            ])
+    lengths = {len(column) for column in columns.values()}
+    if patient_ids is not None:
+        lengths.add(len(patient_ids))
+    if len(lengths) > 1:
+        raise PayloadError("Todas as colunas devem ter o mesmo número de linhas")
+
+    n_rows = lengths.pop() if lengths else 0
+    return ColumnBatch(columns, n_rows, patient_ids)
+
+def validate_columns(batch: ColumnBatch):
+    """
+    Valida a estrutura do lote (os valores são validados no SepsisService)
+
+    Raises:
+        PayloadError: nenhuma coluna conhecida ou patient_id longo demais (linha, campo, mensagem)
+    """
+    if not batch.columns:
+        raise PayloadError(f"Nenhuma coluna reconhecida; esperado: {', '.join(INPUT_COLUMNS)}")
+
+    if batch.patient_ids is not None:
+        too_long = [row for row, pid in enumerate(batch.patient_ids) if pid and len(pid) > 64]
+        if too_long:
+            raise PayloadError("Valores inválidos no lote", [
+                {"row": row, "field": "patient_id", "message": "Deve ter no máximo 64 caracteres"}
+                for row in too_long[:MAX_REPORTED_ERRORS]
+            ])
+
+def decode_batch(body: bytes, fmt: str) -> ColumnBatch:
+    """Decodifica e valida um lote colunar"""
+    if fmt == FORMAT_ARROW:
+        batch = _decode_arrow(body)
+    elif fmt == FORMAT_MSGPACK:
+        batch = _decode_msgpack(body)
+    else:
+        raise UnsupportedFormat(f"Formato colunar desconhecido: {fmt}")
+    validate_columns(batch)
+    return batch
+
+def encode_batch(result: Dict[str, Any], fmt: str,
+                 patient_ids: Optional[List[Optional[str]]] = None) -> bytes:
+    """Codifica o resultado de predict_batch/predict_batch_columns em colunas"""
+    predictions = np.asarray(result["predictions"], dtype=np.float64)
+    codes = np.asarray(result["risk_codes"], dtype=np.int8)
+    metadata = {
+        "count": result["count"],
+        "timestamp": result["timestamp"],
+        "risk_level_legend": result["risk_level_legend"],
+    }
+    if "imputed_codes" in result:
+        metadata["imputed_fields_legend"] = result["imputed_fields_legend"]
+
+    if fmt == FORMAT_ARROW:
+        pa = _import_pyarrow()
+        arrays = {"prediction": pa.array(predictions), "risk_code": pa.array(codes)}
+        if patient_ids is not None:
+            arrays["patient_id"] = pa.array(patient_ids, type=pa.string())
+        if "risk_levels" in result:
+            arrays["risk_level"] = pa.array(result["risk_levels"], type=pa.string())
+            arrays["message"] = pa.array(result["messages"], type=pa.string())
+        if "imputed_codes" in result:
+            arrays["imputed"] = pa.array(result["imputed_codes"], type=pa.int32())
+        table = pa.table(arrays).replace_schema_metadata(
+            {key: json.dumps(value, ensure_ascii=False) for key, value in metadata.items()}
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    if fmt == FORMAT_MSGPACK:
+        msgpack = _import_msgpack()
+        columns = {"prediction": predictions.astype("<f8").tobytes(), "risk_code": codes.tobytes()}
+        dtypes = {"prediction": "<f8", "risk_code": "i1"}
+        if patient_ids is not None:
+            columns["patient_id"] = list(patient_ids)
+        if "risk_levels" in result:
+            columns["risk_level"] = result["risk_levels"]
+            columns["message"] = result["messages"]
+        if "imputed_codes" in result:
+            columns["imputed"] = np.asarray(result["imputed_codes"], dtype="<i4").tobytes()
+            dtypes["imputed"] = "<i4"
+        return msgpack.packb({**metadata, "columns": columns, "dtypes": dtypes}, use_bin_type=True)
+
+    raise UnsupportedFormat(f"Formato colunar desconhecido: {fmt}")
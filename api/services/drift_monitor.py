@@ -0,0 +1,179 @@
+"""
+Monitor de drift das predições ao vivo
+
+As predições (features informadas e probabilidade) são copiadas para um
+buffer numpy de tamanho fixo no caminho da inferência, o que custa uma
+cópia de linha. Quando o buffer enche (ou na consulta), ele é descarregado
+de uma vez nos sketches KLL e nos histogramas de ml.drift, de modo que o
+custo por predição é amortizado e a memória não cresce com o volume.
+
+Valores imputados não entram nas distribuições: o monitor acompanha o
+que os clientes enviam.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from config import DRIFT_MONITOR_ENABLED, DRIFT_BUFFER_ROWS, DRIFT_SKETCH_K, DRIFT_MIN_SAMPLES
+from ml.drift import KLLSketch, PREDICTION_KEY, psi, ks_statistic, drift_status
+
+# Quantis exibidos no relatório
+REPORT_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+class DriftMonitor:
+    """Sketches e histogramas por feature, comparados com a referência do treino"""
+
+    def __init__(self, enabled: bool = DRIFT_MONITOR_ENABLED, buffer_rows: int = DRIFT_BUFFER_ROWS,
+                 sketch_k: int = DRIFT_SKETCH_K):
+        self.enabled = enabled
+        self.buffer_rows = buffer_rows
+        self.sketch_k = sketch_k
+        self.feature_names: List[str] = []
+        self.labels: List[str] = []
+        self.reference: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._configured = False
+
+    def configure(self, feature_names: Sequence[str], labels: Sequence[Optional[str]],
+                  reference: Optional[Dict[str, Any]]):
+        """Define as colunas monitoradas (ordem da matriz de features) e a referência"""
+        with self._lock:
+            self.feature_names = list(feature_names)
+            # Nome exibido: campo da API quando houver
+            self.labels = [label or name for name, label in zip(feature_names, labels)]
+            self.reference = reference
+            self._configured = True
+            self._reset()
+
+    def _reset(self):
+        n_columns = len(self.feature_names) + 1
+        self._buffer = np.empty((self.buffer_rows, n_columns), dtype=np.float64)
+        self._pending = 0
+        self.sketches = [KLLSketch(self.sketch_k) for _ in range(n_columns)]
+        self.missing = np.zeros(n_columns, dtype=np.int64)
+        self.cuts = []
+        for name in self.feature_names + [PREDICTION_KEY]:
+            stats = (self.reference or {}).get("features", {}).get(name)
+            self.cuts.append(stats["cuts"] if stats is not None else None)
+        self.histograms = [np.zeros(len(cuts) + 1, dtype=np.int64) if cuts is not None else None
+                           for cuts in self.cuts]
+        self.observed = 0
+        self.since = datetime.now().isoformat()
+
+    def reset(self):
+        """Descarta as distribuições acumuladas (ex.: após um retreino)"""
+        with self._lock:
+            if self._configured:
+                self._reset()
+
+    def observe(self, X: np.ndarray, probabilities: np.ndarray, imputed: Optional[np.ndarray] = None):
+        """
+        Registra as linhas de uma predição
+
+        Args:
+            X: Matriz de features (já imputada) usada na predição
+            probabilities: Probabilidade prevista de cada linha
+            imputed: Máscara das células imputadas (excluídas das distribuições)
+        """
+        if not self.enabled or not self._configured:
+            return
+        n_rows = len(X)
+        with self._lock:
+            start = 0
+            while start < n_rows:
+                if self._pending == self.buffer_rows:
+                    self._flush()
+                end = min(n_rows, start + self.buffer_rows - self._pending)
+                rows = slice(self._pending, self._pending + end - start)
+                self._buffer[rows, :-1] = X[start:end]
+                if imputed is not None:
+                    self._buffer[rows, :-1][imputed[start:end]] = np.nan
+                self._buffer[rows, -1] = probabilities[start:end]
+                self._pending += end - start
+                start = end
+            self.observed += n_rows
+
+    def _flush(self):
+        """Descarrega o buffer nos sketches e histogramas (com o lock adquirido)"""
+        if not self._pending:
+            return
+        block = self._buffer[:self._pending]
+        for j in range(block.shape[1]):
+            values = block[:, j]
+            present = values[~np.isnan(values)]
+            self.missing[j] += len(values) - len(present)
+            self.sketches[j].update(present)
+            if self.cuts[j] is not None:
+                bins = np.searchsorted(self.cuts[j], present, side="right")
+                self.histograms[j] += np.bincount(bins, minlength=len(self.histograms[j]))
+        self._pending = 0
+
+    def _column_report(self, j: int, name: str) -> Dict[str, Any]:
+        sketch = self.sketches[j]
+        report = {
+            "count": sketch.n,
+            "missing": int(self.missing[j]),
+            "quantiles": dict(zip(map(str, REPORT_QUANTILES), np.round(sketch.quantiles(REPORT_QUANTILES), 4).tolist()))
+                         if sketch.n else None
+        }
+        stats = (self.reference or {}).get("features", {}).get(name)
+        if stats is None:
+            return report
+
+        report["reference_quantiles"] = dict(zip(
+            map(str, REPORT_QUANTILES),
+            np.round(np.interp(REPORT_QUANTILES, np.linspace(0, 1, len(stats["quantiles"])), stats["quantiles"]), 4).tolist()
+        ))
+        enough = sketch.n >= DRIFT_MIN_SAMPLES
+        psi_value = psi(stats["proportions"], self.histograms[j]) if enough else None
+        report["psi"] = round(psi_value, 4) if psi_value is not None else None
+        report["ks"] = round(ks_statistic(stats["quantiles"], sketch), 4) if enough else None
+        report["status"] = drift_status(psi_value)
+        report["histogram"] = {
+            "cuts": np.asarray(stats["cuts"]).tolist(),
+            "reference": np.round(stats["proportions"], 4).tolist(),
+            "live": np.round(self.histograms[j] / max(self.histograms[j].sum(), 1), 4).tolist()
+        }
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        """Comparação das distribuições ao vivo com a referência"""
+        if not self._configured:
+            return {"enabled": self.enabled, "available": False}
+
+        with self._lock:
+            self._flush()
+            features = {
+                label: self._column_report(j, name)
+                for j, (name, label) in enumerate(zip(self.feature_names, self.labels))
+            }
+            prediction = self._column_report(len(self.feature_names), PREDICTION_KEY)
+            sketch_items = sum(sketch.size for sketch in self.sketches)
+
+        statuses = [item.get("status") for item in list(features.values()) + [prediction]]
+        return {
+            "enabled": self.enabled,
+            "available": True,
+            "since": self.since,
+            "observed": self.observed,
+            "min_samples": DRIFT_MIN_SAMPLES,
+            "reference": {
+                "available": self.reference is not None,
+                "source": (self.reference or {}).get("source"),
+                "n_rows": (self.reference or {}).get("n_rows"),
+                "created_at": (self.reference or {}).get("created_at")
+            },
+            "drifted": [label for label, item in list(features.items()) + [(PREDICTION_KEY, prediction)]
+                        if item.get("status") == "drift"],
+            "status": "no_reference" if self.reference is None else
+                      "drift" if "drift" in statuses else "warning" if "warning" in statuses else
+                      "ok" if "ok" in statuses else "insufficient_data",
+            "features": features,
+            "prediction": prediction,
+            "sketch_items": sketch_items
+        }
+
+# Instância global do monitor
+drift_monitor = DriftMonitor()
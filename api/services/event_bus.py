@@ -0,0 +1,127 @@
+"""
+Distribuição de eventos de mudança de nível de risco para assinantes (SSE)
+
+Cada conexão tem uma fila limitada; quando um assinante lento enche a
+fila ele é desconectado, para que nunca segure memória nem atrase os
+demais. A publicação pode vir de qualquer thread (ex.: predições em um
+executor) e é repassada ao event loop de forma thread-safe.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from typing import Dict, Any, Optional, Set
+
+from config import EVENT_BUFFER_SIZE
+from ml.risk import RISK_LEVELS
+
+class Subscriber:
+    """Conexão inscrita nos eventos, com fila limitada e filtros"""
+
+    def __init__(self, buffer_size: int, unit: Optional[str] = None,
+                 escalations_only: bool = False):
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=buffer_size)
+        self.unit = unit
+        self.escalations_only = escalations_only
+        self.closed = False
+
+    def accepts(self, event: Dict[str, Any]) -> bool:
+        """Verifica se o evento passa pelos filtros da conexão"""
+        if self.unit and event["unit"] != self.unit:
+            return False
+        if self.escalations_only and event["direction"] != "up":
+            return False
+        return True
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Enfileira o evento; retorna False se o assinante estiver lento demais"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Esvazia a fila e envia o marcador de encerramento
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+class RiskEventBus:
+    """Publica transições de nível de risco para todos os assinantes"""
+
+    def __init__(self, buffer_size: int = 100):
+        self.buffer_size = buffer_size
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def subscribe(self, unit: Optional[str] = None, escalations_only: bool = False) -> Subscriber:
+        """Registra uma nova conexão (deve ser chamado dentro do event loop)"""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self.buffer_size, unit, escalations_only)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a conexão"""
+        subscriber.closed = True
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish_transition(self, patient_id: str, unit: str, previous_level: str,
+                           risk_level: str, probability: float, timestamp: str):
+        """Publica um evento se o nível de risco do paciente mudou"""
+        if previous_level == risk_level or not self._subscribers or self._loop is None:
+            return
+
+        previous_code = RISK_LEVELS.index(previous_level) if previous_level in RISK_LEVELS else -1
+        code = RISK_LEVELS.index(risk_level) if risk_level in RISK_LEVELS else -1
+
+        event = {
+            "id": next(self._ids),
+            "patient_id": patient_id,
+            "unit": unit,
+            "previous_risk_level": previous_level,
+            "risk_level": risk_level,
+            "direction": "up" if code > previous_code else "down",
+            "prediction": probability,
+            "timestamp": timestamp
+        }
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._deliver(event)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Dict[str, Any]):
+        """Distribui o evento (executa no event loop)"""
+        self.published += 1
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            if subscriber.accepts(event) and not subscriber.offer(event):
+                self.dropped_subscribers += 1
+                self.unsubscribe(subscriber)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Formata o evento no protocolo Server-Sent Events"""
+    return f"id: {event['id']}\nevent: risk_transition\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+# Instância global do barramento de eventos
+risk_event_bus = RiskEventBus(EVENT_BUFFER_SIZE)
@@ -0,0 +1,168 @@
+"""
+Logging estruturado e não bloqueante
+
+Os registros são formatados como JSON (um objeto por linha) e enfileirados
+por um QueueHandler; uma thread de fundo (QueueListener) faz a escrita em
+stdout, então o caminho das requisições nunca espera pelo terminal. Cada
+registro recebe os campos de contexto da requisição (request_id, trace_id)
+no momento em que é emitido.
+
+O volume fica limitado sob pico: mensagens repetidas acima de
+LOG_RATE_LIMIT por janela são apenas contadas (a próxima emitida informa
+quantas foram suprimidas) e, com a fila cheia, registros novos são
+descartados em vez de bloquear.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_RATE_LIMIT, LOG_RATE_WINDOW_SECONDS
+
+# Campos de contexto da requisição atual (request_id, trace_id, ...)
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+# Atributos padrão de um LogRecord; o restante vem de `extra=` e vai para o JSON
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+def bind_context(**fields):
+    """Associa campos ao contexto atual; retorna o token para reset_context"""
+    return _log_context.set({**_log_context.get(), **fields})
+
+def reset_context(token):
+    _log_context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Copia o contexto da requisição para o registro (roda na thread que emitiu)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """Limita repetições de uma mesma mensagem (logger + template) por janela de tempo"""
+
+    def __init__(self, limit: int = 20, window: float = 60.0):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._counters: Dict[Tuple[str, Any], list] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self.window:
+                suppressed = counter[2] if counter else 0
+                # Evita crescimento sem limite com mensagens muito variadas
+                if counter is None and len(self._counters) >= 10000:
+                    self._counters.clear()
+                self._counters[key] = [now, 1, 0]
+            elif counter[1] < self.limit:
+                counter[1] += 1
+                suppressed = 0
+            else:
+                counter[2] += 1
+                self.suppressed += 1
+                return False
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (e conta) registros com a fila cheia, sem bloquear"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve a mensagem na thread de origem, mantendo o traceback em campo separado
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos extras e de contexto"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_rate_filter: Optional[RateLimitFilter] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(level: str = LOG_LEVEL):
+    """Configura o logger raiz com a fila e a thread de escrita (idempotente)"""
+    global _queue_handler, _rate_filter, _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _rate_filter = RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_WINDOW_SECONDS)
+    _queue_handler.addFilter(_rate_filter)
+    _queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def get_logging_stats() -> Dict[str, Any]:
+    """Registros descartados por fila cheia, suprimidos pelo rate limit e tamanho atual da fila"""
+    if _queue_handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "dropped": _queue_handler.dropped,
+        "suppressed": _rate_filter.suppressed,
+        "queued": _queue_handler.queue.qsize()
+    }
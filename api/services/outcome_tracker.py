@@ -0,0 +1,232 @@
+"""
+Desempenho do modelo com rótulos que chegam atrasados
+
+O SepsisLabel de um paciente chega horas depois das predições. Cada
+desfecho recebido (patient_id, instante, rótulo) é cruzado com as
+predições guardadas no TrajectoryStore, cujo buffer por paciente é
+ordenado no tempo: uma busca binária devolve as predições do paciente
+entre o último desfecho já aplicado e o instante do novo (limitado a
+OUTCOME_LOOKBACK_HOURS), de modo que cada predição recebe um rótulo só
+uma vez.
+
+As predições rotuladas entram em baldes de tempo (pelo instante da
+predição) em um anel que cobre PERFORMANCE_WINDOW_HOURS. Cada balde guarda
+um histograma das probabilidades e a contagem por nível de risco, por
+rótulo; os totais da janela são atualizados a cada inserção e expiração,
+e o AUROC sai do histograma em O(bins), sem reprocessar o histórico.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from config import (
+    OUTCOME_LOOKBACK_HOURS, PERFORMANCE_WINDOW_HOURS, PERFORMANCE_BUCKET_MINUTES,
+    PERFORMANCE_AUROC_BINS, TRAJECTORY_MAX_PATIENTS
+)
+from ml.risk import RISK_LEVELS
+from api.services.trajectory_store import trajectory_store, TrajectoryStore
+
+def auroc_from_histograms(negatives: np.ndarray, positives: np.ndarray) -> Optional[float]:
+    """
+    AUROC a partir das contagens por faixa de probabilidade (faixas em ordem crescente)
+
+    Empates dentro de uma faixa contam meio ponto, como no AUROC exato.
+    """
+    n_negative, n_positive = negatives.sum(), positives.sum()
+    if not n_negative or not n_positive:
+        return None
+    negatives_below = np.cumsum(negatives) - negatives
+    return float(np.sum(positives * (negatives_below + 0.5 * negatives)) / (n_negative * n_positive))
+
+class RollingPerformance:
+    """Contagens por balde de tempo em um anel, com totais da janela mantidos incrementalmente"""
+
+    def __init__(self, window_hours: float = 168, bucket_minutes: float = 60, bins: int = 1000):
+        self.bucket_seconds = bucket_minutes * 60
+        self.n_buckets = max(1, int(np.ceil(window_hours * 60 / bucket_minutes)))
+        self.bins = bins
+        # Eixo 1: rótulo (0 = sem sepse, 1 = sepse)
+        self.histograms = np.zeros((self.n_buckets, 2, bins), dtype=np.int64)
+        self.bands = np.zeros((self.n_buckets, 2, len(RISK_LEVELS)), dtype=np.int64)
+        self.bucket_ids = np.full(self.n_buckets, -1, dtype=np.int64)
+        self.total_histogram = np.zeros((2, bins), dtype=np.int64)
+        self.total_bands = np.zeros((2, len(RISK_LEVELS)), dtype=np.int64)
+        self.expired = 0
+
+    def _bucket(self, timestamp):
+        return np.floor_divide(timestamp, self.bucket_seconds).astype(np.int64)
+
+    def _clear(self, slot: int, bucket_id: int):
+        self.total_histogram -= self.histograms[slot]
+        self.total_bands -= self.bands[slot]
+        self.histograms[slot] = 0
+        self.bands[slot] = 0
+        self.bucket_ids[slot] = bucket_id
+
+    def advance(self, now: float):
+        """Remove dos totais os baldes que saíram da janela"""
+        oldest = int(self._bucket(now)) - self.n_buckets + 1
+        for slot in np.flatnonzero((self.bucket_ids >= 0) & (self.bucket_ids < oldest)):
+            self._clear(slot, -1)
+
+    def add(self, timestamps: np.ndarray, probabilities: np.ndarray, codes: np.ndarray,
+            labels: np.ndarray, now: float):
+        """Acrescenta predições rotuladas; as anteriores à janela são descartadas"""
+        self.advance(now)
+        buckets = self._bucket(timestamps)
+        recent = buckets > int(self._bucket(now)) - self.n_buckets
+        self.expired += int((~recent).sum())
+        if not recent.any():
+            return
+
+        buckets, labels = buckets[recent], labels[recent].astype(np.intp)
+        bins = np.clip((probabilities[recent] * self.bins).astype(np.intp), 0, self.bins - 1)
+        codes = codes[recent].astype(np.intp)
+
+        slots = buckets % self.n_buckets
+        for bucket_id in np.unique(buckets):
+            slot = int(bucket_id % self.n_buckets)
+            if self.bucket_ids[slot] != bucket_id:
+                self._clear(slot, int(bucket_id))
+
+        np.add.at(self.histograms, (slots, labels, bins), 1)
+        np.add.at(self.bands, (slots, labels, codes), 1)
+        np.add.at(self.total_histogram, (labels, bins), 1)
+        np.add.at(self.total_bands, (labels, codes), 1)
+
+    def metrics(self) -> Dict[str, Any]:
+        """AUROC e precisão/recall por nível de risco na janela atual"""
+        negatives, positives = self.total_bands
+        n_positive = int(positives.sum())
+        # Alerta a partir de cada nível: predições com código >= nível
+        alerted = (negatives + positives)[::-1].cumsum()[::-1]
+        true_positives = positives[::-1].cumsum()[::-1]
+
+        bands = []
+        for code, level in enumerate(RISK_LEVELS):
+            total = int(negatives[code] + positives[code])
+            bands.append({
+                "risk_level": level,
+                "predictions": total,
+                "positives": int(positives[code]),
+                "positive_rate": round(float(positives[code]) / total, 4) if total else None,
+                "precision": round(float(true_positives[code]) / alerted[code], 4) if alerted[code] else None,
+                "recall": round(float(true_positives[code]) / n_positive, 4) if n_positive else None
+            })
+
+        auroc = auroc_from_histograms(self.total_histogram[0], self.total_histogram[1])
+        return {
+            "labeled_predictions": int(negatives.sum() + positives.sum()),
+            "positives": n_positive,
+            "auroc": round(auroc, 4) if auroc is not None else None,
+            "bands": bands
+        }
+
+class OutcomeTracker:
+    """Cruza desfechos atrasados com as predições guardadas e mantém as métricas da janela"""
+
+    def __init__(self, store: TrajectoryStore, lookback_hours: float = 6, window_hours: float = 168,
+                 bucket_minutes: float = 60, bins: int = 1000, max_patients: int = 10000):
+        self.store = store
+        self.lookback_seconds = lookback_hours * 3600
+        self.window_hours = window_hours
+        self.bucket_minutes = bucket_minutes
+        self.max_patients = max_patients
+        self.performance = RollingPerformance(window_hours, bucket_minutes, bins)
+        # Instante do último desfecho aplicado por paciente (predições até ele já têm rótulo)
+        self._applied: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.outcomes_received = 0
+        self.predictions_labeled = 0
+
+    def ingest(self, outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Aplica desfechos às predições do paciente
+
+        Args:
+            outcomes: Itens com patient_id, sepsis_label e timestamp (epoch; None = agora)
+
+        Returns:
+            Contagem de predições rotuladas e de desfechos sem predição ou já aplicados
+        """
+        now = time.time()
+        matched = unmatched = stale = 0
+        # Desfechos do mesmo paciente são aplicados em ordem cronológica
+        ordered = sorted(outcomes, key=lambda item: now if item.get("timestamp") is None else item["timestamp"])
+
+        joined = []
+        with self._lock:
+            for outcome in ordered:
+                patient_id = outcome["patient_id"]
+                timestamp = now if outcome.get("timestamp") is None else outcome["timestamp"]
+                applied = self._applied.get(patient_id)
+                if applied is not None and timestamp <= applied:
+                    stale += 1
+                    continue
+
+                start = timestamp - self.lookback_seconds
+                window = self.store.get_window(patient_id, start if applied is None else max(start, applied), timestamp)
+                if window is None or not len(window[0]):
+                    unmatched += 1
+                    continue
+
+                timestamps, probabilities, codes = window
+                if applied is not None:
+                    # A janela é fechada em start: exclui as predições no instante já aplicado
+                    keep = timestamps > applied
+                    timestamps, probabilities, codes = timestamps[keep], probabilities[keep], codes[keep]
+                joined.append((timestamps, probabilities, codes,
+                               np.full(len(timestamps), int(outcome["sepsis_label"]), dtype=np.int8)))
+
+                self._applied[patient_id] = timestamp
+                self._applied.move_to_end(patient_id)
+                if len(self._applied) > self.max_patients:
+                    self._applied.popitem(last=False)
+                matched += len(timestamps)
+
+            # Todas as predições rotuladas entram nas contagens de uma vez
+            if joined:
+                self.performance.add(*(np.concatenate(parts) for parts in zip(*joined)), now)
+            self.outcomes_received += len(outcomes)
+            self.predictions_labeled += matched
+
+        return {
+            "received": len(outcomes),
+            "labeled_predictions": matched,
+            "unmatched": unmatched,
+            "stale": stale,
+            "timestamp": datetime.fromtimestamp(now).isoformat()
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Métricas da janela móvel (pelo instante das predições)"""
+        with self._lock:
+            self.performance.advance(time.time())
+            metrics = self.performance.metrics()
+            totals = {
+                "outcomes_received": self.outcomes_received,
+                "predictions_labeled": self.predictions_labeled,
+                "expired": self.performance.expired
+            }
+
+        return {
+            "window_hours": self.window_hours,
+            "bucket_minutes": self.bucket_minutes,
+            **metrics,
+            **totals,
+            "timestamp": datetime.now().isoformat()
+        }
+
+# Instância global do acompanhamento de desfechos
+outcome_tracker = OutcomeTracker(
+    trajectory_store,
+    lookback_hours=OUTCOME_LOOKBACK_HOURS,
+    window_hours=PERFORMANCE_WINDOW_HOURS,
+    bucket_minutes=PERFORMANCE_BUCKET_MINUTES,
+    bins=PERFORMANCE_AUROC_BINS,
+    max_patients=TRAJECTORY_MAX_PATIENTS
+)
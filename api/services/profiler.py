@@ -0,0 +1,134 @@
+"""
+Profiler por amostragem de todas as threads do processo
+
+Uma thread de fundo lê periodicamente as pilhas de todas as threads
+(sys._current_frames), incluindo o event loop e as threads de executores
+onde roda a inferência, e conta as pilhas repetidas. O custo é
+proporcional à frequência de amostragem, não ao volume de requisições, e
+nada é instrumentado fora da janela de profiling.
+
+Saídas: pilhas colapsadas (flamegraph.pl / speedscope) ou JSON do speedscope.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, Tuple
+
+def _frame_name(code) -> str:
+    filename = os.path.relpath(code.co_filename) if not code.co_filename.startswith("<") else code.co_filename
+    if filename.startswith(".."):
+        filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+class SamplingProfiler:
+    """Coleta pilhas de todas as threads em intervalos fixos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    @staticmethod
+    def _stack(frame, name_cache: Dict[Any, str]) -> Tuple[str, ...]:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            name = name_cache.get(code)
+            if name is None:
+                name = name_cache[code] = _frame_name(code)
+            names.append(name)
+            frame = frame.f_back
+        names.reverse()
+        return tuple(names)
+
+    def profile(self, seconds: float, interval: float = 0.005) -> Dict[str, Any]:
+        """
+        Amostra as pilhas por `seconds` segundos (bloqueia a thread chamadora)
+
+        Returns:
+            Contagem de pilhas por thread e metadados da coleta
+
+        Raises:
+            RuntimeError: se já houver um profiling em andamento
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Já existe um profiling em andamento")
+
+        try:
+            own_id = threading.get_ident()
+            samples: Counter = Counter()
+            # Nomes por code object só durante a coleta (não retém código descarregado entre coletas)
+            name_cache: Dict[Any, str] = {}
+            n_samples = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+
+            while time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    thread_name = names.get(thread_id, f"thread-{thread_id}")
+                    samples[(thread_name,) + self._stack(frame, name_cache)] += 1
+                n_samples += 1
+                time.sleep(interval)
+
+            return {
+                "samples": samples,
+                "n_samples": n_samples,
+                "interval": interval,
+                "duration": time.perf_counter() - start
+            }
+        finally:
+            self._lock.release()
+
+def to_collapsed(result: Dict[str, Any]) -> str:
+    """Formato de pilhas colapsadas: 'thread;f1;f2 contagem' por linha"""
+    return "\n".join(
+        f"{';'.join(stack)} {count}"
+        for stack, count in result["samples"].most_common()
+    ) + "\n"
+
+def to_speedscope(result: Dict[str, Any], name: str = "sepsis-sentinel") -> Dict[str, Any]:
+    """Formato JSON do speedscope (um perfil por thread)"""
+    frames, frame_index = [], {}
+    profiles: Dict[str, Dict[str, Any]] = {}
+    interval_ms = result["interval"] * 1000
+
+    for stack, count in result["samples"].items():
+        thread_name, calls = stack[0], stack[1:]
+        indices = []
+        for call in calls:
+            if call not in frame_index:
+                frame_index[call] = len(frames)
+                frames.append({"name": call})
+            indices.append(frame_index[call])
+
+        profile = profiles.setdefault(thread_name, {
+            "type": "sampled",
+            "name": thread_name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": 0,
+            "samples": [],
+            "weights": []
+        })
+        profile["samples"].append(indices)
+        profile["weights"].append(count * interval_ms)
+        profile["endValue"] += count * interval_ms
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "sepsis-sentinel",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": list(profiles.values())
+    }
+
+# Instância global do profiler
+profiler = SamplingProfiler()
@@ -1,44 +1,119 @@
 """
 Serviço para gerenciar predições de sepse
 """
-import sys
-import os
+import logging
+import threading
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
 
-# Adiciona o diretório raiz ao path para importar o módulo ml
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from config import (
+    SCORE_CACHE_ENABLED, SCORE_CACHE_SIZE, MAX_IMPUTED_FEATURES, DRIFT_REFERENCE_PATH,
+    MODEL_REGISTRY_PATH, MODEL_MEMORY_BUDGET_MB
+)
+from ml.limits import FIELDS, MAX_REPORTED_ERRORS, is_missing, validate_record
+from ml.imputation import imputed_codes
+from ml.risk import RISK_LEVELS, risk_level_names, format_risk_message, format_risk_messages
+from api.services.tracing import tracer
+from api.services.trajectory_store import trajectory_store
+from api.services.ward_index import ward_index, get_ward
+from api.services.event_bus import risk_event_bus
+from api.services.drift_monitor import drift_monitor
 
-try:
-    from ml.predict import SepsisPredictor, predict_sepsis
-    MODEL_AVAILABLE = True
-except Exception as e:
-    print(f"Aviso: Modelo ML não disponível: {e}")
-    MODEL_AVAILABLE = False
+# ml.limits, ml.imputation e ml.risk (só numpy) são importados acima; ml.predict
+# (joblib e, com o modelo, sklearn e pandas), ml.registry e ml.drift só em
+# load_model(), para que importar a API continue rápido
+if TYPE_CHECKING:
+    import numpy as np
+    from ml.limits import ValidationResult
+    from ml.predict import SepsisPredictor
+    from ml.registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+# Estados possíveis do modelo
+MODEL_STATUS_LOADING = "loading"
+MODEL_STATUS_READY = "ready"
+MODEL_STATUS_UNHEALTHY = "unhealthy"
+
+# Header (REST) / metadata (gRPC) com o hospital da requisição, usado na rota de modelos
+TENANT_HEADER = "x-tenant-id"
 
 class SepsisService:
     """Serviço para gerenciar predições de sepse"""
     
     def __init__(self):
-        """Inicializa o serviço"""
-        self.predictor: Optional[SepsisPredictor] = None
+        """Inicializa o serviço sem carregar o modelo"""
+        self.predictor: Optional["SepsisPredictor"] = None
+        self.registry: Optional["ModelRegistry"] = None
         self.model_loaded = False
+        self.model_status = MODEL_STATUS_LOADING
+        self.load_error: Optional[str] = None
+        self.load_time_ms: Optional[float] = None
+        self._load_lock = threading.Lock()
+    
+    def load_model(self) -> bool:
+        """
+        Carrega o modelo ML (pode ser chamado em uma thread de background)
         
-        if MODEL_AVAILABLE:
+        Returns:
+            True se o modelo estiver carregado
+        """
+        with self._load_lock:
+            if self.model_loaded:
+                return True
+            
+            self.model_status = MODEL_STATUS_LOADING
+            start = datetime.now()
+            
             try:
-                self.predictor = SepsisPredictor()
+                with tracer.start_trace("model.load"):
+                    from ml.predict import SepsisPredictor
+                    self.predictor = SepsisPredictor()
+                    if SCORE_CACHE_ENABLED:
+                        self.predictor.enable_score_cache(SCORE_CACHE_SIZE)
+                    from ml.registry import ModelRegistry, load_manifest
+                    self.registry = ModelRegistry(
+                        self.predictor, load_manifest(MODEL_REGISTRY_PATH),
+                        MODEL_MEMORY_BUDGET_MB << 20, self._load_tenant_model
+                    )
+                    from ml.drift import load_reference
+                    drift_monitor.configure(self.predictor.feature_names, self.predictor.input_keys,
+                                            load_reference(DRIFT_REFERENCE_PATH))
                 self.model_loaded = True
-                print("✅ Serviço de sepse inicializado com sucesso")
+                self.model_status = MODEL_STATUS_READY
+                self.load_error = None
             except Exception as e:
-                print(f"❌ Erro ao inicializar serviço: {e}")
+                logger.error("Erro ao inicializar serviço de sepse: %s", e)
+                self.predictor = None
                 self.model_loaded = False
+                self.model_status = MODEL_STATUS_UNHEALTHY
+                self.load_error = str(e)
+            
+            self.load_time_ms = (datetime.now() - start).total_seconds() * 1000
+            if self.model_loaded:
+                logger.info("Serviço de sepse inicializado", extra={
+                    "model_version": self.predictor.model_version,
+                    "load_time_ms": round(self.load_time_ms, 1)
+                })
+            return self.model_loaded
     
-    def predict_sepsis_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _load_tenant_model(self, directory: str) -> "SepsisPredictor":
+        """Carrega um modelo do registro (mesmas features do padrão, para lotes com várias rotas)"""
+        from ml.predict import SepsisPredictor
+        predictor = SepsisPredictor.from_directory(directory)
+        if predictor.feature_names != self.predictor.feature_names:
+            raise ValueError(f"Modelo em '{directory}' usa features diferentes do modelo padrão")
+        if SCORE_CACHE_ENABLED:
+            predictor.enable_score_cache(SCORE_CACHE_SIZE)
+        return predictor
+    
+    def predict_sepsis_risk(self, patient_data: Dict[str, Any], tenant: Optional[str] = None) -> Dict[str, Any]:
         """
         Faz predição de risco de sepse para um paciente
         
         Args:
             patient_data: Dados clínicos do paciente
+            tenant: Hospital da requisição (rota do registro de modelos)
             
         Returns:
             Resultado da predição
@@ -49,15 +124,32 @@ class SepsisService:
                 "error": "Modelo ML não está disponível",
                 "prediction": 0.0,
                 "risk_level": "Erro",
-                "message": "Serviço temporariamente indisponível"
+                "message": "Modelo ainda carregando" if self.model_status == MODEL_STATUS_LOADING
+                           else "Serviço temporariamente indisponível"
             }
         
         try:
-            # Faz a predição usando o módulo ML
-            result = predict_sepsis(patient_data)
+            # Usa o preditor já carregado em vez de recarregar o modelo
+            with tracer.span("service.predict_sepsis_risk", model_version=self.predictor.model_version):
+                with tracer.span("model.preprocess"):
+                    X = self.predictor.preprocess_input(patient_data)
+                with tracer.span("model.predict_proba", rows=1):
+                    probabilities, codes, imputed, models = self.registry.predict_matrix(X, tenant)
+                drift_monitor.observe(X, probabilities, imputed)
+                probability, code = float(probabilities[0]), int(codes[0])
+                risk_level, message = RISK_LEVELS[code], format_risk_message(code, probability)
+            
+            result = {
+                "prediction": round(float(probability), 4),
+                "risk_level": risk_level,
+                "message": message,
+                "imputed_fields": self.predictor.imputed_fields(imputed[0]),
+                "model": next(iter(models)),
+                "success": True,
+                "timestamp": datetime.now().isoformat()
+            }
             
-            # Adiciona timestamp
-            result["timestamp"] = datetime.now().isoformat()
+            self._record_prediction(patient_data, result)
             
             return result
             
@@ -71,13 +163,259 @@ class SepsisService:
                 "timestamp": datetime.now().isoformat()
             }
     
+    def explain_sepsis_risk(self, patient_data: Dict[str, Any], tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Faz predição de risco de sepse com a contribuição de cada feature
+        
+        Args:
+            patient_data: Dados clínicos do paciente
+            tenant: Hospital da requisição (rota do registro de modelos)
+            
+        Returns:
+            Resultado da predição com as contribuições ordenadas por impacto
+        """
+        if not self.model_loaded:
+            return {
+                "success": False,
+                "error": "Modelo ML não está disponível"
+            }
+        
+        try:
+            from ml.predict import FEATURE_MAPPING
+            
+            model = self.registry.route(self.predictor.preprocess_input(patient_data), tenant)[0][0]
+            predictor = self.registry.get(model)
+            with tracer.span("model.explain", model_version=predictor.model_version):
+                explanation = predictor.explain(patient_data)
+            input_keys = {value: key for key, value in FEATURE_MAPPING.items()}
+            
+            contributions = [
+                {
+                    "feature": input_keys.get(name, name),
+                    "value": explanation["values"][name],
+                    "contribution": round(contribution, 4)
+                }
+                for name, contribution in sorted(
+                    explanation["contributions"].items(),
+                    key=lambda item: abs(item[1]),
+                    reverse=True
+                )
+            ]
+            
+            return {
+                "success": True,
+                "prediction": round(explanation["probability"], 4),
+                "risk_level": explanation["risk_level"],
+                "message": explanation["message"],
+                "raw_prediction": round(explanation["raw_probability"], 4),
+                "base_value": round(explanation["bias"], 4),
+                "contributions": contributions,
+                "imputed_fields": explanation["imputed_fields"],
+                "model": model,
+                "timestamp": datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    def predict_batch(self, rows: List[Dict[str, Any]], include_messages: bool = False,
+                      tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Faz predição de risco de sepse para um lote de pacientes
+        
+        Args:
+            rows: Dados clínicos de cada paciente
+            include_messages: Gera nomes dos níveis e mensagens por linha
+            tenant: Hospital da requisição; as linhas são agrupadas por modelo de destino
+            
+        Returns:
+            Probabilidades e códigos de risco (nomes/mensagens se solicitados)
+        """
+        if not self.model_loaded:
+            return {
+                "success": False,
+                "error": "Modelo ML não está disponível"
+            }
+        
+        try:
+            with tracer.span("model.predict_batch", rows=len(rows),
+                             model_version=self.predictor.model_version):
+                X = self.predictor.preprocess_batch(rows)
+                validation = self._validate_batch(X)
+                if not validation.valid:
+                    return self._invalid_batch(validation)
+                probabilities, codes, imputed, models = self.registry.predict_matrix(X, tenant)
+                drift_monitor.observe(X, probabilities, imputed)
+            probabilities = probabilities.round(4)
+            timestamp = datetime.now().isoformat()
+            
+            result = {
+                "success": True,
+                "count": len(rows),
+                "predictions": probabilities.tolist(),
+                "risk_codes": codes.tolist(),
+                "risk_level_legend": RISK_LEVELS,
+                "models": models,
+                "timestamp": timestamp
+            }
+            
+            if include_messages:
+                result["risk_levels"] = risk_level_names(codes)
+                result["messages"] = format_risk_messages(codes, probabilities)
+            self._add_imputation(result, imputed, as_list=True)
+            
+            # Apenas as linhas identificadas alimentam o acompanhamento por paciente
+            for i, row in enumerate(rows):
+                if row.get("patient_id"):
+                    self._record_prediction(row, {
+                        "prediction": result["predictions"][i],
+                        "risk_level": RISK_LEVELS[result["risk_codes"][i]],
+                        "timestamp": timestamp
+                    })
+            
+            return result
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    def predict_batch_columns(self, columns: Dict[str, "np.ndarray"], n_rows: int,
+                              patient_ids: Optional[List[Optional[str]]] = None,
+                              include_messages: bool = False, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Faz predição de um lote recebido em colunas (Arrow/MessagePack)
+        
+        Igual a predict_batch, mas sem objetos por linha: as colunas viram a
+        matriz de features diretamente e o resultado mantém arrays numpy
+        ("predictions", "risk_codes") para serem codificados em colunas.
+        """
+        if not self.model_loaded:
+            return {
+                "success": False,
+                "error": "Modelo ML não está disponível"
+            }
+        
+        try:
+            with tracer.span("model.predict_batch", rows=n_rows, format="columnar",
+                             model_version=self.predictor.model_version):
+                X = self.predictor.preprocess_columns(columns, n_rows)
+                validation = self._validate_batch(X)
+                if not validation.valid:
+                    return self._invalid_batch(validation)
+                probabilities, codes, imputed, models = self.registry.predict_matrix(X, tenant)
+                drift_monitor.observe(X, probabilities, imputed)
+            probabilities = probabilities.round(4)
+            timestamp = datetime.now().isoformat()
+            
+            result = {
+                "success": True,
+                "count": n_rows,
+                "predictions": probabilities,
+                "risk_codes": codes,
+                "risk_level_legend": RISK_LEVELS,
+                "models": models,
+                "timestamp": timestamp
+            }
+            
+            if include_messages:
+                result["risk_levels"] = risk_level_names(codes)
+                result["messages"] = format_risk_messages(codes, probabilities)
+            self._add_imputation(result, imputed, as_list=False)
+            
+            for i, patient_id in enumerate(patient_ids or []):
+                if patient_id:
+                    row = {"patient_id": patient_id}
+                    row.update({key: float(columns[key][i]) for key in ("unit1", "unit2") if key in columns})
+                    self._record_prediction(row, {
+                        "prediction": float(probabilities[i]),
+                        "risk_level": RISK_LEVELS[codes[i]],
+                        "timestamp": timestamp
+                    })
+            
+            return result
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    def _validate_batch(self, X: "np.ndarray") -> "ValidationResult":
+        """Limites fisiológicos dos valores informados e máximo de campos ausentes por linha"""
+        validation = self.predictor.validate_matrix(X)
+        fields = [j for j, key in enumerate(self.predictor.input_keys) if key]
+        too_many_missing = (X[:, fields] != X[:, fields]).sum(axis=1) > MAX_IMPUTED_FEATURES
+        if too_many_missing.any():
+            validation.add_rule("missing_values", too_many_missing, None,
+                                f"Mais de {MAX_IMPUTED_FEATURES} campos ausentes")
+        return validation
+    
+    def _add_imputation(self, result: Dict[str, Any], imputed: "np.ndarray", as_list: bool):
+        """Acrescenta ao resultado quais campos foram imputados em cada linha (só se houver)"""
+        codes, legend = imputed_codes(imputed, self.predictor.input_keys)
+        result["imputed_rows"] = int((codes != 0).sum())
+        if result["imputed_rows"]:
+            result["imputed_codes"] = codes.tolist() if as_list else codes
+            result["imputed_fields_legend"] = legend
+    
+    @staticmethod
+    def _invalid_batch(validation: "ValidationResult") -> Dict[str, Any]:
+        """Resultado de um lote rejeitado pelos limites fisiológicos"""
+        return {
+            "success": False,
+            "error": "Valores inválidos no lote",
+            "invalid_rows": int(validation.invalid.sum()),
+            "validation_errors": [
+                {"row": row, "field": field, "message": message}
+                for row, field, message in validation.errors(MAX_REPORTED_ERRORS)
+            ],
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _record_prediction(self, patient_data: Dict[str, Any], result: Dict[str, Any]):
+        """Registra a predição nas estruturas de acompanhamento do paciente"""
+        patient_id = patient_data.get("patient_id")
+        if not patient_id:
+            return
+        
+        ward = get_ward(patient_data)
+        
+        trajectory_store.record(patient_id, result["prediction"], result["risk_level"])
+        previous = ward_index.update(
+            patient_id,
+            ward,
+            result["prediction"],
+            result["risk_level"],
+            result["timestamp"]
+        )
+        
+        if previous is not None:
+            risk_event_bus.publish_transition(
+                patient_id,
+                ward,
+                previous["risk_level"],
+                result["risk_level"],
+                result["prediction"],
+                result["timestamp"]
+            )
+    
     def get_health_status(self) -> Dict[str, Any]:
-        """Retorna o status de saúde do serviço"""
+        """Retorna o status de prontidão do serviço (loading/ready/unhealthy)"""
         return {
-            "status": "healthy" if self.model_loaded else "unhealthy",
+            "status": self.model_status,
             "ml_model_loaded": self.model_loaded,
             "timestamp": datetime.now().isoformat(),
-            "service": "SepsisService"
+            "service": "SepsisService",
+            "load_time_ms": self.load_time_ms,
+            "error": self.load_error
         }
     
     def get_model_info(self) -> Dict[str, Any]:
@@ -91,8 +429,14 @@ class SepsisService:
         try:
             return {
                 "available": True,
+                "model_version": self.predictor.model_version,
                 "features": self.predictor.get_available_features(),
-                "feature_importance": self.predictor.get_feature_importance()
+                "feature_importance": self.predictor.get_feature_importance(),
+                "calibration": self.predictor.get_calibration_info(),
+                "imputation": self.predictor.get_imputation_info(),
+                "registry": self.registry.get_stats(),
+                "score_cache": self.predictor.score_cache.get_stats()
+                               if self.predictor.score_cache else {"enabled": False}
             }
         except Exception as e:
             return {
@@ -110,35 +454,18 @@ class SepsisService:
         Returns:
             Resultado da validação
         """
-        required_fields = [
-            'hr', 'o2sat', 'temp', 'sbp', 'dbp', 'map', 
-            'resp', 'age', 'gender', 'unit1', 'unit2', 
-            'hosp_adm_time', 'iculos'
-        ]
-        
-        missing_fields = [field for field in required_fields if field not in data]
+        # Até MAX_IMPUTED_FEATURES campos podem faltar (imputados na predição)
+        missing_fields = [field for field in FIELDS if is_missing(data.get(field))]
         
-        if missing_fields:
+        if len(missing_fields) > MAX_IMPUTED_FEATURES:
             return {
                 "valid": False,
                 "missing_fields": missing_fields,
-                "message": f"Campos obrigatórios ausentes: {', '.join(missing_fields)}"
+                "message": f"Campos ausentes demais (máximo {MAX_IMPUTED_FEATURES}): {', '.join(missing_fields)}"
             }
         
-        # Validações básicas de range
-        validation_errors = []
-        
-        if 'hr' in data and (data['hr'] < 40 or data['hr'] > 200):
-            validation_errors.append("Frequência cardíaca deve estar entre 40-200 bpm")
-        
-        if 'o2sat' in data and (data['o2sat'] < 0 or data['o2sat'] > 100):
-            validation_errors.append("Saturação de oxigênio deve estar entre 0-100%")
-        
-        if 'temp' in data and (data['temp'] < 35 or data['temp'] > 42):
-            validation_errors.append("Temperatura deve estar entre 35-42°C")
-        
-        if 'age' in data and (data['age'] < 0 or data['age'] > 150):
-            validation_errors.append("Idade deve estar entre 0-150 anos")
+        # Mesmos limites fisiológicos aplicados aos lotes (ml.limits)
+        validation_errors = validate_record(data)
         
         if validation_errors:
             return {
@@ -0,0 +1,222 @@
+"""
+Spans de rastreamento por requisição (modelo de dados compatível com OpenTelemetry)
+
+Cada requisição amostrada gera um trace com spans aninhados (API, serviço,
+modelo), identificadores no formato W3C (trace_id de 32 e span_id de 16
+caracteres hex) e atributos como request_id e versão do modelo. Os spans
+são exportados em memória (consultáveis pela API) ou em arquivo JSON Lines
+por uma thread de fundo, sem depender de um coletor.
+
+A amostragem é decidida no início do trace: requisições não amostradas
+usam spans nulos, com custo desprezível.
+"""
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import TRACE_SAMPLE_RATE, TRACE_EXPORTER, TRACE_FILE, TRACE_BUFFER_SIZE
+
+class Span:
+    """Operação cronometrada dentro de um trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name",
+                 "start_time_unix_nano", "end_time_unix_nano", "attributes", "status")
+
+    def __init__(self, trace_id: str, name: str, parent_span_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.status = "UNSET"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round((self.end_time_unix_nano - self.start_time_unix_nano) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status
+        }
+
+class _NoopSpan:
+    """Span usado quando a requisição não foi amostrada"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class InMemorySpanExporter:
+    """Mantém os spans mais recentes em memória"""
+
+    def __init__(self, max_spans: int = 1000):
+        self._spans: deque = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self._spans.append(span.to_dict())
+
+    def get_spans(self, limit: int = 100, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        spans = list(self._spans)
+        if trace_id:
+            spans = [span for span in spans if span["trace_id"] == trace_id]
+        return spans[-limit:]
+
+class FileSpanExporter(InMemorySpanExporter):
+    """Grava os spans em JSON Lines por uma thread de fundo (mantém também os recentes em memória)"""
+
+    def __init__(self, path: str, max_spans: int = 1000):
+        super().__init__(max_spans)
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+        threading.Thread(target=self._writer, name="span-exporter", daemon=True).start()
+
+    def export(self, span: Span):
+        super().export(span)
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as output:
+            while True:
+                output.write(json.dumps(self._queue.get(), ensure_ascii=False) + "\n")
+                if self._queue.empty():
+                    output.flush()
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+def parse_traceparent(traceparent: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Lê o header W3C traceparent (versão-trace_id-parent_id-flags)
+
+    Returns:
+        (trace_id, parent_id, amostrado); None se ausente ou malformado,
+        caso em que um trace novo é iniciado
+    """
+    if not traceparent:
+        return None
+    match = _TRACEPARENT.match(traceparent.strip().lower())
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    # IDs só com zeros são inválidos pela especificação
+    if not int(trace_id, 16) or not int(parent_id, 16):
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+class Tracer:
+    """Cria traces amostrados e spans aninhados via contextvars"""
+
+    def __init__(self, sample_rate: float = 1.0, exporter: Optional[InMemorySpanExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def _should_sample(self, parent: Optional[Tuple[str, str, bool]]) -> Optional[str]:
+        """Retorna o trace_id a usar, ou None se o trace não for amostrado"""
+        if self.exporter is None:
+            return None
+
+        # Respeita a decisão de quem chamou
+        if parent is not None:
+            trace_id, _, sampled = parent
+            return trace_id if sampled else None
+
+        if random.random() >= self.sample_rate:
+            return None
+        return f"{random.getrandbits(128):032x}"
+
+    @contextmanager
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes):
+        """Inicia o span raiz de uma requisição"""
+        parent = parse_traceparent(traceparent)
+        trace_id = self._should_sample(parent)
+        if trace_id is None:
+            yield _NOOP_SPAN
+            return
+
+        parent_id = parent[1] if parent is not None else None
+        span = Span(trace_id, name, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "ERROR"
+            span.set_attribute("exception.message", str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Cria um span filho do span atual (nulo se não houver trace amostrado)"""
+        parent = _current_span.get()
+        if parent is None:
+            yield _NOOP_SPAN
+            return
+
+        span = Span(parent.trace_id, name, parent.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "ERROR"
+            span.set_attribute("exception.message", str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record_span(self, name: str, start_time_unix_nano: int, **attributes):
+        """Registra um span já concluído (ex.: etapa medida fora do nosso código)"""
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span(parent.trace_id, name, parent.span_id, attributes)
+        span.start_time_unix_nano = start_time_unix_nano
+        self._finish(span)
+
+    def current_span(self):
+        return _current_span.get() or _NOOP_SPAN
+
+    def _finish(self, span: Span):
+        span.end_time_unix_nano = time.time_ns()
+        if span.status == "UNSET":
+            span.status = "OK"
+        self.exporter.export(span)
+
+def _build_exporter() -> Optional[InMemorySpanExporter]:
+    if TRACE_EXPORTER == "file":
+        return FileSpanExporter(TRACE_FILE, TRACE_BUFFER_SIZE)
+    if TRACE_EXPORTER == "memory":
+        return InMemorySpanExporter(TRACE_BUFFER_SIZE)
+    return None
+
+# Instância global do tracer
+tracer = Tracer(TRACE_SAMPLE_RATE, _build_exporter())
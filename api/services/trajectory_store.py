@@ -0,0 +1,183 @@
+"""
+Armazenamento da trajetória de risco por paciente
+
+Cada paciente tem um buffer circular de tamanho fixo com
+(timestamp, probabilidade, nível de risco) em arrays numpy, de modo que
+a memória por paciente é constante e as consultas dependem apenas da
+capacidade do buffer, nunca do histórico total.
+"""
+import threading
+import time
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from config import TRAJECTORY_CAPACITY, TRAJECTORY_MAX_PATIENTS
+from ml.risk import RISK_LEVELS
+
+class PatientTrajectory:
+    """Buffer circular de predições de um paciente"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.probabilities = np.zeros(capacity, dtype=np.float32)
+        self.risk_codes = np.zeros(capacity, dtype=np.int8)
+        self.next_index = 0
+        self.count = 0
+        self.total_recorded = 0
+
+    def append(self, timestamp: float, probability: float, risk_code: int):
+        """Adiciona um ponto, sobrescrevendo o mais antigo quando cheio"""
+        # Mantém a ordem temporal mesmo se o relógio voltar
+        if self.count and timestamp < self.timestamps[(self.next_index - 1) % self.capacity]:
+            timestamp = float(self.timestamps[(self.next_index - 1) % self.capacity])
+
+        self.timestamps[self.next_index] = timestamp
+        self.probabilities[self.next_index] = probability
+        self.risk_codes[self.next_index] = risk_code
+        self.next_index = (self.next_index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.total_recorded += 1
+
+    def _segments(self) -> List[slice]:
+        """Fatias contíguas do buffer em ordem cronológica"""
+        if self.count < self.capacity:
+            return [slice(0, self.count)]
+        if self.next_index == 0:
+            return [slice(0, self.capacity)]
+        return [slice(self.next_index, self.capacity), slice(0, self.next_index)]
+
+    def window(self, start: Optional[float], end: Optional[float]):
+        """Retorna (timestamps, probabilidades, códigos) dentro de [start, end]"""
+        parts = []
+        for segment in self._segments():
+            ts = self.timestamps[segment]
+            lo = 0 if start is None else np.searchsorted(ts, start, side="left")
+            hi = len(ts) if end is None else np.searchsorted(ts, end, side="right")
+            if hi > lo:
+                offset = segment.start
+                parts.append(slice(offset + lo, offset + hi))
+
+        if not parts:
+            empty = np.array([], dtype=np.float64)
+            return empty, empty.astype(np.float32), empty.astype(np.int8)
+
+        return (
+            np.concatenate([self.timestamps[p] for p in parts]),
+            np.concatenate([self.probabilities[p] for p in parts]),
+            np.concatenate([self.risk_codes[p] for p in parts]),
+        )
+
+def downsample(timestamps: np.ndarray, probabilities: np.ndarray,
+               risk_codes: np.ndarray, points: int) -> Dict[str, np.ndarray]:
+    """
+    Agrupa a série em até `points` intervalos de tempo iguais
+
+    Para cada intervalo retorna o timestamp médio, a probabilidade média,
+    a probabilidade máxima, o pior nível de risco e a quantidade de pontos.
+    """
+    n = len(timestamps)
+    if n <= points:
+        return {
+            "timestamps": timestamps,
+            "mean": probabilities.astype(np.float64),
+            "max": probabilities.astype(np.float64),
+            "risk_codes": risk_codes,
+            "counts": np.ones(n, dtype=np.int64),
+        }
+
+    edges = np.linspace(timestamps[0], timestamps[-1], points + 1)
+    bucket = np.clip(np.searchsorted(edges, timestamps, side="right") - 1, 0, points - 1)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, n])
+
+    return {
+        "timestamps": np.add.reduceat(timestamps, starts) / counts,
+        "mean": np.add.reduceat(probabilities.astype(np.float64), starts) / counts,
+        "max": np.maximum.reduceat(probabilities, starts).astype(np.float64),
+        "risk_codes": np.maximum.reduceat(risk_codes, starts),
+        "counts": counts,
+    }
+
+class TrajectoryStore:
+    """Trajetórias de todos os pacientes, com limite de pacientes (LRU)"""
+
+    def __init__(self, capacity: int = 1440, max_patients: int = 10000):
+        self.capacity = capacity
+        self.max_patients = max_patients
+        self._patients: "OrderedDict[str, PatientTrajectory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, patient_id: str, probability: float, risk_level: str,
+               timestamp: Optional[float] = None):
+        """Registra uma predição na trajetória do paciente"""
+        risk_code = RISK_LEVELS.index(risk_level) if risk_level in RISK_LEVELS else 0
+        timestamp = time.time() if timestamp is None else timestamp
+
+        with self._lock:
+            trajectory = self._patients.get(patient_id)
+            if trajectory is None:
+                trajectory = PatientTrajectory(self.capacity)
+                self._patients[patient_id] = trajectory
+                if len(self._patients) > self.max_patients:
+                    self._patients.popitem(last=False)
+            else:
+                self._patients.move_to_end(patient_id)
+            trajectory.append(timestamp, probability, risk_code)
+
+    def get_window(self, patient_id: str, start: Optional[float] = None, end: Optional[float] = None):
+        """
+        Predições brutas do paciente em [start, end] (busca binária no buffer ordenado)
+
+        Returns:
+            (timestamps, probabilidades, códigos) ou None se o paciente não existe
+        """
+        with self._lock:
+            trajectory = self._patients.get(patient_id)
+            if trajectory is None:
+                return None
+            return trajectory.window(start, end)
+
+    def get_trajectory(self, patient_id: str, start: Optional[float] = None,
+                       end: Optional[float] = None, points: int = 200) -> Optional[Dict[str, Any]]:
+        """
+        Retorna a trajetória reamostrada do paciente na janela [start, end]
+
+        Returns:
+            Dicionário com os pontos da série ou None se o paciente não existe
+        """
+        with self._lock:
+            trajectory = self._patients.get(patient_id)
+            if trajectory is None:
+                return None
+            timestamps, probabilities, risk_codes = trajectory.window(start, end)
+            total_recorded = trajectory.total_recorded
+            stored = trajectory.count
+
+        series = downsample(timestamps, probabilities, risk_codes, points)
+
+        return {
+            "patient_id": patient_id,
+            "total_recorded": total_recorded,
+            "stored_points": stored,
+            "window_points": int(len(timestamps)),
+            "points": [
+                {
+                    "timestamp": datetime.fromtimestamp(ts).isoformat(),
+                    "prediction": round(float(mean), 4),
+                    "max_prediction": round(float(peak), 4),
+                    "risk_level": RISK_LEVELS[int(code)],
+                    "count": int(count),
+                }
+                for ts, mean, peak, code, count in zip(
+                    series["timestamps"], series["mean"], series["max"],
+                    series["risk_codes"], series["counts"]
+                )
+            ],
+        }
+
+# Instância global do armazenamento de trajetórias
+trajectory_store = TrajectoryStore(TRAJECTORY_CAPACITY, TRAJECTORY_MAX_PATIENTS)
@@ -0,0 +1,209 @@
+"""
+Índice do último score de cada paciente, particionado por unidade
+
+Cada unidade mantém um heap de máximo indexado pela probabilidade mais
+recente do paciente: atualizar um paciente custa O(log n) e consultar os
+K pacientes de maior risco custa O(K log K), sem percorrer a unidade.
+
+O índice guarda no máximo TRAJECTORY_MAX_PATIENTS pacientes (o mesmo limite
+do TrajectoryStore): ao passar dele, o paciente atualizado há mais tempo é
+removido do registro e dos heaps.
+"""
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import TRAJECTORY_MAX_PATIENTS
+
+# Partições disponíveis ("all" reúne todas as unidades)
+WARD_UNIT1 = "unit1"
+WARD_UNIT2 = "unit2"
+WARD_OTHER = "other"
+WARD_ALL = "all"
+WARDS = [WARD_UNIT1, WARD_UNIT2, WARD_OTHER, WARD_ALL]
+
+def get_ward(patient_data: Dict[str, Any]) -> str:
+    """Determina a unidade do paciente a partir das flags unit1/unit2"""
+    if patient_data.get("unit1") == 1:
+        return WARD_UNIT1
+    if patient_data.get("unit2") == 1:
+        return WARD_UNIT2
+    return WARD_OTHER
+
+class IndexedMaxHeap:
+    """Heap de máximo com posição por chave, permitindo atualizar e remover em O(log n)"""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.scores: List[float] = []
+        self.positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _swap(self, i: int, j: int):
+        self.keys[i], self.keys[j] = self.keys[j], self.keys[i]
+        self.scores[i], self.scores[j] = self.scores[j], self.scores[i]
+        self.positions[self.keys[i]] = i
+        self.positions[self.keys[j]] = j
+
+    def _sift_up(self, i: int):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self.scores[i] <= self.scores[parent]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        n = len(self.keys)
+        while True:
+            largest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self.scores[child] > self.scores[largest]:
+                    largest = child
+            if largest == i:
+                break
+            self._swap(i, largest)
+            i = largest
+
+    def update(self, key: str, score: float):
+        """Insere a chave ou altera seu score"""
+        i = self.positions.get(key)
+        if i is None:
+            self.keys.append(key)
+            self.scores.append(score)
+            self.positions[key] = len(self.keys) - 1
+            self._sift_up(len(self.keys) - 1)
+            return
+
+        old = self.scores[i]
+        self.scores[i] = score
+        if score > old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, key: str):
+        """Remove a chave, se existir"""
+        i = self.positions.pop(key, None)
+        if i is None:
+            return
+
+        last = len(self.keys) - 1
+        if i != last:
+            self.keys[i] = self.keys[last]
+            self.scores[i] = self.scores[last]
+            self.positions[self.keys[i]] = i
+        self.keys.pop()
+        self.scores.pop()
+
+        if i < len(self.keys):
+            self._sift_up(i)
+            self._sift_down(i)
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """Retorna as K maiores entradas explorando o heap a partir da raiz"""
+        result = []
+        if not self.keys:
+            return result
+
+        frontier = [(-self.scores[0], 0)]
+        while frontier and len(result) < k:
+            neg_score, i = heapq.heappop(frontier)
+            result.append((self.keys[i], -neg_score))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.keys):
+                    heapq.heappush(frontier, (-self.scores[child], child))
+        return result
+
+class WardIndex:
+    """Último score de cada paciente, com um heap por unidade e LRU de pacientes"""
+
+    def __init__(self, max_patients: int = 10000):
+        self.max_patients = max_patients
+        self._heaps: Dict[str, IndexedMaxHeap] = {ward: IndexedMaxHeap() for ward in WARDS}
+        self._latest: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _remove(self, patient_id: str, previous: Dict[str, Any]):
+        self._heaps[previous["ward"]].remove(patient_id)
+        self._heaps[WARD_ALL].remove(patient_id)
+
+    def update(self, patient_id: str, ward: str, probability: float,
+               risk_level: str, timestamp: str) -> Optional[Dict[str, Any]]:
+        """
+        Atualiza o score mais recente do paciente (move de unidade se necessário)
+
+        Returns:
+            Registro anterior do paciente ou None se é a primeira predição
+        """
+        with self._lock:
+            previous = self._latest.get(patient_id)
+            if previous is not None and previous["ward"] != ward:
+                self._heaps[previous["ward"]].remove(patient_id)
+
+            self._latest[patient_id] = {
+                "ward": ward,
+                "prediction": probability,
+                "risk_level": risk_level,
+                "timestamp": timestamp
+            }
+            self._latest.move_to_end(patient_id)
+            self._heaps[ward].update(patient_id, probability)
+            self._heaps[WARD_ALL].update(patient_id, probability)
+
+            # Descarta o paciente sem atualização há mais tempo
+            if len(self._latest) > self.max_patients:
+                evicted, evicted_latest = self._latest.popitem(last=False)
+                self._remove(evicted, evicted_latest)
+                self.evictions += 1
+            return previous
+
+    def get_latest(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o último score registrado do paciente"""
+        with self._lock:
+            latest = self._latest.get(patient_id)
+            return dict(latest) if latest else None
+
+    def remove(self, patient_id: str):
+        """Remove o paciente do índice (ex.: alta hospitalar)"""
+        with self._lock:
+            previous = self._latest.pop(patient_id, None)
+            if previous is not None:
+                self._remove(patient_id, previous)
+
+    def get_top(self, ward: str, k: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        Retorna os K pacientes de maior risco da unidade
+
+        Returns:
+            Dicionário com os pacientes ordenados ou None se a unidade não existe
+        """
+        heap = self._heaps.get(ward)
+        if heap is None:
+            return None
+
+        with self._lock:
+            top = heap.top(k)
+            patients = [
+                {
+                    "patient_id": patient_id,
+                    "prediction": round(float(score), 4),
+                    "risk_level": self._latest[patient_id]["risk_level"],
+                    "timestamp": self._latest[patient_id]["timestamp"]
+                }
+                for patient_id, score in top
+            ]
+            total = len(heap)
+
+        return {
+            "unit": ward,
+            "total_patients": total,
+            "patients": patients
+        }
+
+# Instância global do índice por unidade
+ward_index = WardIndex(max_patients=TRAJECTORY_MAX_PATIENTS)
@@ -48,6 +48,14 @@ FASTAPI_CONFIG = {
     "workers": 1
 }
 
+# Servidor gRPC (api.rpc.server), alternativa binária ao REST
+GRPC_PORT = int(os.environ.get("GRPC_PORT", 50051))
+
+# Micro-lotes do PredictStream: máximo de mensagens por lote e espera extra (ms) para juntar
+# mensagens; com 0 só são agrupadas as que já chegaram (sem latência adicional)
+GRPC_STREAM_BATCH_SIZE = int(os.environ.get("GRPC_STREAM_BATCH_SIZE", 64))
+GRPC_STREAM_BATCH_WAIT_MS = float(os.environ.get("GRPC_STREAM_BATCH_WAIT_MS", 0))
+
 # -----------------------------------------------------------------------------
 # Configurações do Modelo ML
 # -----------------------------------------------------------------------------
@@ -58,12 +66,95 @@ MODEL_PATHS = {
     "feature_info": os.environ.get("FEATURE_INFO_PATH", "ml/feature_info.joblib")
 }
 
+# Modo de carregamento do modelo na inicialização da API:
+#   "background" - a API aceita conexões imediatamente e carrega o modelo em segundo plano
+#   "eager"      - o modelo é carregado antes da API começar a responder
+MODEL_LOAD_MODE = os.environ.get("MODEL_LOAD_MODE", "background").lower()
+
+# Cache de scores por faixas de limiares do modelo (resultados idênticos, opcional)
+SCORE_CACHE_ENABLED = os.environ.get("SCORE_CACHE_ENABLED", "false").lower() == "true"
+SCORE_CACHE_SIZE = int(os.environ.get("SCORE_CACHE_SIZE", 100000))
+
+# Registro de modelos por unidade/hospital (manifesto JSON; ausente = apenas o modelo padrão)
+MODEL_REGISTRY_PATH = os.environ.get("MODEL_REGISTRY_PATH", "ml/registry.json")
+
+# Orçamento de memória (MB) dos modelos do registro carregados sob demanda (LRU)
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", 2048))
+
+# Número máximo de pacientes por requisição em /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+
+# Máximo de campos ausentes por paciente (imputados pela mediana da unidade)
+MAX_IMPUTED_FEATURES = int(os.environ.get("MAX_IMPUTED_FEATURES", 4))
+
+# Monitor de drift: sketches das entradas e da probabilidade comparados com a referência do treino
+DRIFT_MONITOR_ENABLED = os.environ.get("DRIFT_MONITOR_ENABLED", "true").lower() == "true"
+DRIFT_REFERENCE_PATH = os.environ.get("DRIFT_REFERENCE_PATH", "ml/drift_reference.joblib")
+# Linhas acumuladas antes de atualizar os sketches (custo amortizado no caminho da inferência)
+DRIFT_BUFFER_ROWS = int(os.environ.get("DRIFT_BUFFER_ROWS", 1024))
+# Precisão do sketch KLL (erro de posto ~1.7/k)
+DRIFT_SKETCH_K = int(os.environ.get("DRIFT_SKETCH_K", 200))
+# Amostras mínimas por feature para calcular PSI/KS
+DRIFT_MIN_SAMPLES = int(os.environ.get("DRIFT_MIN_SAMPLES", 500))
+
+# -----------------------------------------------------------------------------
+# Configurações de Monitoramento de Pacientes
+# -----------------------------------------------------------------------------
+
+# Pontos mantidos por paciente no buffer circular da trajetória de risco
+TRAJECTORY_CAPACITY = int(os.environ.get("TRAJECTORY_CAPACITY", 1440))
+
+# Número máximo de pacientes em memória (os menos recentes são descartados)
+TRAJECTORY_MAX_PATIENTS = int(os.environ.get("TRAJECTORY_MAX_PATIENTS", 10000))
+
+# Eventos enfileirados por conexão SSE antes de o assinante lento ser desconectado
+EVENT_BUFFER_SIZE = int(os.environ.get("EVENT_BUFFER_SIZE", 100))
+
+# Intervalo (segundos) entre heartbeats nas conexões SSE
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", 15))
+
+# Desfechos atrasados (POST /outcomes): idade máxima (horas) das predições rotuladas por um desfecho
+OUTCOME_LOOKBACK_HOURS = float(os.environ.get("OUTCOME_LOOKBACK_HOURS", 6))
+
+# Janela móvel das métricas de desempenho ao vivo e tamanho de cada balde
+PERFORMANCE_WINDOW_HOURS = float(os.environ.get("PERFORMANCE_WINDOW_HOURS", 168))
+PERFORMANCE_BUCKET_MINUTES = float(os.environ.get("PERFORMANCE_BUCKET_MINUTES", 60))
+
+# Faixas de probabilidade do histograma usado no AUROC incremental
+PERFORMANCE_AUROC_BINS = int(os.environ.get("PERFORMANCE_AUROC_BINS", 1000))
+
 # -----------------------------------------------------------------------------
 # Configurações de Log
 # -----------------------------------------------------------------------------
 
 # Nível de log baseado no ambiente
-LOG_LEVEL = "INFO" if RAILWAY_ENVIRONMENT else "DEBUG"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO" if RAILWAY_ENVIRONMENT else "DEBUG").upper()
+
+# Formato das linhas de log: json (estruturado) ou text
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+
+# Registros aguardando escrita; com a fila cheia os novos são descartados (e contados)
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+
+# Máximo de repetições da mesma mensagem por janela; as excedentes são apenas contadas
+LOG_RATE_LIMIT = int(os.environ.get("LOG_RATE_LIMIT", 20))
+LOG_RATE_WINDOW_SECONDS = float(os.environ.get("LOG_RATE_WINDOW_SECONDS", 60))
+
+# -----------------------------------------------------------------------------
+# Configurações de Rastreamento (tracing)
+# -----------------------------------------------------------------------------
+
+# Fração das requisições rastreadas (decidida no início de cada trace)
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0.01 if RAILWAY_ENVIRONMENT else 1.0))
+
+# Destino dos spans: "memory" (consultáveis em /traces), "file" (JSON Lines) ou "none"
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "memory").lower()
+
+# Arquivo usado pelo exportador "file"
+TRACE_FILE = os.environ.get("TRACE_FILE", "logs/traces.jsonl")
+
+# Spans mantidos em memória
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", 1000))
 
 # -----------------------------------------------------------------------------
 # Funções de Utilidade
@@ -103,6 +194,52 @@ if RAILWAY_ENVIRONMENT:
 # Chave secreta para sessões (em produção, deve ser definida via variável de ambiente)
 SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-production")
 
+# Token exigido (header X-Admin-Token) nos endpoints /admin; sem ele os endpoints ficam desativados
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", None)
+
+# Duração máxima (segundos) de um profiling solicitado via /admin/profile
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 60))
+
+# -----------------------------------------------------------------------------
+# Controle de Admissão (rate limit e concorrência de inferência)
+# -----------------------------------------------------------------------------
+
+# Token bucket por cliente (API key ou IP) nos endpoints /predict
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_PER_SECOND = float(os.environ.get("RATE_LIMIT_PER_SECOND", 20))
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", 40))
+
+# memory (por worker) ou redis (compartilhado entre workers; requer REDIS_URL e o pacote redis)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()
+
+# Usa o IP de X-Forwarded-For acrescentado pelo proxy confiável (atrás do proxy do Railway o IP
+# direto é o do proxy); as entradas à esquerda vêm do cliente e não são usadas
+TRUST_FORWARDED_FOR = os.environ.get("TRUST_FORWARDED_FOR", str(RAILWAY_ENVIRONMENT)).lower() == "true"
+
+# Quantidade de proxies confiáveis à frente da API: o IP do cliente é a N-ésima entrada da direita
+TRUSTED_PROXY_HOPS = max(1, int(os.environ.get("TRUSTED_PROXY_HOPS", 1)))
+
+def _parse_api_keys(value: str) -> dict:
+    """'chave:classe,chave2:classe' -> {chave: classe}; classe padrão 'standard'"""
+    keys = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        key, _, priority = item.partition(":")
+        keys[key] = priority or "standard"
+    return keys
+
+# API keys conhecidas (header X-API-Key) e sua classe de prioridade: alert, standard ou batch
+API_KEYS = _parse_api_keys(os.environ.get("API_KEYS", ""))
+
+# Inferências simultâneas por worker; o restante espera na fila por prioridade
+MAX_CONCURRENT_INFERENCE = int(os.environ.get("MAX_CONCURRENT_INFERENCE", 4))
+
+# Inferências simultâneas da classe batch (reserva capacidade para alertas)
+MAX_CONCURRENT_BATCH = int(os.environ.get("MAX_CONCURRENT_BATCH", 2))
+
+# Tamanho da fila de espera e tempo máximo de espera antes de responder 503
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", 100))
+ADMISSION_TIMEOUT_SECONDS = float(os.environ.get("ADMISSION_TIMEOUT_SECONDS", 2))
+
 # -----------------------------------------------------------------------------
 # Configurações de Banco de Dados (futuro)
 # -----------------------------------------------------------------------------
@@ -0,0 +1,155 @@
+"""
+Cliente HTTP da Sepsis Sentinel API
+
+Usa uma sessão com pool de conexões (keep-alive), repete chamadas que
+falharam por problemas transitórios com backoff exponencial e jitter, e
+agrupa requisições idênticas em andamento: se várias threads pedem a
+mesma coisa ao mesmo tempo, apenas uma requisição vai para a API.
+
+Não depende do Streamlit, podendo ser usado também por scripts em lote.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status HTTP considerados transitórios (vale a pena tentar de novo);
+# 429 e 503 da API são recusas antes da inferência, seguras para repetir
+RETRY_STATUS = {429, 502, 503, 504}
+
+# Espera máxima (segundos) respeitando o header Retry-After
+MAX_RETRY_AFTER = 5
+
+class SepsisApiClient:
+    """Cliente reutilizável da API com pool de conexões, retry e coalescência"""
+
+    def __init__(self, base_url: str, timeout: float = 10, retries: int = 2,
+                 backoff: float = 0.3, pool_size: int = 10, api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        if api_key:
+            # Identifica o cliente no rate limit e define sua classe de prioridade
+            self.session.headers["X-API-Key"] = api_key
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def close(self):
+        """Libera as conexões do pool"""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _sleep_before_retry(self, attempt: int, retry_after: Optional[str] = None):
+        """Backoff exponencial com jitter completo (ou o Retry-After da API, limitado)"""
+        if retry_after and retry_after.isdigit():
+            time.sleep(min(int(retry_after), MAX_RETRY_AFTER) + random.uniform(0, self.backoff))
+            return
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def _send(self, method: str, path: str, payload: Any = None,
+              params: Optional[Dict[str, Any]] = None,
+              timeout: Optional[float] = None) -> requests.Response:
+        """Envia a requisição, repetindo em falhas transitórias"""
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                response = self.session.request(
+                    method, url, json=payload, params=params,
+                    timeout=timeout or self.timeout
+                )
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+            except requests.exceptions.ConnectionError:
+                # A requisição não chegou à API: é seguro repetir
+                if attempt == self.retries:
+                    raise
+            except requests.exceptions.Timeout:
+                # Um POST pode ter sido processado; só GET é repetido
+                if method != "GET" or attempt == self.retries:
+                    raise
+            self._sleep_before_retry(attempt, retry_after)
+
+    def _request(self, method: str, path: str, payload: Any = None,
+                 params: Optional[Dict[str, Any]] = None,
+                 timeout: Optional[float] = None) -> requests.Response:
+        """Executa a requisição, reaproveitando uma idêntica que já esteja em andamento"""
+        body = json.dumps(payload, sort_keys=True, default=str) if payload is not None else ""
+        key = hashlib.sha1(
+            f"{method} {path} {sorted((params or {}).items())} {body}".encode()
+        ).hexdigest()
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            response = self._send(method, path, payload, params, timeout)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def health(self) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Verifica se a API está pronta"""
+        try:
+            response = self._request("GET", "/health", timeout=5)
+            return response.status_code == 200, response.json()
+        except Exception:
+            return False, None
+
+    def predict(self, patient_data: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        """Faz predição de sepse de um paciente"""
+        try:
+            response = self._request("POST", "/predict", payload=patient_data)
+            return response.status_code == 200, response.json()
+        except Exception as e:
+            return False, {"error": str(e)}
+
+    def predict_batch(self, patients: List[Dict[str, Any]],
+                      include_messages: bool = False) -> Tuple[bool, Dict[str, Any]]:
+        """Faz predição de sepse de um lote de pacientes"""
+        try:
+            response = self._request(
+                "POST", "/predict/batch",
+                payload={"patients": patients},
+                params={"include_messages": str(include_messages).lower()},
+                timeout=max(self.timeout, 60)
+            )
+            return response.status_code == 200, response.json()
+        except Exception as e:
+            return False, {"error": str(e)}
+
+    def predict_async(self, patient_data: Dict[str, Any]) -> "Future[Tuple[bool, Dict[str, Any]]]":
+        """Versão não bloqueante de predict (retorna um Future)"""
+        return self._executor.submit(self.predict, patient_data)
+
+    def predict_batch_async(self, patients: List[Dict[str, Any]],
+                            include_messages: bool = False) -> "Future[Tuple[bool, Dict[str, Any]]]":
+        """Versão não bloqueante de predict_batch (retorna um Future)"""
+        return self._executor.submit(self.predict_batch, patients, include_messages)
@@ -2,12 +2,12 @@
 Frontend Streamlit para detecção de sepse com design elegante
 """
 import streamlit as st
-import requests
 import json
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+import tempfile
 import time
 
 # -----------------------------------------------------------------------------
@@ -178,31 +178,29 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 try:
-    from config import get_api_url
+    from config import get_api_url, MAX_IMPUTED_FEATURES
     API_BASE_URL = get_api_url()
 except ImportError:
     # Fallback para configuração manual
     API_BASE_URL = os.environ.get("API_URL", "http://localhost:8000")
+    MAX_IMPUTED_FEATURES = int(os.environ.get("MAX_IMPUTED_FEATURES", 4))
 
+from frontend.api_client import SepsisApiClient
+from ml.limits import form_limits, expected_map, validate_columns
+
+@st.cache_resource
+def get_api_client():
+    """Cliente da API compartilhado entre sessões e reruns (mantém o pool de conexões)"""
+    return SepsisApiClient(API_BASE_URL)
+
+@st.cache_data(ttl=10, show_spinner=False)
 def check_api_health():
-    """Verifica se a API está funcionando"""
-    try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=5)
-        return response.status_code == 200, response.json()
-    except:
-        return False, None
+    """Verifica se a API está funcionando (resultado reaproveitado por alguns segundos)"""
+    return get_api_client().health()
 
 def predict_sepsis(patient_data):
     """Faz predição de sepse via API"""
-    try:
-        response = requests.post(
-            f"{API_BASE_URL}/predict",
-            json=patient_data,
-            timeout=10
-        )
-        return response.status_code == 200, response.json()
-    except Exception as e:
-        return False, {"error": str(e)}
+    return get_api_client().predict(patient_data)
 
 # -----------------------------------------------------------------------------
 # Funções para renderizar as "páginas"
@@ -219,12 +217,12 @@ def show_form_page():
         st.subheader("💓 Sinais Vitais")
         hr = st.number_input(
             "Frequência Cardíaca (bpm)", 
-            min_value=40, max_value=200, value=80,
+            **form_limits("hr"), value=80,
             help="Batimentos por minuto. Normal: 60-100 bpm."
         )
         o2sat = st.number_input(
             "Saturação de Oxigênio (%)", 
-            min_value=0, max_value=100, value=98,
+            **form_limits("o2sat"), value=98,
             help="Saturação de oxigênio em porcentagem."
         )
 
@@ -232,12 +230,12 @@ def show_form_page():
         st.subheader("🌡️ Respiração e Temperatura")
         temp = st.number_input(
             "Temperatura Corporal (°C)", 
-            min_value=35.0, max_value=42.0, value=37.0, step=0.1,
+            **form_limits("temp", float), value=37.0, step=0.1,
             help="Normal: 36.5-37.5°C."
         )
         resp = st.number_input(
             "Taxa Respiratória (rpm)", 
-            min_value=0, max_value=100, value=18,
+            **form_limits("resp"), value=18,
             help="Respirações por minuto. Normal: 12-20 rpm."
         )
 
@@ -245,12 +243,12 @@ def show_form_page():
         st.subheader("💉 Pressão Arterial")
         sbp = st.number_input(
             "Pressão Sistólica (mmHg)", 
-            min_value=0, max_value=300, value=120,
+            **form_limits("sbp"), value=120,
             help="O valor mais alto da pressão. Normal: ~120 mmHg."
         )
         dbp = st.number_input(
             "Pressão Diastólica (mmHg)", 
-            min_value=0, max_value=200, value=80,
+            **form_limits("dbp"), value=80,
             help="O valor mais baixo da pressão. Normal: ~80 mmHg."
         )
 
@@ -262,7 +260,7 @@ def show_form_page():
         st.subheader("👤 Dados Demográficos")
         age = st.number_input(
             "Idade (anos)", 
-            min_value=0, max_value=150, value=45,
+            **form_limits("age"), value=45,
             help="Idade do paciente em anos."
         )
         gender = st.selectbox(
@@ -276,12 +274,12 @@ def show_form_page():
         st.subheader("🏥 Dados Hospitalares")
         hosp_adm_time = st.number_input(
             "Tempo de Internação (horas)", 
-            min_value=0, value=24,
+            **form_limits("hosp_adm_time"), value=24,
             help="Tempo de internação em horas."
         )
         iculos = st.number_input(
             "Tempo na UTI (horas)", 
-            min_value=0, value=48,
+            **form_limits("iculos"), value=48,
             help="Número de horas na UTI."
         )
 
@@ -299,7 +297,7 @@ def show_form_page():
         )[0]
 
     # Calcula MAP automaticamente
-    map_val = (sbp + 2 * dbp) / 3
+    map_val = expected_map(sbp, dbp)
 
     st.markdown("<br>", unsafe_allow_html=True)
     _, col_button, _ = st.columns([2, 3, 2])
@@ -467,77 +465,308 @@ def show_result_page():
         st.session_state.page = 'form'
         st.rerun()
 
+# Colunas esperadas no CSV de lote (mesmos campos do SepsisInput)
+BATCH_COLUMNS = [
+    "hr", "o2sat", "temp", "sbp", "dbp", "map", "resp", "age",
+    "gender", "unit1", "unit2", "hosp_adm_time", "iculos"
+]
+
+# Linhas enviadas à API por requisição no upload em lote
+BATCH_CHUNK_SIZE = 500
+
+# Avaliação linha a linha quando um bloco é rejeitado: no máximo BATCH_FALLBACK_MAX_ROWS
+# linhas por bloco, a BATCH_FALLBACK_RATE requisições/s (abaixo do rate limit da API)
+BATCH_FALLBACK_MAX_ROWS = 50
+BATCH_FALLBACK_RATE = 10
+
+# CSVs avaliados ficam em um diretório próprio; os de sessões encerradas são apagados
+# após BATCH_OUTPUT_TTL_HOURS
+BATCH_OUTPUT_DIR = os.path.join(tempfile.gettempdir(), "sepsis_batch")
+BATCH_OUTPUT_TTL_HOURS = 6
+
+def _remove_batch_output():
+    """Apaga o CSV avaliado anterior da sessão e os antigos de outras sessões"""
+    batch_result = st.session_state.pop("batch_result", None)
+    paths = [batch_result["path"]] if batch_result else []
+    if os.path.isdir(BATCH_OUTPUT_DIR):
+        cutoff = time.time() - BATCH_OUTPUT_TTL_HOURS * 3600
+        paths += [entry.path for entry in os.scandir(BATCH_OUTPUT_DIR) if entry.stat().st_mtime < cutoff]
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _count_csv_rows(uploaded_file):
+    """Conta as linhas de dados lendo o arquivo em blocos"""
+    uploaded_file.seek(0)
+    lines = sum(block.count(b"\n") for block in iter(lambda: uploaded_file.read(1 << 20), b""))
+    uploaded_file.seek(0)
+    return max(lines - 1, 0)
+
+def _score_chunk(chunk):
+    """Envia um bloco de pacientes para /predict/batch e devolve o bloco pontuado"""
+    chunk = chunk.copy()
+    if "map" not in chunk.columns and {"sbp", "dbp"} <= set(chunk.columns):
+        # Calcula MAP como no formulário
+        chunk["map"] = expected_map(chunk["sbp"], chunk["dbp"]).round(1)
+
+    # Mesmos limites da API (ml.limits): linhas inválidas já saem com o erro, sem ir à API.
+    # Células vazias são enviadas como ausentes e imputadas pela API
+    values = chunk.reindex(columns=BATCH_COLUMNS).apply(pd.to_numeric, errors="coerce")
+    validation = validate_columns({col: values[col].to_numpy(dtype=float) for col in BATCH_COLUMNS},
+                                  allow_missing=True)
+    valid = ~validation.invalid
+    chunk["probabilidade"] = None
+    chunk["nivel_risco"] = None
+    chunk["imputados"] = ""
+    chunk["erro"] = validation.row_messages()
+    if not valid.any():
+        return chunk
+
+    sent = values.loc[valid]
+    patients = sent.astype(object).where(sent.notna(), None).to_dict(orient="records")
+    if "patient_id" in chunk.columns:
+        for patient, patient_id in zip(patients, chunk.loc[valid, "patient_id"]):
+            patient["patient_id"] = None if pd.isna(patient_id) else str(patient_id)
+
+    success, result = get_api_client().predict_batch(patients, include_messages=True)
+    if success:
+        chunk.loc[valid, "probabilidade"] = result["predictions"]
+        chunk.loc[valid, "nivel_risco"] = result["risk_levels"]
+        if result.get("imputed_codes"):
+            legend = result["imputed_fields_legend"]
+            chunk.loc[valid, "imputados"] = [
+                ", ".join(field for bit, field in enumerate(legend) if code >> bit & 1)
+                for code in result["imputed_codes"]
+            ]
+        return chunk
+
+    # O lote foi rejeitado (ex.: patient_id inválido): avalia linha a linha para isolar o erro,
+    # limitado e espaçado para não esbarrar no rate limit da API
+    batch_error = result.get("error") or result.get("detail") or "Erro desconhecido"
+    if isinstance(batch_error, list):
+        batch_error = "; ".join(str(item.get("msg", item.get("message", item))) for item in batch_error)
+    probabilities, levels, errors = [], [], []
+    for i, patient in enumerate(patients):
+        if i >= BATCH_FALLBACK_MAX_ROWS:
+            probabilities.append(None)
+            levels.append(None)
+            errors.append(f"Bloco rejeitado pela API: {batch_error}")
+            continue
+        if i:
+            time.sleep(1 / BATCH_FALLBACK_RATE)
+        row_success, row_result = get_api_client().predict(patient)
+        probabilities.append(row_result.get("prediction") if row_success else None)
+        levels.append(row_result.get("risk_level") if row_success else None)
+        if row_success:
+            errors.append("")
+        else:
+            # Erros de validação chegam em "detail" (lista de problemas)
+            detail = row_result.get("error") or row_result.get("detail") or "Erro desconhecido"
+            if isinstance(detail, list):
+                detail = "; ".join(str(item.get("msg", item.get("message", item))) for item in detail)
+            errors.append(str(detail))
+    chunk.loc[valid, "probabilidade"] = probabilities
+    chunk.loc[valid, "nivel_risco"] = levels
+    chunk.loc[valid, "erro"] = errors
+    return chunk
+
+def show_batch_page():
+    """Renderiza a página de avaliação em lote via upload de CSV"""
+    st.header("📂 Avaliação em Lote")
+    st.markdown(
+        "Envie um CSV com as colunas `" + "`, `".join(BATCH_COLUMNS) + "` "
+        "(`map` e `patient_id` são opcionais; células vazias são imputadas pela API). O arquivo é lido e enviado à API "
+        f"em blocos de {BATCH_CHUNK_SIZE} pacientes."
+    )
+
+    uploaded_file = st.file_uploader("Arquivo CSV de pacientes", type=["csv"])
+    if uploaded_file is None:
+        return
+
+    header = pd.read_csv(uploaded_file, nrows=0).columns
+    # MAP ausente só é imputado se não puder ser calculado de sbp e dbp
+    missing = [col for col in BATCH_COLUMNS if col not in header
+               and not (col == "map" and {"sbp", "dbp"} <= set(header))]
+    if len(missing) > MAX_IMPUTED_FEATURES:
+        # A API recusaria todas as linhas: não há o que avaliar
+        st.error(f"❌ Colunas ausentes demais no CSV (máximo {MAX_IMPUTED_FEATURES} imputadas): "
+                 f"{', '.join(missing)}")
+        return
+    if missing:
+        st.warning(f"⚠️ Colunas ausentes no CSV (serão imputadas pela API): {', '.join(missing)}")
+
+    if st.button("🔬 Avaliar Lote", type="primary"):
+        _remove_batch_output()
+        total_rows = _count_csv_rows(uploaded_file)
+        progress = st.progress(0.0, text="Iniciando avaliação...")
+
+        # O resultado é gravado em disco bloco a bloco, sem acumular na memória;
+        # o arquivo é apagado na próxima avaliação ou ao limpar o resultado
+        os.makedirs(BATCH_OUTPUT_DIR, exist_ok=True)
+        output = tempfile.NamedTemporaryFile(mode="w", suffix=".csv", dir=BATCH_OUTPUT_DIR,
+                                             delete=False, encoding="utf-8")
+        done, errors, high_risk = 0, 0, 0
+        with output:
+            for i, chunk in enumerate(pd.read_csv(uploaded_file, chunksize=BATCH_CHUNK_SIZE)):
+                scored = _score_chunk(chunk)
+                scored.to_csv(output, index=False, header=(i == 0))
+
+                done += len(scored)
+                errors += int((scored["erro"] != "").sum())
+                high_risk += int(scored["nivel_risco"].isin(["Alto", "Crítico"]).sum())
+                progress.progress(
+                    min(done / max(total_rows, 1), 1.0),
+                    text=f"{done} de {total_rows} pacientes avaliados"
+                )
+
+        st.session_state.batch_result = {
+            "path": output.name,
+            "file_name": uploaded_file.name.rsplit(".", 1)[0] + "_avaliado.csv",
+            "done": done,
+            "errors": errors,
+            "high_risk": high_risk
+        }
+
+    batch_result = st.session_state.get("batch_result")
+    if batch_result and not os.path.exists(batch_result["path"]):
+        # Arquivo expirado (BATCH_OUTPUT_TTL_HOURS): é preciso avaliar de novo
+        st.session_state.pop("batch_result")
+        st.info("O resultado anterior expirou; avalie o lote novamente.")
+        batch_result = None
+    if batch_result:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Pacientes avaliados", batch_result["done"])
+        col2.metric("Risco alto/crítico", batch_result["high_risk"])
+        col3.metric("Linhas com erro", batch_result["errors"])
+
+        # O st.download_button lê o arquivo inteiro para a memória (o Streamlit não
+        # serve arquivos em streaming): o pico de memória do lote volta no download
+        with open(batch_result["path"], "rb") as scored_file:
+            st.download_button(
+                "⬇️ Baixar CSV avaliado",
+                data=scored_file,
+                file_name=batch_result["file_name"],
+                mime="text/csv"
+            )
+        if st.button("🗑️ Limpar resultado"):
+            _remove_batch_output()
+            st.rerun()
+
+# Predições exibidas por página no histórico
+HISTORY_PAGE_SIZE = 10
+
+# Pontos máximos no gráfico de evolução (séries maiores são reamostradas)
+HISTORY_CHART_MAX_POINTS = 300
+
+def _sync_history_cache():
+    """Converte apenas as predições novas em linhas de exibição e séries do gráfico"""
+    cache = st.session_state.setdefault("history_cache", {
+        "rows": [],
+        "timestamps": [],
+        "probabilities": []
+    })
+    predictions = st.session_state.predictions
+
+    for pred in predictions[len(cache["rows"]):]:
+        timestamp = datetime.fromisoformat(pred["timestamp"])
+        cache["rows"].append({
+            'Data/Hora': timestamp.strftime("%d/%m/%Y %H:%M"),
+            'Risco': pred["result"]["risk_level"],
+            'Probabilidade': f"{pred['result']['prediction']:.1%}",
+            'Frequência Cardíaca (bpm)': pred["patient_data"]["hr"],
+            'Saturação de Oxigênio (%)': pred["patient_data"]["o2sat"],
+            'Temperatura Corporal (°C)': f"{pred['patient_data']['temp']:.1f}",
+            'Pressão Sistólica (mmHg)': pred["patient_data"]["sbp"],
+            'Pressão Diastólica (mmHg)': pred["patient_data"]["dbp"]
+        })
+        cache["timestamps"].append(timestamp)
+        cache["probabilities"].append(float(pred["result"]["prediction"]))
+
+    return cache
+
+def _downsample_series(timestamps, values, max_points):
+    """Reduz a série a no máximo max_points, mantendo o pico de cada intervalo"""
+    if len(values) <= max_points:
+        return timestamps, values
+
+    bucket_size = -(-len(values) // max_points)
+    sampled_timestamps, sampled_values = [], []
+    for start in range(0, len(values), bucket_size):
+        bucket = values[start:start + bucket_size]
+        peak = max(range(len(bucket)), key=bucket.__getitem__)
+        sampled_timestamps.append(timestamps[start + peak])
+        sampled_values.append(bucket[peak])
+    return sampled_timestamps, sampled_values
+
 def show_history_page():
     """Renderiza a página de histórico de predições"""
     st.header("📊 Histórico de Predições")
 
     if "predictions" in st.session_state and st.session_state.predictions:
-        # Cria DataFrame com histórico na vertical
-        history_data = []
-        for pred in st.session_state.predictions:
-            # Dados da predição
-            pred_data = {
-                'Data/Hora': datetime.fromisoformat(pred["timestamp"]).strftime("%d/%m/%Y %H:%M"),
-                'Risco': pred["result"]["risk_level"],
-                'Probabilidade': f"{pred['result']['prediction']:.1%}",
-                'Frequência Cardíaca (bpm)': pred["patient_data"]["hr"],
-                'Saturação de Oxigênio (%)': pred["patient_data"]["o2sat"],
-                'Temperatura Corporal (°C)': f"{pred['patient_data']['temp']:.1f}",
-                'Pressão Sistólica (mmHg)': pred["patient_data"]["sbp"],
-                'Pressão Diastólica (mmHg)': pred["patient_data"]["dbp"]
-            }
-            
-                         # Adiciona cada campo como uma linha separada
-            for field, value in pred_data.items():
-                history_data.append({
-                    'Campo': field,
-                    'Valor': value
-                })
-        
-        # Cria DataFrame final na vertical
+        cache = _sync_history_cache()
+        total = len(cache["rows"])
+        total_pages = -(-total // HISTORY_PAGE_SIZE)
+
+        # Página 1 traz as predições mais recentes
+        page = st.number_input(
+            f"Página (de {total_pages})",
+            min_value=1,
+            max_value=total_pages,
+            value=1,
+            step=1,
+            key="history_page"
+        )
+        end = total - (page - 1) * HISTORY_PAGE_SIZE
+        start = max(0, end - HISTORY_PAGE_SIZE)
+        page_indices = range(end - 1, start - 1, -1)
+
+        # Tabela na vertical apenas com as predições da página
+        history_data = [
+            {'Campo': field, 'Valor': value}
+            for i in page_indices
+            for field, value in cache["rows"][i].items()
+        ]
         history_df = pd.DataFrame(history_data)
         
-        # Exibe a tabela na vertical sem índices usando container estável
-        if 'history_container' not in st.session_state:
-            st.session_state.history_container = st.empty()
-        
-        with st.session_state.history_container.container():
-            st.dataframe(
-                history_df, 
-                use_container_width=True, 
-                hide_index=True,
-                height=400,  # Altura fixa
-                column_config={
-                    "Campo": st.column_config.TextColumn(
-                        "Campo",
-                        width="medium",
-                        help="Campo clínico analisado"
-                    ),
-                    "Valor": st.column_config.TextColumn(
-                        "Valor",
-                        width="medium",
-                        help="Valor correspondente ao campo"
-                    )
-                }
-            )
+        st.dataframe(
+            history_df, 
+            use_container_width=True, 
+            hide_index=True,
+            height=400,  # Altura fixa
+            column_config={
+                "Campo": st.column_config.TextColumn(
+                    "Campo",
+                    width="medium",
+                    help="Campo clínico analisado"
+                ),
+                "Valor": st.column_config.TextColumn(
+                    "Valor",
+                    width="medium",
+                    help="Valor correspondente ao campo"
+                )
+            }
+        )
         
         # Adiciona separador visual entre predições
         st.markdown("---")
-        st.markdown("**📋 Resumo das Predições:**")
+        st.markdown(f"**📋 Resumo das Predições** ({start + 1}–{end} de {total}):")
         
-        # Mostra resumo compacto por predição
-        for i, pred in enumerate(st.session_state.predictions):
-            st.markdown(f"**Predição {i+1}** - {datetime.fromisoformat(pred['timestamp']).strftime('%d/%m/%Y %H:%M')}")
-            st.markdown(f"- Risco: {pred['result']['risk_level']} | Probabilidade: {pred['result']['prediction']:.1%}")
-            st.markdown("---")
+        # Resumo compacto da página em um único bloco
+        st.markdown("\n".join(
+            f"**Predição {i+1}** - {cache['rows'][i]['Data/Hora']}  \n"
+            f"- Risco: {cache['rows'][i]['Risco']} | Probabilidade: {cache['rows'][i]['Probabilidade']}\n"
+            for i in page_indices
+        ))
 
         # Gráfico de evolução temporal
-        if len(history_data) > 1:
+        if total > 1:
             st.subheader("📈 Evolução Temporal")
 
-            # Converte probabilidades para valores numéricos
-            prob_values = [float(pred["result"]["prediction"]) for pred in st.session_state.predictions]
-            timestamps = [datetime.fromisoformat(pred["timestamp"]) for pred in st.session_state.predictions]
+            timestamps, prob_values = _downsample_series(
+                cache["timestamps"], cache["probabilities"], HISTORY_CHART_MAX_POINTS
+            )
 
             fig = px.line(
                 x=timestamps,
@@ -644,7 +873,7 @@ Os resultados são preditivos e devem ser interpretados por um profissional de s
 """)
 
 # Navegação por tabs
-tab1, tab2, tab3 = st.tabs(["🔍 Predição", "📊 Histórico", "ℹ️ Sobre"])
+tab1, tab2, tab3, tab4 = st.tabs(["🔍 Predição", "📂 Lote (CSV)", "📊 Histórico", "ℹ️ Sobre"])
 
 with tab1:
     if st.session_state.page == 'form':
@@ -653,9 +882,12 @@ with tab1:
         show_result_page()
 
 with tab2:
-    show_history_page()
+    show_batch_page()
 
 with tab3:
+    show_history_page()
+
+with tab4:
     show_about_page()
 
 # Rodapé
@@ -0,0 +1,75 @@
+"""
+Calibração das probabilidades da floresta
+
+O treinamento ajusta uma regressão isotônica em dados separados do ajuste
+do modelo e salva apenas os pontos da função (x, y) como uma tabela de
+interpolação. Na inferência a calibração é um np.interp sobre o array de
+probabilidades, sem depender do sklearn.
+"""
+import joblib
+import numpy as np
+from typing import Dict, Any, Optional
+
+def calibration_metrics(y_true: np.ndarray, y_prob: np.ndarray, n_bins: int = 10) -> Dict[str, float]:
+    """Brier score e erro de calibração esperado (ECE) em faixas iguais de probabilidade"""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_prob = np.asarray(y_prob, dtype=np.float64)
+
+    bins = np.minimum((y_prob * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    mean_prob = np.bincount(bins, weights=y_prob, minlength=n_bins)
+    mean_true = np.bincount(bins, weights=y_true, minlength=n_bins)
+    ece = np.abs(mean_prob - mean_true).sum() / len(y_prob)
+
+    return {
+        "brier": float(np.mean((y_prob - y_true) ** 2)),
+        "ece": float(ece)
+    }
+
+def fit_calibration(y_true: np.ndarray, y_prob: np.ndarray) -> Dict[str, Any]:
+    """
+    Ajusta a regressão isotônica e retorna a tabela de interpolação
+
+    Returns:
+        Dicionário com os pontos "x" e "y" da função calibrada
+    """
+    from sklearn.isotonic import IsotonicRegression
+
+    isotonic = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip")
+    isotonic.fit(y_prob, y_true)
+
+    return {
+        "x": np.asarray(isotonic.X_thresholds_, dtype=np.float64),
+        "y": np.asarray(isotonic.y_thresholds_, dtype=np.float64),
+        "n_samples": int(len(y_true))
+    }
+
+class ProbabilityCalibrator:
+    """Aplica a tabela de calibração de forma vetorizada"""
+
+    def __init__(self, table: Dict[str, Any]):
+        self.x = table["x"]
+        self.y = table["y"]
+        self.metrics = table.get("metrics", {})
+        self.n_samples = table.get("n_samples")
+
+    @classmethod
+    def load(cls, path: str = 'ml/calibration.joblib') -> Optional["ProbabilityCalibrator"]:
+        """Carrega a tabela salva; retorna None se o modelo não foi calibrado"""
+        try:
+            return cls(joblib.load(path))
+        except FileNotFoundError:
+            return None
+
+    def apply(self, probabilities: np.ndarray) -> np.ndarray:
+        """Converte probabilidades brutas em calibradas"""
+        return np.interp(probabilities, self.x, self.y)
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "available": True,
+            "method": "isotonic",
+            "knots": int(len(self.x)),
+            "n_samples": self.n_samples,
+            "metrics": self.metrics
+        }
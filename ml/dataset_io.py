@@ -0,0 +1,70 @@
+"""
+Leitura e escrita em lotes de CSV e Parquet
+
+Usado pelo gerador sintético, pelo feature store e pelo treino fora da
+memória. O Parquet (e a escrita rápida de CSV) usa o pyarrow do extra
+"columnar", importado só quando necessário.
+"""
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+def _parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet requer pyarrow (pip install .[columnar])")
+    return pq
+
+def file_columns(path: str) -> List[str]:
+    """Colunas de um CSV ou Parquet (sem ler os dados)"""
+    if path.endswith(".parquet"):
+        return _parquet().ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def iter_frames(path: str, batch_rows: int, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Lê um CSV ou Parquet em lotes de até batch_rows linhas"""
+    if path.endswith(".parquet"):
+        for batch in _parquet().ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=batch_rows)
+
+def write_dataset(chunks: Iterator[pd.DataFrame], output: str, file_format: str = "csv") -> int:
+    """
+    Escreve os chunks em CSV (um cabeçalho) ou Parquet (um row group por chunk); retorna as linhas
+
+    Com o pyarrow instalado, o CSV também é escrito por ele (~20x mais rápido que o pandas).
+    """
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+    except ImportError:
+        if file_format == "parquet":
+            raise RuntimeError("Parquet requer pyarrow (pip install .[columnar])")
+        pa = None
+
+    n_rows = 0
+    if pa is None:
+        with open(output, "w", newline="") as output_file:
+            for chunk in chunks:
+                chunk.to_csv(output_file, header=n_rows == 0, index=False)
+                n_rows += len(chunk)
+        return n_rows
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = (pq.ParquetWriter(output, table.schema) if file_format == "parquet"
+                          else pa_csv.CSVWriter(output, table.schema))
+            writer.write_table(table)
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
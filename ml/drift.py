@@ -0,0 +1,226 @@
+"""
+Monitoramento de drift das entradas e da probabilidade prevista
+
+Cada feature (e a probabilidade de saída) tem um sketch de quantis KLL,
+com memória praticamente constante (~3k itens, independente do volume),
+e um histograma nos cortes da distribuição de referência. A referência é
+calculada no treinamento (ou com `python -m ml.drift --data <csv>`) e
+salva em ml/drift_reference.joblib: 101 quantis, os cortes dos decis e a
+proporção de cada faixa.
+
+A comparação usa:
+- PSI (Population Stability Index) entre as proporções das faixas
+- KS (Kolmogorov-Smirnov): maior distância entre as CDFs, avaliada nos
+  quantis da referência e do sketch
+"""
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+# Quantis guardados na referência (0%, 1%, ..., 100%)
+QUANTILE_GRID = np.linspace(0, 1, 101)
+# Faixas do PSI: decis da referência
+PSI_BINS = 10
+# Limiares usuais do PSI: < 0.1 estável, 0.1-0.25 moderado, >= 0.25 significativo
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+PREDICTION_KEY = "prediction"
+
+class KLLSketch:
+    """
+    Sketch de quantis KLL (Karnin, Lang e Liberty, 2016)
+
+    Os itens ficam em níveis; um item no nível h representa 2^h valores.
+    Quando um nível passa da capacidade ele é ordenado e metade dos itens
+    (os de posição par ou ímpar, escolhida ao acaso) sobe para o nível
+    seguinte. O erro de posto é da ordem de 1.7/k.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values: np.ndarray):
+        """Adiciona um array de valores (NaN é ignorado)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def _compress(self):
+        while True:
+            for level, items in enumerate(self.levels):
+                if len(items) > self._capacity(level):
+                    break
+            else:
+                return
+
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            kept = items[:0]
+            if len(items) % 2:
+                kept, items = items[-1:], items[:-1]
+            offset = int(self._rng.integers(2))
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[offset::2]])
+            self.levels[level] = kept
+
+    def _sorted_weights(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """Valores aproximados dos quantis qs (NaN se vazio)"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.n:
+            return np.full(qs.shape, np.nan)
+        values, cumulative = self._sorted_weights()
+        index = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        return values[np.clip(index, 0, len(values) - 1)]
+
+    def cdf(self, x: Sequence[float]) -> np.ndarray:
+        """Fração aproximada dos valores <= x"""
+        x = np.asarray(x, dtype=np.float64)
+        if not self.n:
+            return np.full(x.shape, np.nan)
+        values, cumulative = self._sorted_weights()
+        index = np.searchsorted(values, x, side="right")
+        return np.where(index > 0, cumulative[np.maximum(index - 1, 0)], 0.0) / cumulative[-1]
+
+    @property
+    def size(self) -> int:
+        """Itens guardados (memória do sketch)"""
+        return int(sum(len(items) for items in self.levels))
+
+def reference_stats(values: np.ndarray) -> Dict[str, Any]:
+    """Quantis, cortes dos decis e proporção por faixa de uma feature de referência"""
+    values = np.asarray(values, dtype=np.float64)
+    present = values[~np.isnan(values)]
+    if not len(present):
+        return {"quantiles": np.full(len(QUANTILE_GRID), np.nan), "cuts": np.empty(0),
+                "proportions": np.ones(1), "count": 0, "missing": int(len(values))}
+
+    # Features discretas (gênero, unidades) têm decis repetidos: os cortes ficam únicos
+    cuts = np.unique(np.quantile(present, np.linspace(0, 1, PSI_BINS + 1)[1:-1]))
+    counts = np.bincount(np.searchsorted(cuts, present, side="right"), minlength=len(cuts) + 1)
+    return {
+        "quantiles": np.quantile(present, QUANTILE_GRID),
+        "cuts": cuts,
+        "proportions": counts / len(present),
+        "count": int(len(present)),
+        "missing": int(len(values) - len(present))
+    }
+
+def build_reference(X: np.ndarray, feature_names: Sequence[str],
+                    probabilities: Optional[np.ndarray] = None, source: str = "") -> Dict[str, Any]:
+    """
+    Distribuições de referência das features (NaN = ausente) e da probabilidade
+
+    Args:
+        X: Matriz (linhas x features) na ordem de feature_names
+        probabilities: Probabilidades (calibradas) previstas para as mesmas linhas
+    """
+    X = np.asarray(X, dtype=np.float64)
+    features = {name: reference_stats(X[:, j]) for j, name in enumerate(feature_names)}
+    if probabilities is not None:
+        features[PREDICTION_KEY] = reference_stats(probabilities)
+    return {
+        "features": features,
+        "n_rows": int(len(X)),
+        "source": source,
+        "created_at": datetime.now().isoformat()
+    }
+
+# joblib é importado só ao salvar/carregar: a API importa este módulo sem artefatos pesados
+
+def save_reference(reference: Dict[str, Any], path: str = 'ml/drift_reference.joblib'):
+    import joblib
+    joblib.dump(reference, path)
+
+def load_reference(path: str = 'ml/drift_reference.joblib') -> Optional[Dict[str, Any]]:
+    """Carrega a referência salva; None se o modelo não tem referência"""
+    import joblib
+    try:
+        return joblib.load(path)
+    except FileNotFoundError:
+        return None
+
+def psi(expected: np.ndarray, counts: np.ndarray, epsilon: float = 1e-4) -> float:
+    """Population Stability Index entre as proporções de referência e as contagens atuais"""
+    actual = counts / max(counts.sum(), 1)
+    expected = np.clip(expected, epsilon, None)
+    actual = np.clip(actual, epsilon, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def ks_statistic(reference_quantiles: np.ndarray, sketch: KLLSketch) -> float:
+    """Maior distância entre a CDF da referência (pelos quantis) e a do sketch"""
+    points = np.union1d(reference_quantiles, sketch.quantiles(QUANTILE_GRID))
+    reference_cdf = np.searchsorted(reference_quantiles, points, side="right") / len(reference_quantiles)
+    return float(np.max(np.abs(reference_cdf - sketch.cdf(points))))
+
+def drift_status(psi_value: Optional[float]) -> str:
+    if psi_value is None:
+        return "insufficient_data"
+    if psi_value >= PSI_DRIFT:
+        return "drift"
+    if psi_value >= PSI_WARNING:
+        return "warning"
+    return "ok"
+
+def reference_frame(path: str, feature_names: Sequence[str]) -> np.ndarray:
+    """
+    Lê um CSV de referência com as colunas do modelo (HR_mean) ou as originais (HR)
+
+    Returns:
+        Matriz (linhas x features) com NaN nas colunas ausentes
+    """
+    import pandas as pd
+
+    header = pd.read_csv(path, nrows=0).columns
+    columns = {}
+    for name in feature_names:
+        base = name[:-len("_mean")] if name.endswith("_mean") else name
+        column = name if name in header else base if base in header else None
+        if column is not None:
+            columns[name] = column
+
+    frame = pd.read_csv(path, usecols=list(columns.values()))
+    X = np.full((len(frame), len(feature_names)), np.nan)
+    for j, name in enumerate(feature_names):
+        if name in columns:
+            X[:, j] = pd.to_numeric(frame[columns[name]], errors="coerce")
+    return X
+
+if __name__ == "__main__":
+    # Gera ml/drift_reference.joblib a partir de um CSV e do modelo treinado
+    import argparse
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ml.predict import SepsisPredictor
+
+    parser = argparse.ArgumentParser(description="Distribuições de referência para o monitor de drift")
+    parser.add_argument("--data", default="artifacts/dataset/sepsis_data_cleaned.csv")
+    parser.add_argument("--output", default="ml/drift_reference.joblib")
+    args = parser.parse_args()
+
+    predictor = SepsisPredictor()
+    X = reference_frame(args.data, predictor.feature_names)
+    X_model = X.copy()
+    predictor.impute(X_model)
+    reference = build_reference(X, predictor.feature_names, predictor.predict_proba_matrix(X_model), args.data)
+    save_reference(reference, args.output)
+    print(f"Referência de {reference['n_rows']} linhas salva em '{args.output}'")
@@ -0,0 +1,112 @@
+"""
+Explicação de predições por decomposição dos caminhos nas árvores
+
+Para cada árvore, a probabilidade da folha é igual à probabilidade da raiz
+mais a soma das variações (valor do filho - valor do nó) ao longo do caminho;
+cada variação é atribuída à feature usada no corte. A média sobre as árvores
+dá contribuições por feature que somam exatamente à probabilidade da floresta.
+
+As tabelas por nó (feature, limiar, filhos, probabilidade) de todas as árvores
+são concatenadas em arrays planos e salvas junto do modelo, para que todas as
+árvores sejam percorridas ao mesmo tempo com operações numpy.
+"""
+import joblib
+import numpy as np
+from typing import Dict, Tuple
+
+def build_tables(model) -> Dict[str, np.ndarray]:
+    """Extrai as tabelas por nó de um RandomForestClassifier (classe positiva)"""
+    features, thresholds, left, right, values, roots = [], [], [], [], [], []
+    depth = 0
+    offset = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        proportions = counts / counts.sum(axis=1, keepdims=True)
+        is_leaf = tree.children_left == -1
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        # Folhas apontam para si mesmas, assim a travessia pode continuar sem desvio
+        node_ids = np.arange(tree.node_count) + offset
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        values.append(proportions[:, 1])
+
+        depth = max(depth, tree.max_depth)
+        offset += tree.node_count
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "value": np.concatenate(values).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "max_depth": depth,
+        "n_features": model.n_features_in_,
+    }
+
+def save_tables(tables: Dict[str, np.ndarray], path: str = 'ml/explainer.joblib'):
+    """Salva as tabelas junto do modelo"""
+    joblib.dump(tables, path)
+
+class TreePathExplainer:
+    """Calcula contribuições por feature para uma predição da floresta"""
+
+    def __init__(self, tables: Dict[str, np.ndarray]):
+        self.feature = tables["feature"]
+        self.threshold = tables["threshold"]
+        self.left = tables["left"]
+        self.right = tables["right"]
+        self.value = tables["value"]
+        self.roots = tables["roots"]
+        self.max_depth = int(tables["max_depth"])
+        self.n_features = int(tables["n_features"])
+        self.bias = float(self.value[self.roots].mean())
+
+    @classmethod
+    def load(cls, path: str = 'ml/explainer.joblib', model=None) -> "TreePathExplainer":
+        """Carrega as tabelas salvas; sem o arquivo, gera a partir do modelo"""
+        try:
+            return cls(joblib.load(path))
+        except FileNotFoundError:
+            if model is None:
+                raise
+            return cls(build_tables(model))
+
+    def explain(self, x: np.ndarray) -> Tuple[float, float, np.ndarray]:
+        """
+        Explica a predição de uma linha de features
+
+        Returns:
+            (probabilidade, bias, contribuições por feature); bias + soma das
+            contribuições == probabilidade
+        """
+        # O sklearn compara as features em float32 com limiares em float64
+        x = np.asarray(x, dtype=np.float32).ravel().astype(np.float64)
+        n_trees = len(self.roots)
+        contributions = np.zeros(self.n_features, dtype=np.float64)
+
+        nodes = self.roots.copy()
+        for _ in range(self.max_depth):
+            split_features = self.feature[nodes]
+            go_left = x[split_features] <= self.threshold[nodes]
+            children = np.where(go_left, self.left[nodes], self.right[nodes])
+            contributions += np.bincount(
+                split_features,
+                weights=self.value[children] - self.value[nodes],
+                minlength=self.n_features
+            )
+            nodes = children
+
+        contributions /= n_trees
+        probability = float(self.value[nodes].mean())
+        return probability, self.bias, contributions
+
+if __name__ == "__main__":
+    # Gera ml/explainer.joblib a partir do modelo treinado
+    save_tables(build_tables(joblib.load('ml/model.joblib')))
+    print("Tabelas de explicação salvas em 'ml/explainer.joblib'")
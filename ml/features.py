@@ -0,0 +1,228 @@
+"""
+Features por paciente construídas em uma passada, com folds pelo hash do ID
+
+O notebook agregava treino e teste separadamente (um groupby por parte) e
+o train_model.py dividia as linhas agregadas de novo, sem garantir que um
+paciente ficasse em uma só parte. Aqui a tabela de features (o "feature
+store") é montada uma vez a partir dos dados horários:
+
+- uma passada ordenada por paciente: as linhas de cada paciente são
+  contíguas (arquivos do PhysioNet, ml.synthetic) ou ordenadas em memória,
+  e cada paciente vira uma linha com as médias das features e o
+  SepsisLabel máximo
+- os folds são estratificados: os pacientes de cada classe são ordenados
+  pelo hash do ID e distribuídos em rodízio entre os folds, então cada
+  fold recebe a mesma quantidade (±1) de pacientes de cada classe. O fold
+  é determinístico para os mesmos dados, mas um paciente pode mudar de
+  fold quando pacientes entram ou saem do conjunto
+
+Treino, calibração, teste e validação cruzada usam a coluna "fold" da
+mesma tabela: o fold TEST_FOLD é o teste, CALIBRATION_FOLD calibra e os
+demais treinam; a validação cruzada usa os próprios folds.
+
+Uso:
+    python -m ml.features --hourly data/hourly.parquet --output data/features.parquet
+"""
+import argparse
+import os
+import time
+from typing import Dict, Any, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml.dataset_io import file_columns, iter_frames, write_dataset
+
+# Colunas horárias agregadas (média por paciente) e features resultantes
+HOURLY_FEATURES = ["HR", "O2Sat", "Temp", "SBP", "DBP", "MAP", "Resp", "Age", "Gender",
+                   "Unit1", "Unit2", "HospAdmTime", "ICULOS"]
+FEATURE_COLUMNS = [f"{name}_mean" for name in HOURLY_FEATURES]
+LABEL = "SepsisLabel"
+PATIENT_ID = "Patient_ID"
+FOLD = "fold"
+
+# Folds por paciente e papéis fixos no treino
+N_FOLDS = 5
+TEST_FOLD = 0
+CALIBRATION_FOLD = 1
+
+def patient_column(columns: List[str]) -> str:
+    """Coluna do ID do paciente (Patient_ID ou ID, como no notebook)"""
+    return PATIENT_ID if PATIENT_ID in columns else "ID"
+
+def patient_hashes(ids) -> np.ndarray:
+    """Hash determinístico (entre execuções) do ID de cada paciente"""
+    return pd.util.hash_array(np.asarray(ids))
+
+def stratified_folds(hashes: np.ndarray, labels: np.ndarray, n_folds: int = N_FOLDS) -> np.ndarray:
+    """Folds em rodízio pelos pacientes de cada classe, ordenados pelo hash do ID"""
+    folds = np.empty(len(hashes), dtype=np.int8)
+    for label in np.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        order = rows[np.argsort(hashes[rows], kind="stable")]
+        folds[order] = np.arange(len(order)) % n_folds
+    return folds
+
+def patient_folds(ids, n_folds: int = N_FOLDS, labels=None) -> np.ndarray:
+    """
+    Fold de cada paciente: estratificado pela classe quando os rótulos são
+    informados, ou só pelo hash do ID (classes balanceadas apenas em média)
+    """
+    hashes = patient_hashes(ids)
+    if labels is None:
+        return (hashes % np.uint64(n_folds)).astype(np.int8)
+    return stratified_folds(hashes, np.asarray(labels), n_folds)
+
+def split_masks(folds: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Máscaras (ajuste, calibração, teste) a partir dos folds"""
+    folds = np.asarray(folds)
+    test = folds == TEST_FOLD
+    calibration = folds == CALIBRATION_FOLD
+    return ~(test | calibration), calibration, test
+
+def iter_patient_groups(frames: Iterator[pd.DataFrame], id_column: str) -> Iterator[pd.DataFrame]:
+    """
+    Reagrupa lotes horários em blocos de pacientes completos
+
+    As linhas do último paciente de cada lote passam para o lote seguinte,
+    pois ele pode continuar no próximo. Os IDs já emitidos são guardados
+    para detectar um paciente que reaparece em outro lote (linhas não
+    contíguas), o que geraria duas linhas agregadas para o mesmo paciente.
+    """
+    message = f"As linhas de cada paciente devem ser contíguas (ordenadas por {id_column})"
+    emitted = set()
+    carry = None
+    for frame in frames:
+        if carry is not None:
+            frame = pd.concat([carry, frame], ignore_index=True)
+        ids = frame[id_column].to_numpy()
+        if len(ids) == 0:
+            continue
+        runs = 1 + int(np.count_nonzero(ids[1:] != ids[:-1]))
+        if runs != len(pd.unique(ids)):
+            raise ValueError(message)
+
+        # Início da sequência do último paciente do lote
+        others = np.flatnonzero(ids != ids[-1])
+        split = int(others[-1]) + 1 if len(others) else 0
+        carry = frame.iloc[split:]
+        if split:
+            patients = pd.unique(ids[:split]).tolist()
+            if not emitted.isdisjoint(patients):
+                raise ValueError(message)
+            emitted.update(patients)
+            yield frame.iloc[:split]
+    if carry is not None and len(carry):
+        if carry[id_column].iloc[0] in emitted:
+            raise ValueError(message)
+        yield carry
+
+def aggregate_patients(frame: pd.DataFrame, id_column: str) -> pd.DataFrame:
+    """Médias das features e SepsisLabel máximo por paciente (ordem de aparição)"""
+    grouped = frame.groupby(id_column, sort=False)
+    table = grouped[HOURLY_FEATURES].mean()
+    table.columns = FEATURE_COLUMNS
+    table[LABEL] = grouped[LABEL].max()
+    table.index.name = PATIENT_ID
+    return table.reset_index()
+
+def build_features(hourly: pd.DataFrame, n_folds: int = N_FOLDS) -> pd.DataFrame:
+    """Tabela de features de dados horários em memória (ordenados por paciente antes)"""
+    id_column = patient_column(list(hourly.columns))
+    hourly = hourly.sort_values(id_column, kind="stable")
+    table = aggregate_patients(hourly, id_column)
+    table.insert(0, FOLD, patient_folds(table[PATIENT_ID].to_numpy(), n_folds, table[LABEL].to_numpy()))
+    return table
+
+def fold_counts(table: pd.DataFrame) -> Dict[int, Dict[int, int]]:
+    """Pacientes por fold e classe"""
+    counts = table.groupby([FOLD, LABEL]).size()
+    return {int(fold): {int(label): int(n) for label, n in counts[fold].items()}
+            for fold in counts.index.get_level_values(0).unique()}
+
+def build_feature_store(source: str, output: str, n_folds: int = N_FOLDS,
+                        batch_rows: int = 1_000_000) -> Dict[str, Any]:
+    """
+    Agrega um arquivo horário (CSV ou Parquet) em uma passada, gravando a tabela em output lote a lote
+
+    Os folds estratificados dependem de todos os pacientes: a primeira passada
+    grava a tabela sem fold em um arquivo temporário e guarda só o hash e o
+    rótulo de cada paciente; a segunda copia a tabela para output com o fold.
+
+    Returns:
+        Linhas lidas, pacientes, pacientes por classe e por fold/classe e tempo
+    """
+    id_column = patient_column(file_columns(source))
+    file_format = "parquet" if output.endswith(".parquet") else "csv"
+    partial = f"{output}.partial.{file_format}"
+    stats = {"hourly_rows": 0}
+    hashes, labels = [], []
+    start = time.perf_counter()
+
+    def tables():
+        frames = iter_frames(source, batch_rows, [id_column] + HOURLY_FEATURES + [LABEL])
+        for frame in iter_patient_groups(frames, id_column):
+            table = aggregate_patients(frame, id_column)
+            stats["hourly_rows"] += len(frame)
+            hashes.append(patient_hashes(table[PATIENT_ID].to_numpy()))
+            labels.append(table[LABEL].to_numpy(dtype=np.int8))
+            yield table
+
+    def with_folds(folds):
+        offset = 0
+        for table in iter_frames(partial, batch_rows):
+            table.insert(0, FOLD, folds[offset:offset + len(table)])
+            offset += len(table)
+            yield table
+
+    try:
+        write_dataset(tables(), partial, file_format)
+        hashes = np.concatenate(hashes) if hashes else np.array([], dtype=np.uint64)
+        labels = np.concatenate(labels) if labels else np.array([], dtype=np.int8)
+        folds = stratified_folds(hashes, labels, n_folds)
+        write_dataset(with_folds(folds), output, file_format)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    stats.update({
+        "patients": len(labels),
+        "labels": {label: int((labels == label).sum()) for label in (0, 1)},
+        "folds": {fold: {label: int(((folds == fold) & (labels == label)).sum()) for label in (0, 1)}
+                  for fold in range(n_folds)},
+        "batch_rows": batch_rows,
+        "seconds": round(time.perf_counter() - start, 1)
+    })
+    return stats
+
+def load_features(path: str) -> pd.DataFrame:
+    """Lê a tabela de features; dados horários são agregados na hora e sem fold ganham o do ID"""
+    frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    if FOLD in frame.columns:
+        return frame
+    if "HR" in frame.columns and "HR_mean" not in frame.columns:
+        return build_features(frame)
+
+    # Tabela agregada antiga: fold pelo ID do paciente (ou pela linha, sem ID), estratificado pela classe
+    columns = list(frame.columns)
+    ids = frame[patient_column(columns)] if patient_column(columns) in columns else frame.index
+    frame.insert(0, FOLD, patient_folds(np.asarray(ids), labels=frame[LABEL].to_numpy() if LABEL in columns else None))
+    return frame
+
+def main():
+    parser = argparse.ArgumentParser(description="Monta a tabela de features por paciente com folds")
+    parser.add_argument("--hourly", required=True, help="Arquivo horário (CSV ou Parquet), linhas de cada paciente contíguas")
+    parser.add_argument("--output", default="data/features.parquet")
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--batch-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    stats = build_feature_store(args.hourly, args.output, args.folds, args.batch_rows)
+    print(f"{stats['patients']} pacientes de {stats['hourly_rows']} linhas horárias em '{args.output}' "
+          f"({stats['seconds']} s)")
+    for fold, labels in stats["folds"].items():
+        total = labels[0] + labels[1]
+        print(f"  fold {fold}: {total} pacientes, {labels[1] / max(1, total):.2%} com sepse")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Imputação de features ausentes
+
+Monitores de beira de leito frequentemente deixam de enviar um ou dois
+sinais. Em vez de preencher com 0.0, o treinamento calcula a mediana de
+cada feature por unidade (Unit1, Unit2, outras e geral) e salva as
+medianas em feature_info.joblib (chave "imputation"). Na inferência os
+valores ausentes (NaN na matriz de features) são preenchidos de forma
+vetorizada pela mediana da unidade do paciente; a PAM ausente é derivada
+de SBP e DBP quando as duas foram informadas.
+
+Modelos salvos antes da imputação não têm as medianas: nesse caso são
+usados valores típicos de UTI (DEFAULT_IMPUTATION).
+"""
+import warnings
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+# Grupos de imputação (linhas da tabela de medianas)
+UNIT_GROUPS = ["unit1", "unit2", "other", "all"]
+_UNIT1, _UNIT2, _OTHER, _ALL = range(len(UNIT_GROUPS))
+
+UNIT1_FEATURE = "Unit1_mean"
+UNIT2_FEATURE = "Unit2_mean"
+
+# Valores típicos de pacientes de UTI (aprox. medianas da base PhysioNet/CinC 2019),
+# usados apenas com modelos sem medianas salvas
+DEFAULT_IMPUTATION = {
+    "HR_mean": 84.0,
+    "O2Sat_mean": 97.5,
+    "Temp_mean": 36.9,
+    "SBP_mean": 120.0,
+    "DBP_mean": 62.0,
+    "MAP_mean": 80.0,
+    "Resp_mean": 18.0,
+    "Age_mean": 63.0,
+    "Gender_mean": 1.0,
+    "Unit1_mean": 0.0,
+    "Unit2_mean": 0.0,
+    "HospAdmTime_mean": 0.0,
+    "ICULOS_mean": 20.0,
+}
+
+def unit_groups(unit1: np.ndarray, unit2: np.ndarray) -> np.ndarray:
+    """Grupo de cada linha (mesma precedência do ward_index: Unit1, Unit2, outras)"""
+    groups = np.full(len(unit1), _OTHER, dtype=np.intp)
+    groups[np.isnan(unit1) | np.isnan(unit2)] = _ALL
+    groups[unit2 >= 0.5] = _UNIT2
+    groups[unit1 >= 0.5] = _UNIT1
+    return groups
+
+def fit_imputation(X, feature_names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Calcula as medianas por unidade a partir dos dados de treino
+
+    Args:
+        X: DataFrame (ou matriz) com as features do modelo; NaN = ausente
+        feature_names: Nomes das colunas quando X é uma matriz
+
+    Returns:
+        Dicionário salvo em feature_info["imputation"]
+    """
+    feature_names = list(feature_names if feature_names is not None else X.columns)
+    X = np.asarray(X, dtype=np.float64)
+
+    if UNIT1_FEATURE in feature_names and UNIT2_FEATURE in feature_names:
+        groups = unit_groups(X[:, feature_names.index(UNIT1_FEATURE)],
+                             X[:, feature_names.index(UNIT2_FEATURE)])
+    else:
+        groups = np.full(len(X), _ALL, dtype=np.intp)
+
+    overall = np.nanmedian(X, axis=0)
+    medians = {"all": dict(zip(feature_names, overall.tolist()))}
+    counts = {"all": int(len(X))}
+    for group in (_UNIT1, _UNIT2, _OTHER):
+        rows = X[groups == group]
+        counts[UNIT_GROUPS[group]] = int(len(rows))
+        if len(rows):
+            # Features sem nenhum valor no grupo ficam com a mediana geral
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                group_medians = np.nanmedian(rows, axis=0)
+            values = np.where(np.isnan(rows).all(axis=0), overall, group_medians)
+            medians[UNIT_GROUPS[group]] = dict(zip(feature_names, values.tolist()))
+
+    return {"strategy": "median_by_unit", "medians": medians, "counts": counts}
+
+class FeatureImputer:
+    """Preenche NaN na matriz de features com as medianas por unidade"""
+
+    def __init__(self, feature_names: Sequence[str], imputation: Optional[Dict[str, Any]] = None):
+        self.feature_names = list(feature_names)
+        self.source = "model" if imputation else "default"
+        medians = (imputation or {}).get("medians", {})
+        overall = medians.get("all", DEFAULT_IMPUTATION)
+
+        # Tabela (grupo x feature); grupos ausentes no treino usam a mediana geral
+        self.table = np.array([
+            [medians.get(group, overall).get(name, overall.get(name, 0.0)) for name in self.feature_names]
+            for group in UNIT_GROUPS
+        ], dtype=np.float64)
+        self.counts = (imputation or {}).get("counts", {})
+
+        index = {name: j for j, name in enumerate(self.feature_names)}
+        self._units = (index.get(UNIT1_FEATURE), index.get(UNIT2_FEATURE))
+        self._map = (index.get("MAP_mean"), index.get("SBP_mean"), index.get("DBP_mean"))
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Preenche os valores ausentes de X no próprio array
+
+        Returns:
+            Máscara booleana (linhas x features) das células imputadas
+        """
+        missing = np.isnan(X)
+        columns = np.flatnonzero(missing.any(axis=0))
+        if not len(columns):
+            return missing
+
+        map_j, sbp_j, dbp_j = self._map
+        if None not in self._map and map_j in columns:
+            # PAM derivada das pressões informadas, antes de recorrer à mediana
+            rows = np.flatnonzero(missing[:, map_j] & ~missing[:, sbp_j] & ~missing[:, dbp_j])
+            X[rows, map_j] = (X[rows, sbp_j] + 2 * X[rows, dbp_j]) / 3
+
+        unit1_j, unit2_j = self._units
+        if unit1_j is not None and unit2_j is not None:
+            groups = unit_groups(X[:, unit1_j], X[:, unit2_j])
+        else:
+            groups = np.full(len(X), _ALL, dtype=np.intp)
+
+        for j in columns:
+            rows = np.flatnonzero(np.isnan(X[:, j]))
+            X[rows, j] = self.table[groups[rows], j]
+        return missing
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "strategy": "median_by_unit" if self.source == "model" else "default",
+            "medians": {
+                group: dict(zip(self.feature_names, np.round(row, 3).tolist()))
+                for group, row in zip(UNIT_GROUPS, self.table)
+            },
+            "counts": self.counts
+        }
+
+def imputed_field_names(mask: np.ndarray, fields: Sequence[Optional[str]]) -> List[str]:
+    """Campos imputados de uma linha da máscara"""
+    return [fields[j] for j in np.flatnonzero(mask) if fields[j]]
+
+def imputed_codes(mask: np.ndarray, fields: Sequence[Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Codifica a máscara de um lote em um inteiro por linha
+
+    Returns:
+        (códigos, legenda): o bit i do código indica que legenda[i] foi imputado
+    """
+    columns = [j for j, field in enumerate(fields) if field]
+    weights = np.left_shift(1, np.arange(len(columns), dtype=np.int32))
+    return mask[:, columns].astype(np.int32) @ weights, [fields[j] for j in columns]
@@ -0,0 +1,198 @@
+"""
+Limites fisiológicos aceitos na entrada do modelo
+
+A tabela abaixo é a única definição das faixas válidas de cada campo e da
+regra de coerência da PAM (MAP ≈ (SBP + 2·DBP) / 3). Ela é usada pelo
+SepsisInput e pelo SepsisService (um registro), pelos caminhos em lote
+(matriz inteira) e pelos limites do formulário do frontend.
+
+A validação de uma matriz é vetorizada: cada coluna é comparada com sua
+faixa de uma vez, mais a regra da PAM, gerando máscaras booleanas por
+linha. Com a matriz em ordem de colunas (Fortran, como a montada pelo
+SepsisPredictor), um lote de 100 mil linhas é validado em poucos
+milissegundos.
+"""
+import numpy as np
+from typing import Dict, Any, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+class FieldLimit(NamedTuple):
+    """Faixa válida de um campo de entrada"""
+    field: str
+    label: str
+    minimum: float
+    maximum: Optional[float]
+    unit: str = ""
+    integer: bool = False
+
+    def message(self) -> str:
+        unit = self.unit if self.unit in ("", "%", "°C") else f" {self.unit}"
+        if self.maximum is None:
+            return f"{self.label} deve ser maior ou igual a {self.minimum:g}{unit}"
+        return f"{self.label} deve estar entre {self.minimum:g}-{self.maximum:g}{unit}"
+
+    def json_schema(self) -> Dict[str, Any]:
+        """Limites para a documentação OpenAPI"""
+        schema = {"minimum": self.minimum}
+        if self.maximum is not None:
+            schema["maximum"] = self.maximum
+        return schema
+
+PHYSIOLOGICAL_LIMITS: List[FieldLimit] = [
+    FieldLimit("hr", "Frequência cardíaca", 40, 200, "bpm"),
+    FieldLimit("o2sat", "Saturação de oxigênio", 0, 100, "%"),
+    FieldLimit("temp", "Temperatura", 35, 42, "°C"),
+    FieldLimit("sbp", "Pressão sistólica", 0, 300, "mmHg"),
+    FieldLimit("dbp", "Pressão diastólica", 0, 200, "mmHg"),
+    FieldLimit("map", "Pressão arterial média", 0, 200, "mmHg"),
+    FieldLimit("resp", "Taxa respiratória", 0, 100, "rpm"),
+    FieldLimit("age", "Idade", 0, 150, "anos"),
+    FieldLimit("gender", "Gênero", 0, 1, integer=True),
+    FieldLimit("unit1", "Unidade 1", 0, 1, integer=True),
+    FieldLimit("unit2", "Unidade 2", 0, 1, integer=True),
+    FieldLimit("hosp_adm_time", "Tempo de internação", 0, None, "horas"),
+    FieldLimit("iculos", "Tempo na UTI", 0, None, "horas"),
+]
+
+LIMITS: Dict[str, FieldLimit] = {limit.field: limit for limit in PHYSIOLOGICAL_LIMITS}
+FIELDS: List[str] = [limit.field for limit in PHYSIOLOGICAL_LIMITS]
+
+# Diferença máxima entre a PAM informada e (SBP + 2·DBP) / 3, em mmHg
+MAP_TOLERANCE = 20.0
+MAP_RULE = "map_consistency"
+MAP_RULE_MESSAGE = "MAP deve estar próximo de (SBP + 2·DBP) / 3"
+
+# Máximo de erros de validação reportados por lote
+MAX_REPORTED_ERRORS = 20
+
+def expected_map(sbp, dbp):
+    """PAM estimada a partir das pressões sistólica e diastólica"""
+    return (sbp + 2 * dbp) / 3
+
+def map_message(sbp: float, dbp: float) -> str:
+    return f"MAP deve estar próximo de {expected_map(sbp, dbp):.1f}"
+
+class ValidationResult:
+    """Máscaras de erro por linha (uma por campo e uma para a regra da PAM)"""
+
+    def __init__(self, masks: Dict[str, np.ndarray], n_rows: int):
+        self.masks = masks
+        self.n_rows = n_rows
+        invalid = np.zeros(n_rows, dtype=bool)
+        for mask in masks.values():
+            invalid |= mask
+        self.invalid = invalid
+        # Regras adicionais: regra -> (campo, mensagem)
+        self.rules: Dict[str, Tuple[Optional[str], str]] = {MAP_RULE: ("map", MAP_RULE_MESSAGE)}
+
+    def add_rule(self, rule: str, mask: np.ndarray, field: Optional[str], message: str):
+        """Acrescenta uma regra calculada fora da tabela (ex.: campos ausentes demais)"""
+        self.masks[rule] = mask
+        self.rules[rule] = (field, message)
+        self.invalid |= mask
+
+    @property
+    def valid(self) -> bool:
+        return not self.invalid.any()
+
+    @property
+    def invalid_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.invalid)
+
+    def errors(self, max_errors: Optional[int] = None) -> List[Tuple[int, Optional[str], str]]:
+        """(linha, campo, mensagem) em ordem de linha, limitado a max_errors"""
+        errors = []
+        for rule, mask in self.masks.items():
+            rows = np.flatnonzero(mask)
+            if max_errors is not None:
+                rows = rows[:max_errors]
+            field, message = self.rules.get(rule) or (rule, LIMITS[rule].message())
+            errors.extend((int(row), field, message) for row in rows)
+        errors.sort(key=lambda error: error[0])
+        return errors[:max_errors] if max_errors is not None else errors
+
+    def row_messages(self) -> List[str]:
+        """Mensagens de erro de cada linha ('' para linhas válidas)"""
+        messages = [[] for _ in range(self.n_rows)]
+        for row, _, message in self.errors():
+            messages[row].append(message)
+        return ["; ".join(row) for row in messages]
+
+def validate_matrix(X: np.ndarray, fields: Sequence[Optional[str]] = FIELDS,
+                    allow_missing: bool = False) -> ValidationResult:
+    """
+    Valida uma matriz (linhas x campos) em uma passada vetorizada
+
+    Args:
+        X: Matriz com uma coluna por campo
+        fields: Campo de cada coluna (None para colunas sem limite)
+        allow_missing: NaN é um valor ausente (a ser imputado) e não um erro
+
+    Returns:
+        ValidationResult com as máscaras por campo e pela regra da PAM
+    """
+    X = np.asarray(X)
+    columns = {field: j for j, field in enumerate(fields) if field in LIMITS}
+
+    masks = {}
+    for field, j in columns.items():
+        limit = LIMITS[field]
+        values = X[:, j]
+        # NaN falha nas comparações e fica marcado como inválido
+        if limit.maximum is None:
+            valid = (values >= limit.minimum) & (values < np.inf)
+        else:
+            valid = (values >= limit.minimum) & (values <= limit.maximum)
+        if limit.integer:
+            valid &= values == np.round(values)
+        if allow_missing:
+            valid |= np.isnan(values)
+        masks[field] = ~valid
+
+    if {"map", "sbp", "dbp"} <= columns.keys():
+        # Com algum dos três ausente (NaN) a diferença é NaN e a regra não se aplica
+        difference = X[:, columns["map"]] - expected_map(X[:, columns["sbp"]], X[:, columns["dbp"]])
+        masks[MAP_RULE] = np.abs(difference) > MAP_TOLERANCE
+
+    return ValidationResult(masks, X.shape[0])
+
+def validate_columns(columns: Mapping[str, np.ndarray], allow_missing: bool = False) -> ValidationResult:
+    """Valida colunas por campo (ex.: DataFrame ou payload Arrow)"""
+    fields = [field for field in FIELDS if field in columns]
+    n_rows = len(columns[fields[0]]) if fields else 0
+    # Ordem de colunas (Fortran): cada campo fica contíguo na memória
+    X = np.empty((n_rows, len(fields)), dtype=np.float64, order="F")
+    for j, field in enumerate(fields):
+        X[:, j] = columns[field]
+    return validate_matrix(X, fields, allow_missing)
+
+def is_missing(value: Any) -> bool:
+    """Valor ausente: None ou NaN"""
+    return value is None or value != value
+
+def check_value(field: str, value: float) -> Optional[str]:
+    """Mensagem de erro de um valor isolado (None se válido)"""
+    limit = LIMITS[field]
+    maximum = float("inf") if limit.maximum is None else limit.maximum
+    if not (limit.minimum <= value <= maximum) or value == float("inf"):
+        return limit.message()
+    if limit.integer and value != round(value):
+        return limit.message()
+    return None
+
+def form_limits(field: str, cast=int) -> Dict[str, Any]:
+    """min_value/max_value de um campo para widgets numéricos (ex.: st.number_input)"""
+    limit = LIMITS[field]
+    limits = {"min_value": cast(limit.minimum)}
+    if limit.maximum is not None:
+        limits["max_value"] = cast(limit.maximum)
+    return limits
+
+def validate_record(data: Mapping[str, Any]) -> List[str]:
+    """Valida os campos informados de um registro (ausentes são ignorados); retorna os erros"""
+    present = {field: data[field] for field in FIELDS if not is_missing(data.get(field))}
+    errors = [message for field, value in present.items()
+              for message in [check_value(field, value)] if message]
+    if all(field in present for field in ("map", "sbp", "dbp")):
+        if abs(data["map"] - expected_map(data["sbp"], data["dbp"])) > MAP_TOLERANCE:
+            errors.append(map_message(data["sbp"], data["dbp"]))
+    return errors
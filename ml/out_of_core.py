@@ -0,0 +1,270 @@
+"""
+Treino fora da memória para conjuntos horários maiores que a RAM
+
+O treino em memória (ml/train_model.py) lê a tabela agregada inteira em um
+DataFrame e faz cópias em cada train_test_split. Aqui as duas etapas são
+feitas em lotes com tamanho derivado de um orçamento de memória:
+
+1. build_patient_table lê o arquivo horário em lotes (chunks de CSV ou
+   row groups de Parquet) e grava a tabela por paciente com os folds
+   (ml/features.py) em disco, lote a lote.
+
+2. O treino lê a tabela por paciente em lotes, em um de dois modos:
+   - subsample: amostra estratificada (mesma fração de cada classe, com
+     contagens exatas) que cabe no orçamento, treinada por
+     train_random_forest como no treino em memória
+   - warm_start: a floresta cresce lote a lote (warm_start=True), cada lote
+     treinando árvores novas; os folds de calibração e de teste ficam fora
+     do treino
+
+O pico de memória do processo (RSS) é reportado ao final de cada etapa e
+comparado com o orçamento.
+
+Uso:
+    python -m ml.out_of_core --hourly data/synthetic_10M.parquet --table data/patients.parquet
+    python -m ml.out_of_core --table data/patients.parquet --mode subsample --memory-mb 1024
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
+
+from ml.calibration import fit_calibration, calibration_metrics
+from ml.imputation import fit_imputation, FeatureImputer
+from ml.dataset_io import iter_frames
+from ml.features import (
+    HOURLY_FEATURES, FEATURE_COLUMNS, LABEL, FOLD, N_FOLDS, TEST_FOLD, CALIBRATION_FOLD,
+    build_feature_store, fold_counts
+)
+from ml.train_model import train_random_forest, build_drift_reference, save_model
+
+# Bytes estimados por linha em memória: horária (colunas lidas + cópias do agrupamento)
+# e por paciente no treino (splits, imputação e conversões do sklearn)
+HOURLY_ROW_BYTES = (len(HOURLY_FEATURES) + 2) * 8 * 6
+PATIENT_ROW_BYTES = len(FEATURE_COLUMNS) * 8 * 8
+MIN_BATCH_ROWS = 10_000
+
+# Parâmetros da floresta (os mesmos do treino em memória)
+FOREST_PARAMS = dict(max_depth=10, min_samples_split=5, min_samples_leaf=2, n_jobs=-1)
+N_ESTIMATORS = 100
+
+def current_memory_mb() -> float:
+    """Memória residente do processo (MB)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return peak_memory_mb()
+
+def peak_memory_mb() -> float:
+    """Pico de memória residente do processo (MB)"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+def rows_for_budget(memory_mb: float, row_bytes: int) -> int:
+    """Linhas por lote que cabem no orçamento, descontada a memória já em uso"""
+    available = (memory_mb - current_memory_mb()) * 2 ** 20
+    return max(MIN_BATCH_ROWS, int(available // row_bytes))
+
+def memory_report(memory_mb: float) -> Dict[str, Any]:
+    peak = peak_memory_mb()
+    if peak > memory_mb:
+        print(f"⚠️ Pico de memória ({peak:.0f} MB) acima do orçamento ({memory_mb:.0f} MB)")
+    return {"peak_memory_mb": round(peak, 1), "memory_budget_mb": memory_mb}
+
+def build_patient_table(source: str, output: str, memory_mb: float = 2048, n_folds: int = N_FOLDS,
+                        batch_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Agrega um arquivo horário (CSV ou Parquet) em uma tabela por paciente gravada em output
+
+    Returns:
+        Linhas lidas, pacientes, contagens por classe e fold, tempo e memória
+    """
+    batch_rows = batch_rows or rows_for_budget(memory_mb, HOURLY_ROW_BYTES)
+    stats = build_feature_store(source, output, n_folds, batch_rows)
+    stats.update(memory_report(memory_mb))
+    print(f"Tabela por paciente: {stats['patients']} pacientes de {stats['hourly_rows']} linhas horárias "
+          f"em '{output}' ({stats['seconds']} s, lotes de {batch_rows} linhas, "
+          f"pico {stats['peak_memory_mb']:.0f} MB)")
+    return stats
+
+def count_labels(path: str, batch_rows: int) -> Dict[str, Any]:
+    """Pacientes por classe e por fold da tabela (lendo apenas o rótulo e o fold)"""
+    counts = {"labels": {0: 0, 1: 0}, "folds": {}}
+    for frame in iter_frames(path, batch_rows, [LABEL, FOLD]):
+        for fold, labels in fold_counts(frame).items():
+            for label, n in labels.items():
+                counts["folds"].setdefault(fold, {0: 0, 1: 0})[label] += n
+                counts["labels"][label] += n
+    return counts
+
+def stratified_sample(path: str, labels: Dict[int, int], max_rows: int, batch_rows: int,
+                      seed: int = 42) -> pd.DataFrame:
+    """
+    Amostra de até max_rows pacientes com a mesma fração de cada classe
+
+    O número de sorteados de cada classe em cada lote segue a distribuição
+    hipergeométrica do que falta sortear, então as contagens finais são exatas.
+    """
+    rng = np.random.default_rng(seed)
+    fraction = min(1.0, max_rows / max(1, sum(labels.values())))
+    remaining = {label: count for label, count in labels.items()}
+    wanted = {label: int(round(count * fraction)) for label, count in labels.items()}
+
+    parts = []
+    for frame in iter_frames(path, batch_rows, [FOLD] + FEATURE_COLUMNS + [LABEL]):
+        y = frame[LABEL].to_numpy()
+        keep = []
+        for label in (0, 1):
+            rows = np.flatnonzero(y == label)
+            if not len(rows) or not wanted[label]:
+                remaining[label] -= len(rows)
+                continue
+            k = rng.hypergeometric(wanted[label], remaining[label] - wanted[label], len(rows))
+            keep.append(rng.choice(rows, size=k, replace=False))
+            wanted[label] -= k
+            remaining[label] -= len(rows)
+        if keep:
+            parts.append(frame.iloc[np.sort(np.concatenate(keep))])
+    return pd.concat(parts, ignore_index=True)
+
+def train_subsample(path: str, labels: Dict[int, int], memory_mb: float, batch_rows: int, seed: int = 42):
+    """Treino em memória sobre uma amostra estratificada que cabe no orçamento"""
+    max_rows = rows_for_budget(memory_mb, PATIENT_ROW_BYTES)
+    sample = stratified_sample(path, labels, max_rows, batch_rows, seed)
+    print(f"Amostra estratificada: {len(sample)} de {sum(labels.values())} pacientes "
+          f"({sample[LABEL].mean():.2%} com sepse)")
+    X, y = sample[FEATURE_COLUMNS], sample[LABEL]
+    model, feature_names, calibration, imputation = train_random_forest(X, y, sample[FOLD])
+    return model, feature_names, calibration, imputation, X
+
+def train_warm_start(path: str, counts: Dict[str, Any], batch_rows: int,
+                     trees_per_batch: Optional[int] = None, seed: int = 42):
+    """
+    Floresta treinada lote a lote com warm_start, cada lote acrescentando árvores
+
+    As medianas de imputação vêm de uma amostra estratificada da tabela e os
+    folds de calibração e de teste (limitados a um lote em memória) ficam
+    fora do treino.
+
+    Sem trees_per_batch, as N_ESTIMATORS árvores são divididas entre os lotes
+    pela fração acumulada de pacientes lidos, então o último lote completa o
+    total (as árvores de um lote ignorado passam para o seguinte).
+    """
+    labels, folds = counts["labels"], counts["folds"]
+    holdout_folds = [TEST_FOLD, CALIBRATION_FOLD]
+    n_holdout = sum(sum(folds.get(fold, {}).values()) for fold in holdout_folds)
+    total_rows = sum(labels.values())
+    rows_read = 0
+
+    imputation = fit_imputation(stratified_sample(path, labels, batch_rows, batch_rows, seed)[FEATURE_COLUMNS])
+    imputer = FeatureImputer(FEATURE_COLUMNS, imputation)
+
+    rng = np.random.default_rng(seed)
+    holdout_rate = min(1.0, batch_rows / max(1, n_holdout))
+    holdout = []
+    model = RandomForestClassifier(n_estimators=0, warm_start=True, random_state=seed, **FOREST_PARAMS)
+    for batch, frame in enumerate(iter_frames(path, batch_rows, [FOLD] + FEATURE_COLUMNS + [LABEL])):
+        rows_read += len(frame)
+        separated = frame[FOLD].isin(holdout_folds).to_numpy()
+        holdout.append(frame[separated & (rng.random(len(frame)) < holdout_rate)])
+
+        train = frame[~separated]
+        y = train[LABEL].to_numpy()
+        if len(np.unique(y)) < 2:
+            print(f"Lote {batch}: apenas uma classe, ignorado")
+            continue
+        X = train[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        imputer.transform(X)
+        if trees_per_batch:
+            # Lotes finais menores recebem menos árvores
+            new_trees = max(1, int(round(trees_per_batch * min(1.0, len(frame) / batch_rows))))
+        else:
+            new_trees = int(round(N_ESTIMATORS * min(1.0, rows_read / max(1, total_rows)))) - model.n_estimators
+        if new_trees <= 0:
+            print(f"Lote {batch}: fração de pacientes menor que uma árvore, ignorado")
+            continue
+        model.n_estimators += new_trees
+        model.fit(pd.DataFrame(X, columns=FEATURE_COLUMNS), y)
+        print(f"Lote {batch}: {len(train)} pacientes, {model.n_estimators} árvores, "
+              f"{current_memory_mb():.0f} MB")
+
+    if model.n_estimators == 0:
+        raise ValueError("Nenhum lote com as duas classes para treinar")
+    if not trees_per_batch and model.n_estimators != N_ESTIMATORS:
+        print(f"⚠️ Floresta com {model.n_estimators} árvores (esperado {N_ESTIMATORS}): "
+              f"os últimos lotes foram ignorados")
+
+    holdout = pd.concat(holdout, ignore_index=True)
+    X_holdout = holdout[FEATURE_COLUMNS]
+    X_values = X_holdout.to_numpy(dtype=np.float64, copy=True)
+    imputer.transform(X_values)
+    probabilities = model.predict_proba(pd.DataFrame(X_values, columns=FEATURE_COLUMNS))[:, 1]
+    y_holdout = holdout[LABEL].to_numpy()
+
+    calib = (holdout[FOLD] == CALIBRATION_FOLD).to_numpy()
+    calibration = fit_calibration(y_holdout[calib], probabilities[calib])
+    test_probabilities = probabilities[~calib]
+    y_test = y_holdout[~calib]
+    calibration["metrics"] = {
+        "raw": calibration_metrics(y_test, test_probabilities),
+        "calibrated": calibration_metrics(y_test, np.interp(test_probabilities, calibration["x"], calibration["y"]))
+    }
+
+    y_pred = (test_probabilities >= 0.5).astype(int)
+    print(f"Acurácia (teste): {accuracy_score(y_test, y_pred):.4f}")
+    if len(np.unique(y_test)) == 2:
+        print(f"AUROC (teste): {roc_auc_score(y_test, test_probabilities):.4f}")
+    print(f"Calibração (teste): {calibration['metrics']}")
+    print(classification_report(y_test, y_pred, zero_division=0))
+    return model, list(FEATURE_COLUMNS), calibration, imputation, X_holdout
+
+def main():
+    parser = argparse.ArgumentParser(description="Treino fora da memória a partir de dados horários")
+    parser.add_argument("--hourly", help="Arquivo horário (CSV ou Parquet) a agregar por paciente")
+    parser.add_argument("--table", required=True, help="Tabela por paciente (gerada a partir de --hourly ou existente)")
+    parser.add_argument("--mode", choices=["warm_start", "subsample"], default="warm_start")
+    parser.add_argument("--memory-mb", type=float, default=2048, help="Orçamento de memória do processo")
+    parser.add_argument("--batch-rows", type=int, help="Pacientes por lote (padrão: pelo orçamento)")
+    parser.add_argument("--trees-per-batch", type=int, help=f"Árvores por lote (padrão: {N_ESTIMATORS} no total)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-save", action="store_true", help="Apenas treina e avalia, sem gravar os artefatos em ml/")
+    args = parser.parse_args()
+
+    print("=== TREINAMENTO FORA DA MEMÓRIA ===\n")
+    counts = None
+    if args.hourly:
+        counts = build_patient_table(args.hourly, args.table, args.memory_mb)
+
+    batch_rows = args.batch_rows or rows_for_budget(args.memory_mb, PATIENT_ROW_BYTES)
+    counts = counts or count_labels(args.table, batch_rows)
+    print(f"Pacientes por classe: {counts['labels']}; lotes de {batch_rows} pacientes")
+
+    start = time.perf_counter()
+    if args.mode == "subsample":
+        model, feature_names, calibration, imputation, X = train_subsample(
+            args.table, counts["labels"], args.memory_mb, batch_rows, args.seed)
+    else:
+        model, feature_names, calibration, imputation, X = train_warm_start(
+            args.table, counts, batch_rows, args.trees_per_batch, args.seed)
+    report = memory_report(args.memory_mb)
+    print(f"Treino: {time.perf_counter() - start:.1f} s, {len(model.estimators_)} árvores, "
+          f"pico {report['peak_memory_mb']:.0f} MB (orçamento {args.memory_mb:.0f} MB)")
+
+    if not args.no_save:
+        drift_reference = build_drift_reference(model, feature_names, calibration, imputation, X)
+        save_model(model, feature_names, calibration, imputation, drift_reference)
+
+if __name__ == "__main__":
+    main()
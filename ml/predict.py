@@ -1,58 +1,143 @@
+import hashlib
+import logging
+import os
 import joblib
 import numpy as np
-import pandas as pd
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Mapping, Tuple
+
+from ml.risk import RISK_LEVELS, classify_risk, format_risk_message
+from ml.limits import ValidationResult, validate_matrix
+from ml.imputation import FeatureImputer, imputed_field_names
+
+logger = logging.getLogger(__name__)
+
+# Campo da API -> feature do modelo
+FEATURE_MAPPING = {
+    'hr': 'HR_mean',
+    'o2sat': 'O2Sat_mean', 
+    'temp': 'Temp_mean',
+    'sbp': 'SBP_mean',
+    'dbp': 'DBP_mean',
+    'map': 'MAP_mean',
+    'resp': 'Resp_mean',
+    'age': 'Age_mean',
+    'gender': 'Gender_mean',
+    'unit1': 'Unit1_mean',
+    'unit2': 'Unit2_mean',
+    'hosp_adm_time': 'HospAdmTime_mean',
+    'iculos': 'ICULOS_mean'
+}
 
 class SepsisPredictor:
     
     def __init__(self, model_path: str = 'ml/model.joblib', 
-                 feature_info_path: str = 'ml/feature_info.joblib'):
+                 feature_info_path: str = 'ml/feature_info.joblib',
+                 explainer_path: str = 'ml/explainer.joblib',
+                 calibration_path: str = 'ml/calibration.joblib'):
+        self.explainer_path = explainer_path
+        self.explainer = None
+        self.score_cache = None
         try:
             self.model = joblib.load(model_path)
             self.feature_info = joblib.load(feature_info_path)
             self.feature_names = self.feature_info['feature_names']
-            print(f"Modelo carregado com sucesso. Features: {self.feature_names}")
+            self.model_version = self._compute_version(model_path)
+            logger.info("Modelo carregado", extra={
+                "model_version": self.model_version,
+                "n_features": len(self.feature_names)
+            })
+            logger.debug("Features do modelo: %s", self.feature_names)
+            
+            # Calibração opcional (ausente em modelos treinados sem calibração)
+            from ml.calibration import ProbabilityCalibrator
+            self.calibrator = ProbabilityCalibrator.load(calibration_path)
+            
+            # Medianas por unidade para features ausentes (salvas no treinamento)
+            self.imputer = FeatureImputer(self.feature_names, self.feature_info.get('imputation'))
+            if self.imputer.source == "default":
+                logger.warning("Modelo sem medianas de imputação; usando valores típicos de UTI")
         except Exception as e:
             raise Exception(f"Erro ao carregar modelo: {str(e)}")
+        
+        # Campo da API correspondente a cada coluna do modelo (None se não houver)
+        reverse_mapping = {value: key for key, value in FEATURE_MAPPING.items()}
+        self.input_keys = [reverse_mapping.get(name) for name in self.feature_names]
+    
+    @classmethod
+    def from_directory(cls, directory: str) -> "SepsisPredictor":
+        """Carrega os artefatos salvos pelo treinamento em um diretório (model.joblib, ...)"""
+        return cls(
+            os.path.join(directory, 'model.joblib'),
+            os.path.join(directory, 'feature_info.joblib'),
+            os.path.join(directory, 'explainer.joblib'),
+            os.path.join(directory, 'calibration.joblib')
+        )
+    
+    @staticmethod
+    def _compute_version(model_path: str) -> str:
+        """Identifica o modelo pelo hash do arquivo"""
+        digest = hashlib.sha1()
+        with open(model_path, 'rb') as model_file:
+            for block in iter(lambda: model_file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()[:12]
     
     def preprocess_input(self, input_data: Dict[str, Any]) -> np.ndarray:
-        feature_mapping = {
-            'hr': 'HR_mean',
-            'o2sat': 'O2Sat_mean', 
-            'temp': 'Temp_mean',
-            'sbp': 'SBP_mean',
-            'dbp': 'DBP_mean',
-            'map': 'MAP_mean',
-            'resp': 'Resp_mean',
-            'age': 'Age_mean',
-            'gender': 'Gender_mean',
-            'unit1': 'Unit1_mean',
-            'unit2': 'Unit2_mean',
-            'hosp_adm_time': 'HospAdmTime_mean',
-            'iculos': 'ICULOS_mean'
-        }
+        """Monta a matriz de features de um paciente (campos ausentes ficam NaN)"""
+        features = [
+            input_data.get(key) if key else None
+            for key in self.input_keys
+        ]
         
-
-        features = []
-        for feature_name in self.feature_names:
-            input_key = None
-            for key, value in feature_mapping.items():
-                if value == feature_name:
-                    input_key = key
-                    break
-            
-            if input_key and input_key in input_data:
-                features.append(input_data[input_key])
-            else:
-                features.append(0.0)
+        return np.array(features, dtype=np.float64).reshape(1, -1)
+    
+    def preprocess_batch(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """Monta a matriz de features (n_linhas x n_features) de um lote"""
+        X = np.full((len(rows), len(self.input_keys)), np.nan, dtype=np.float64, order="F")
+        for j, key in enumerate(self.input_keys):
+            if key:
+                X[:, j] = [row.get(key) for row in rows]
+        return X
+    
+    def preprocess_columns(self, columns: Mapping[str, np.ndarray], n_rows: int) -> np.ndarray:
+        """
+        Monta a matriz de features a partir de colunas (ex.: payload Arrow)
+        
+        A matriz já sai em float32 e ordem de colunas (Fortran), o formato que
+        as árvores do sklearn leem: cada coluna é uma cópia contígua e o
+        predict_proba não precisa converter a matriz de novo.
+        """
+        X = np.full((n_rows, len(self.input_keys)), np.nan, dtype=np.float32, order="F")
+        for j, key in enumerate(self.input_keys):
+            if key and key in columns:
+                X[:, j] = columns[key]
+        return X
+    
+    def enable_score_cache(self, max_size: int = 100000):
+        """Ativa o cache de scores por faixas de limiares (resultados idênticos ao modelo)"""
+        from ml.score_cache import QuantizedScoreCache
+        self.score_cache = QuantizedScoreCache(self.model, max_size)
+    
+    def _model_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(X)[:, 1]
+    
+    def predict_proba_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidade (calibrada, se houver calibração) de sepse para cada linha"""
+        if self.score_cache is not None:
+            probabilities = self.score_cache.predict(X, self._model_proba)
+        else:
+            probabilities = self._model_proba(X)
         
-        return np.array(features).reshape(1, -1)
+        if self.calibrator is not None:
+            probabilities = self.calibrator.apply(probabilities)
+        return probabilities
     
     def predict(self, input_data: Dict[str, Any]) -> Tuple[float, str, str]:
         try:
             X = self.preprocess_input(input_data)
+            self.impute(X)
             
-            prediction_proba = self.model.predict_proba(X)[0, 1]
+            prediction_proba = self.predict_proba_matrix(X)[0]
             
             risk_level, message = self._get_risk_level(prediction_proba)
             
@@ -61,26 +146,111 @@ class SepsisPredictor:
         except Exception as e:
             raise Exception(f"Erro durante predição: {str(e)}")
     
+    def validate_matrix(self, X: np.ndarray) -> ValidationResult:
+        """Aplica os limites fisiológicos (ml.limits) aos valores informados, por linha"""
+        return validate_matrix(X, self.input_keys, allow_missing=True)
+    
+    def impute(self, X: np.ndarray) -> np.ndarray:
+        """Preenche as features ausentes (NaN) de X; retorna a máscara das células imputadas"""
+        return self.imputer.transform(X)
+    
+    def imputed_fields(self, mask: np.ndarray) -> List[str]:
+        """Campos da API imputados em uma linha da máscara"""
+        return imputed_field_names(mask, self.input_keys)
+    
+    def predict_matrix(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(probabilidades, códigos de risco) de uma matriz já montada"""
+        try:
+            probabilities = self.predict_proba_matrix(X)
+            return probabilities, classify_risk(probabilities)
+        except Exception as e:
+            raise Exception(f"Erro durante predição: {str(e)}")
+    
+    def predict_batch(self, rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Faz a predição de um lote em uma única chamada ao modelo
+        
+        Returns:
+            (probabilidades, códigos de risco) como arrays numpy
+        """
+        X = self.preprocess_batch(rows)
+        self.impute(X)
+        return self.predict_matrix(X)
+    
+    def predict_columns(self, columns: Mapping[str, np.ndarray], n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Como predict_batch, mas com os campos já em colunas numpy"""
+        X = self.preprocess_columns(columns, n_rows)
+        self.impute(X)
+        return self.predict_matrix(X)
+    
+    def explain(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Faz a predição e decompõe a probabilidade em contribuições por feature
+        
+        Returns:
+            Probabilidade, nível de risco, mensagem, bias e contribuições
+            (bias + soma das contribuições == probabilidade)
+        """
+        try:
+            if self.explainer is None:
+                from ml.explain import TreePathExplainer
+                self.explainer = TreePathExplainer.load(self.explainer_path, model=self.model)
+            
+            X = self.preprocess_input(input_data)
+            imputed = self.impute(X)
+            raw_probability, bias, contributions = self.explainer.explain(X[0])
+            
+            # As contribuições explicam o score bruto; o risco usa o valor calibrado
+            probability = raw_probability
+            if self.calibrator is not None:
+                probability = float(self.calibrator.apply(raw_probability))
+            risk_level, message = self._get_risk_level(probability)
+            
+            return {
+                "probability": probability,
+                "raw_probability": raw_probability,
+                "risk_level": risk_level,
+                "message": message,
+                "bias": bias,
+                "contributions": dict(zip(self.feature_names, contributions.tolist())),
+                "values": dict(zip(self.feature_names, X[0].tolist())),
+                "imputed_fields": self.imputed_fields(imputed[0])
+            }
+            
+        except Exception as e:
+            raise Exception(f"Erro durante explicação: {str(e)}")
+    
     def _get_risk_level(self, probability: float) -> Tuple[str, str]:
-        if probability < 0.2:
-            return "Baixo", f"Paciente com baixo risco de sepse ({probability:.1%})"
-        elif probability < 0.5:
-            return "Moderado", f"Paciente com risco moderado de sepse ({probability:.1%})"
-        elif probability < 0.8:
-            return "Alto", f"Paciente com alto risco de sepse ({probability:.1%})"
-        else:
-            return "Crítico", f"Paciente com risco crítico de sepse ({probability:.1%})"
+        code = int(classify_risk(probability))
+        return RISK_LEVELS[code], format_risk_message(code, probability)
     
     def get_feature_importance(self) -> Dict[str, float]:
         return self.feature_info['feature_importance']
     
+    def get_calibration_info(self) -> Dict[str, Any]:
+        if self.calibrator is None:
+            return {"available": False}
+        return self.calibrator.get_info()
+    
+    def get_imputation_info(self) -> Dict[str, Any]:
+        return self.imputer.get_info()
+    
     def get_available_features(self) -> list:
         return self.feature_names.copy()
 
+_default_predictor = None
+
+def _get_default_predictor() -> SepsisPredictor:
+    """Carrega o modelo padrão uma única vez por processo"""
+    global _default_predictor
+    if _default_predictor is None:
+        _default_predictor = SepsisPredictor()
+    return _default_predictor
+
 def predict_sepsis(input_data: Dict[str, Any]) -> Dict[str, Any]:
     #teste ok
     try:
-        predictor = SepsisPredictor()
+        predictor = _get_default_predictor()
         probability, risk_level, message = predictor.predict(input_data)
         
         return {
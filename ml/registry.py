@@ -0,0 +1,225 @@
+"""
+Registro de modelos por unidade ou hospital (tenant)
+
+O modelo padrão (artefatos em ml/) atende todas as requisições até que um
+manifesto JSON (MODEL_REGISTRY_PATH) declare outros modelos e as rotas:
+
+    {
+      "models": {"uti-cardio": "models/uti-cardio", "hospital-a": "models/hospital-a"},
+      "routes": {"unit1": "uti-cardio", "hospital-a": "hospital-a", "hospital-a:unit2": "uti-cardio"}
+    }
+
+Cada diretório tem os artefatos gerados por ml/train_model.py (com as
+mesmas features do modelo padrão). A rota de uma linha é a mais específica
+entre "tenant:unidade", "tenant" e "unidade", caindo no modelo padrão; a
+unidade vem das flags Unit1/Unit2 (unit1, unit2 ou other).
+
+Os modelos são carregados na primeira requisição roteada a eles e mantidos
+em LRU dentro de um orçamento de memória: ao passar do orçamento, os menos
+usados recentemente são descartados (e recarregados se voltarem a ser
+usados). O modelo padrão fica sempre carregado e fora do orçamento.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from ml.imputation import UNIT_GROUPS, unit_groups
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "default"
+
+# Artefatos contabilizados no orçamento (arrays numpy: tamanho em disco ~ memória)
+ARTIFACTS = ('model.joblib', 'explainer.joblib', 'calibration.joblib', 'feature_info.joblib')
+
+def load_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """Lê o manifesto do registro; None se não existe (apenas o modelo padrão)"""
+    try:
+        with open(path) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+
+def estimate_memory(directory: str) -> int:
+    """Memória estimada de um modelo: tamanho dos artefatos em disco"""
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for name in ARTIFACTS if os.path.exists(os.path.join(directory, name))
+    )
+
+class ModelRegistry:
+    """Modelos por tenant/unidade com carga sob demanda e LRU por orçamento de memória"""
+
+    def __init__(self, default, manifest: Optional[Dict[str, Any]] = None,
+                 memory_budget: int = 2 << 30, loader: Optional[Callable[[str], Any]] = None):
+        """
+        Args:
+            default: SepsisPredictor do modelo padrão (sempre carregado)
+            manifest: Modelos ({nome: diretório}) e rotas ({chave: nome})
+            memory_budget: Orçamento (bytes) dos modelos carregados sob demanda
+            loader: Função que carrega um modelo a partir do diretório
+        """
+        manifest = manifest or {}
+        self.default = default
+        self.memory_budget = memory_budget
+        self.loader = loader
+        self.models: Dict[str, str] = dict(manifest.get("models", {}))
+        self.routes: Dict[str, str] = {}
+        for key, name in manifest.get("routes", {}).items():
+            if name == DEFAULT_MODEL or name in self.models:
+                self.routes[key] = name
+            else:
+                logger.warning("Rota '%s' aponta para modelo desconhecido '%s'; ignorada", key, name)
+
+        self._loaded: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.memory_used = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+        # Unidade de cada linha (índices de UNIT_GROUPS) a partir das colunas do modelo padrão
+        self._unit_columns = (default.input_keys.index("unit1") if "unit1" in default.input_keys else None,
+                              default.input_keys.index("unit2") if "unit2" in default.input_keys else None)
+
+    def resolve(self, tenant: Optional[str], unit: Optional[str]) -> str:
+        """Nome do modelo de um tenant/unidade (rota mais específica)"""
+        if not self.routes:
+            return DEFAULT_MODEL
+        keys = []
+        if tenant and unit:
+            keys.append(f"{tenant}:{unit}")
+        if tenant:
+            keys.append(tenant)
+        if unit:
+            keys.append(unit)
+        for key in keys:
+            if key in self.routes:
+                return self.routes[key]
+        return DEFAULT_MODEL
+
+    def get(self, name: str):
+        """Preditor de um modelo, carregando-o (e liberando orçamento) se preciso"""
+        if name == DEFAULT_MODEL:
+            return self.default
+
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+
+        # Cargas são serializadas; quem esperava pelo mesmo modelo o encontra carregado
+        with self._load_lock:
+            with self._lock:
+                entry = self._loaded.get(name)
+                if entry is not None:
+                    self._loaded.move_to_end(name)
+                    self.hits += 1
+                    return entry[0]
+
+            directory = self.models[name]
+            predictor = self.loader(directory)
+            size = estimate_memory(directory)
+            if size > self.memory_budget:
+                logger.warning("Modelo '%s' (%d MB) maior que o orçamento de memória", name, size >> 20)
+
+            with self._lock:
+                self._loaded[name] = (predictor, size)
+                self.memory_used += size
+                self.loads += 1
+                # O modelo recém-carregado (o último) nunca é descartado
+                while self.memory_used > self.memory_budget and len(self._loaded) > 1:
+                    evicted, (_, evicted_size) = self._loaded.popitem(last=False)
+                    self.memory_used -= evicted_size
+                    self.evictions += 1
+                    logger.info("Modelo '%s' descartado da memória (LRU)", evicted)
+            logger.info("Modelo '%s' carregado", name, extra={"model_version": predictor.model_version})
+            return predictor
+
+    def row_units(self, X: np.ndarray) -> np.ndarray:
+        """Unidade de cada linha (índice em UNIT_GROUPS; 'all' quando as flags faltam)"""
+        unit1_j, unit2_j = self._unit_columns
+        if unit1_j is None or unit2_j is None:
+            return np.full(len(X), UNIT_GROUPS.index("all"), dtype=np.intp)
+        return unit_groups(X[:, unit1_j], X[:, unit2_j])
+
+    def route(self, X: np.ndarray, tenant: Optional[str] = None) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """
+        Agrupa as linhas de X por modelo de destino
+
+        Returns:
+            [(nome do modelo, índices das linhas)]; índices None = todas as linhas
+        """
+        if not self.routes:
+            return [(DEFAULT_MODEL, None)]
+
+        # Modelo de cada unidade (no máximo 4 resoluções por lote)
+        names = [self.resolve(tenant, unit if unit != "all" else None) for unit in UNIT_GROUPS]
+        if len(set(names)) == 1:
+            return [(names[0], None)]
+
+        units = self.row_units(X)
+        partitions = []
+        for name in dict.fromkeys(names):
+            codes = [code for code, unit_name in enumerate(names) if unit_name == name]
+            rows = np.flatnonzero(np.isin(units, codes))
+            if len(rows) == len(X):
+                return [(name, None)]
+            if len(rows):
+                partitions.append((name, rows))
+        return partitions
+
+    def predict_matrix(self, X: np.ndarray, tenant: Optional[str] = None):
+        """
+        Imputa e prediz X com o modelo de cada linha (uma chamada vetorizada por modelo)
+
+        X é preenchido no próprio array, como em SepsisPredictor.impute.
+
+        Returns:
+            (probabilidades, códigos de risco, máscara imputada, {modelo: linhas})
+        """
+        partitions = self.route(X, tenant)
+        if partitions[0][1] is None:
+            name = partitions[0][0]
+            predictor = self.get(name)
+            imputed = predictor.impute(X)
+            probabilities, codes = predictor.predict_matrix(X)
+            return probabilities, codes, imputed, {name: len(X)}
+
+        probabilities = np.empty(len(X), dtype=np.float64)
+        codes = np.empty(len(X), dtype=np.int8)
+        imputed = np.zeros(X.shape, dtype=bool)
+        counts = {}
+        for name, rows in partitions:
+            predictor = self.get(name)
+            X_part = X[rows]
+            imputed[rows] = predictor.impute(X_part)
+            probabilities[rows], codes[rows] = predictor.predict_matrix(X_part)
+            X[rows] = X_part
+            counts[name] = len(rows)
+        return probabilities, codes, imputed, counts
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {
+                name: {"model_version": predictor.model_version, "memory_mb": round(size / 2 ** 20, 1)}
+                for name, (predictor, size) in self._loaded.items()
+            }
+            return {
+                "models": sorted(self.models),
+                "routes": dict(self.routes),
+                "loaded": loaded,
+                "memory_used_mb": round(self.memory_used / 2 ** 20, 1),
+                "memory_budget_mb": round(self.memory_budget / 2 ** 20, 1),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
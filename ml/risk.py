@@ -0,0 +1,40 @@
+"""
+Classificação vetorizada do nível de risco de sepse
+
+Os limiares ficam definidos apenas aqui. A classificação devolve códigos
+numéricos (0=Baixo ... 3=Crítico) para um array inteiro de probabilidades;
+nomes e mensagens só são gerados quando o cliente pede.
+"""
+import numpy as np
+from typing import List, Union
+
+# Limiares entre os níveis: [0, 0.2) Baixo, [0.2, 0.5) Moderado, [0.5, 0.8) Alto, [0.8, 1] Crítico
+RISK_THRESHOLDS = np.array([0.2, 0.5, 0.8])
+
+# Nível de risco de cada código
+RISK_LEVELS = ["Baixo", "Moderado", "Alto", "Crítico"]
+
+RISK_MESSAGES = [
+    "Paciente com baixo risco de sepse ({:.1%})",
+    "Paciente com risco moderado de sepse ({:.1%})",
+    "Paciente com alto risco de sepse ({:.1%})",
+    "Paciente com risco crítico de sepse ({:.1%})",
+]
+
+_RISK_LEVEL_ARRAY = np.array(RISK_LEVELS, dtype=object)
+
+def classify_risk(probabilities: Union[float, np.ndarray]) -> np.ndarray:
+    """Converte probabilidades em códigos de risco (int8) em uma única passada"""
+    return np.digitize(probabilities, RISK_THRESHOLDS).astype(np.int8)
+
+def risk_level_names(codes: np.ndarray) -> List[str]:
+    """Converte códigos de risco nos nomes dos níveis"""
+    return _RISK_LEVEL_ARRAY[np.asarray(codes, dtype=np.intp)].tolist()
+
+def format_risk_message(code: int, probability: float) -> str:
+    """Gera a mensagem descritiva de um resultado"""
+    return RISK_MESSAGES[int(code)].format(float(probability))
+
+def format_risk_messages(codes: np.ndarray, probabilities: np.ndarray) -> List[str]:
+    """Gera as mensagens de um lote (usar apenas quando solicitadas)"""
+    return [format_risk_message(code, probability) for code, probability in zip(codes, probabilities)]
@@ -0,0 +1,96 @@
+"""
+Cache de scores sobre as faixas de limiares usadas pela floresta
+
+Cada árvore só compara uma feature com seus limiares de corte, então duas
+entradas que caem na mesma faixa entre limiares consecutivos em todas as
+features percorrem exatamente os mesmos caminhos e têm a mesma
+probabilidade. A entrada é comprimida no vetor de índices de faixa e o
+score é guardado em um cache LRU por esse vetor: o resultado é idêntico
+ao do modelo, e sinais vitais repetidos (FC inteira, temperatura em
+décimos, flags binárias) reaproveitam scores já calculados.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List
+
+import numpy as np
+
+def split_thresholds(model) -> List[np.ndarray]:
+    """Limiares de corte distintos (ordenados) usados pela floresta em cada feature"""
+    per_feature: List[List[np.ndarray]] = [[] for _ in range(model.n_features_in_)]
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        internal = tree.children_left != -1
+        for feature in np.unique(tree.feature[internal]):
+            per_feature[feature].append(tree.threshold[internal & (tree.feature == feature)])
+    return [
+        np.unique(np.concatenate(thresholds)) if thresholds else np.array([], dtype=np.float64)
+        for thresholds in per_feature
+    ]
+
+class QuantizedScoreCache:
+    """Cache LRU de probabilidades indexado pelas faixas de limiares de cada feature"""
+
+    def __init__(self, model, max_size: int = 100000):
+        self.thresholds = split_thresholds(model)
+        self.max_size = max_size
+        self._scores: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bin_codes(self, X: np.ndarray) -> np.ndarray:
+        """
+        Converte cada linha no índice da faixa de cada feature
+
+        O índice é a quantidade de limiares estritamente menores que o valor,
+        o que reproduz a regra `x <= limiar` das árvores (em float32, como o sklearn).
+        """
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        codes = np.empty(X.shape, dtype=np.int32)
+        for j, thresholds in enumerate(self.thresholds):
+            codes[:, j] = np.searchsorted(thresholds, X[:, j], side="left")
+        return codes
+
+    def predict(self, X: np.ndarray, score_fn: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """Retorna as probabilidades, calculando com score_fn apenas as linhas fora do cache"""
+        keys = [row.tobytes() for row in self.bin_codes(X)]
+        # NaN/inf não têm faixa (o searchsorted os põe na última): vão direto ao modelo
+        finite = np.isfinite(np.asarray(X, dtype=np.float64)).all(axis=1)
+        probabilities = np.empty(len(keys), dtype=np.float64)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._scores.get(key) if finite[i] else None
+                if score is None:
+                    missing.append(i)
+                else:
+                    self._scores.move_to_end(key)
+                    probabilities[i] = score
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            probabilities[missing] = score_fn(X[missing])
+            with self._lock:
+                for i in missing:
+                    if finite[i]:
+                        self._scores[keys[i]] = float(probabilities[i])
+                while len(self._scores) > self.max_size:
+                    self._scores.popitem(last=False)
+
+        return probabilities
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taxa de acerto e ocupação do cache"""
+        total = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self._scores),
+            "max_size": self.max_size,
+            "bins_per_feature": [len(thresholds) + 1 for thresholds in self.thresholds]
+        }
@@ -0,0 +1,297 @@
+"""
+Gerador determinístico de dados horários sintéticos para testes de escala
+
+Gera registros horários no formato do PhysioNet/CinC 2019 (uma linha por
+paciente e hora, com Patient_ID e SepsisLabel) que seguem as distribuições
+marginais e as correlações de um perfil:
+
+- os sinais vitais vêm de uma cópula gaussiana: um vetor latente correlacionado
+  (componente fixa do paciente + ruído por hora, com a mesma correlação) é
+  levado a cada marginal pelos quantis do perfil
+- a PAM é derivada de SBP e DBP (dentro da tolerância de ml.limits)
+- pacientes sépticos têm os sinais deslocados nas horas que antecedem o
+  início da sepse; o SepsisLabel vale 1 a partir de 6 horas antes dele
+- ausências seguem a taxa de cada coluna, e os valores ficam dentro dos
+  limites fisiológicos aceitos pela API
+
+O perfil pode ser ajustado a partir de um CSV horário (fit_profile) e salvo
+em JSON, que contém apenas quantis, taxas e correlações; sem perfil são
+usados valores típicos de UTI (DEFAULT_PROFILE).
+
+Os pacientes são gerados em blocos com sementes derivadas de (seed, bloco),
+então a mesma semente e os mesmos parâmetros produzem o mesmo arquivo,
+independentemente do tamanho dos chunks escritos.
+
+Uso:
+    python -m ml.synthetic --rows 10000000 --output data/synthetic.parquet
+"""
+import argparse
+import json
+import time
+from typing import Dict, Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from ml.dataset_io import write_dataset
+from ml.limits import LIMITS, MAP_TOLERANCE, expected_map
+
+# Sinais vitais gerados pela cópula (a PAM é derivada de SBP/DBP)
+VITALS = ["HR", "O2Sat", "Temp", "SBP", "DBP", "Resp"]
+
+# Colunas do arquivo gerado (nomes do PhysioNet)
+COLUMNS = ["Patient_ID", "HR", "O2Sat", "Temp", "SBP", "MAP", "DBP", "Resp", "Age", "Gender",
+           "Unit1", "Unit2", "HospAdmTime", "ICULOS", "SepsisLabel"]
+
+# Campo de ml.limits de cada coluna numérica
+LIMIT_FIELDS = {"HR": "hr", "O2Sat": "o2sat", "Temp": "temp", "SBP": "sbp", "MAP": "map", "DBP": "dbp",
+                "Resp": "resp", "Age": "age", "HospAdmTime": "hosp_adm_time"}
+
+# Casas decimais na saída (como os monitores registram)
+DECIMALS = {"HR": 0, "O2Sat": 0, "Temp": 1, "SBP": 0, "MAP": 0, "DBP": 0, "Resp": 0, "Age": 0, "HospAdmTime": 2}
+
+# Pacientes por bloco (unidade da semente derivada)
+BLOCK_PATIENTS = 1024
+
+# Fração da variância latente que é fixa do paciente (autocorrelação entre as horas)
+PERSISTENCE = 0.6
+
+# Horas de deslocamento gradual dos sinais antes do início da sepse e antecedência do rótulo
+SEPSIS_RAMP_HOURS = 12
+LABEL_LEAD_HOURS = 6
+
+DEFAULT_SOURCE = "artifacts/dataset/sepsis_data_cleaned.csv"
+
+# Perfil com valores típicos de UTI (aprox. PhysioNet/CinC 2019), nos quantis de "grid"
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "source": "default",
+    "grid": [0, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 1],
+    "quantiles": {
+        "HR": [40, 52, 60, 72, 83, 95, 115, 135, 200],
+        "O2Sat": [70, 86, 91, 96, 98, 99.5, 100, 100, 100],
+        "Temp": [35, 35.4, 35.9, 36.5, 36.9, 37.3, 38.1, 38.8, 41.5],
+        "SBP": [60, 79, 89, 107, 121, 137, 162, 185, 280],
+        "DBP": [25, 37, 43, 52, 60, 69, 83, 98, 180],
+        "Resp": [5, 10, 12, 15, 18, 21, 27, 33, 60],
+        "Age": [18, 22, 30, 51, 64, 74, 85, 89, 100],
+        "HospAdmTime": [0, 0.01, 0.02, 0.05, 6, 50, 300, 1000, 5000],
+        # Horas de internação na UTI por paciente
+        "hours": [8, 11, 14, 24, 38, 47, 95, 190, 336]
+    },
+    # Fração de horas sem registro de cada sinal
+    "missing": {"HR": 0.10, "O2Sat": 0.13, "Temp": 0.66, "SBP": 0.15, "MAP": 0.12, "DBP": 0.31, "Resp": 0.15},
+    # Correlação dos escores normais, na ordem de VITALS
+    "correlation": [
+        [1.00, -0.05, 0.20, 0.00, 0.05, 0.25],
+        [-0.05, 1.00, 0.00, 0.05, 0.05, -0.15],
+        [0.20, 0.00, 1.00, 0.05, 0.05, 0.10],
+        [0.00, 0.05, 0.05, 1.00, 0.60, 0.05],
+        [0.05, 0.05, 0.05, 0.60, 1.00, 0.05],
+        [0.25, -0.15, 0.10, 0.05, 0.05, 1.00]
+    ],
+    # Deslocamento (em desvios do escore normal) dos sinais de pacientes sépticos
+    "sepsis_shift": {"HR": 0.5, "O2Sat": -0.2, "Temp": 0.4, "SBP": -0.25, "DBP": -0.2, "Resp": 0.45},
+    "septic_patients": 0.073,
+    "gender_male": 0.56,
+    "units": {"unit1": 0.31, "unit2": 0.30}
+}
+
+def _nearest_correlation(matrix: np.ndarray) -> np.ndarray:
+    """Garante uma matriz de correlação positiva definida (autovalores mínimos positivos)"""
+    matrix = np.nan_to_num((matrix + matrix.T) / 2)
+    np.fill_diagonal(matrix, 1.0)
+    values, vectors = np.linalg.eigh(matrix)
+    matrix = vectors @ np.diag(np.clip(values, 1e-3, None)) @ vectors.T
+    scale = np.sqrt(np.diag(matrix))
+    return matrix / np.outer(scale, scale)
+
+def _normal_scores(values: pd.Series) -> pd.Series:
+    """Escores normais pelos postos (NaN preservado)"""
+    ranks = values.rank(method="average")
+    return pd.Series(ndtri(ranks / (values.notna().sum() + 1)), index=values.index)
+
+def fit_profile(path: str, patient_column: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ajusta o perfil (quantis, ausências, correlações, efeito da sepse) a partir de um CSV horário
+
+    Args:
+        path: CSV com as colunas do PhysioNet (HR, O2Sat, ..., SepsisLabel) e o ID do paciente
+        patient_column: Coluna do ID (padrão: Patient_ID ou ID)
+    """
+    frame = pd.read_csv(path)
+    patient_column = patient_column or ("Patient_ID" if "Patient_ID" in frame.columns else "ID")
+    grid = np.linspace(0, 1, 101)
+    profile = {"source": path, "grid": grid.tolist(), "quantiles": {}, "missing": {}, "sepsis_shift": {}}
+
+    patients = frame.groupby(patient_column, sort=False)
+    first = patients.first()
+    for name in VITALS:
+        profile["quantiles"][name] = np.nanquantile(frame[name], grid).tolist()
+    for name in ("Age", "HospAdmTime"):
+        profile["quantiles"][name] = np.nanquantile(first[name].abs(), grid).tolist()
+    profile["quantiles"]["hours"] = np.quantile(patients.size(), grid).tolist()
+    for name in VITALS + ["MAP"]:
+        profile["missing"][name] = float(frame[name].isna().mean())
+
+    scores = pd.DataFrame({name: _normal_scores(frame[name]) for name in VITALS})
+    profile["correlation"] = _nearest_correlation(scores.corr().to_numpy()).tolist()
+    septic_rows = frame["SepsisLabel"] == 1
+    for name in VITALS:
+        shift = scores.loc[septic_rows, name].mean() - scores.loc[~septic_rows, name].mean()
+        profile["sepsis_shift"][name] = float(np.nan_to_num(shift))
+
+    profile["septic_patients"] = float(patients["SepsisLabel"].max().mean())
+    profile["gender_male"] = float((first["Gender"] == 1).mean())
+    profile["units"] = {"unit1": float((first["Unit1"] == 1).mean()), "unit2": float((first["Unit2"] == 1).mean())}
+    return profile
+
+def load_profile(source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Perfil de um JSON salvo ou ajustado a partir de um CSV horário
+
+    Sem fonte, usa o CSV de DEFAULT_SOURCE se tiver dados; senão DEFAULT_PROFILE.
+    """
+    if source and source.endswith(".json"):
+        with open(source) as profile_file:
+            return json.load(profile_file)
+
+    path = source or DEFAULT_SOURCE
+    try:
+        return fit_profile(path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        if source:
+            raise
+        return DEFAULT_PROFILE
+
+def patient_hours(profile: Dict[str, Any], n_patients: int, n_rows: Optional[int], seed: int) -> np.ndarray:
+    """
+    Horas de cada paciente, pela distribuição do perfil
+
+    Com n_rows, as durações são escaladas para que a soma seja exatamente n_rows.
+    """
+    rng = np.random.default_rng([seed, 0])
+    hours = np.interp(rng.random(n_patients), profile["grid"], profile["quantiles"]["hours"])
+    if n_rows is None:
+        return np.maximum(1, np.round(hours)).astype(np.int64)
+
+    if n_rows < n_patients:
+        raise ValueError("São necessárias ao menos uma linha por paciente")
+    hours = np.maximum(1, np.round(hours * n_rows / hours.sum())).astype(np.int64)
+    # Ajuste fino (arredondamento) distribuído entre os pacientes
+    while hours.sum() != n_rows:
+        difference = int(n_rows - hours.sum())
+        if difference > 0:
+            hours[:difference] += 1
+        else:
+            adjustable = np.flatnonzero(hours > 1)[:-difference]
+            hours[adjustable] -= 1
+    return hours
+
+def generate_block(profile: Dict[str, Any], hours: np.ndarray, first_patient: int,
+                   rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Gera as linhas horárias de um bloco de pacientes (colunas numpy)"""
+    n_patients, n_rows = len(hours), int(hours.sum())
+    grid = profile["grid"]
+    quantiles = profile["quantiles"]
+    patient = np.repeat(np.arange(n_patients), hours)
+    hour = np.arange(n_rows) - np.repeat(np.cumsum(hours) - hours, hours)
+
+    # Cópula: latente fixo do paciente + ruído horário, ambos com a correlação do perfil
+    cholesky = np.linalg.cholesky(_nearest_correlation(np.array(profile["correlation"], dtype=np.float64)))
+    baseline = rng.standard_normal((n_patients, len(VITALS))) @ cholesky.T
+    latent = rng.standard_normal((n_rows, len(VITALS))) @ cholesky.T
+    latent *= np.sqrt(1 - PERSISTENCE)
+    latent += np.sqrt(PERSISTENCE) * baseline[patient]
+
+    # Sepse: início entre 30% e 100% da internação, sinais deslocados gradualmente antes dele
+    septic = rng.random(n_patients) < profile["septic_patients"]
+    onset = np.floor(rng.uniform(0.3, 1.0, n_patients) * hours)
+    relative = hour - onset[patient]
+    ramp = np.clip((relative + SEPSIS_RAMP_HOURS) / SEPSIS_RAMP_HOURS, 0, 1) * septic[patient]
+    latent += ramp[:, None] * np.array([profile["sepsis_shift"].get(name, 0.0) for name in VITALS])
+
+    columns = {"Patient_ID": np.repeat(np.arange(first_patient, first_patient + n_patients), hours)}
+    probabilities = ndtr(latent)
+    for j, name in enumerate(VITALS):
+        columns[name] = np.interp(probabilities[:, j], grid, quantiles[name])
+    noise = np.clip(rng.normal(0, 3, n_rows), -MAP_TOLERANCE / 2, MAP_TOLERANCE / 2)
+    columns["MAP"] = expected_map(columns["SBP"], columns["DBP"]) + noise
+
+    # Atributos fixos do paciente
+    columns["Age"] = np.interp(rng.random(n_patients), grid, quantiles["Age"])[patient]
+    columns["Gender"] = (rng.random(n_patients) < profile["gender_male"]).astype(np.float64)[patient]
+    unit = rng.random(n_patients)
+    unit1 = unit < profile["units"]["unit1"]
+    unit2 = ~unit1 & (unit < profile["units"]["unit1"] + profile["units"]["unit2"])
+    columns["Unit1"] = unit1.astype(np.float64)[patient]
+    columns["Unit2"] = unit2.astype(np.float64)[patient]
+    columns["HospAdmTime"] = np.interp(rng.random(n_patients), grid, quantiles["HospAdmTime"])[patient]
+    columns["ICULOS"] = (hour + 1).astype(np.float64)
+    columns["SepsisLabel"] = (septic[patient] & (relative >= -LABEL_LEAD_HOURS)).astype(np.int8)
+
+    for name, field in LIMIT_FIELDS.items():
+        limit = LIMITS[field]
+        values = np.clip(columns[name], limit.minimum, limit.maximum if limit.maximum is not None else np.inf)
+        columns[name] = np.round(values, DECIMALS[name])
+    for name, rate in profile["missing"].items():
+        columns[name][rng.random(n_rows) < rate] = np.nan
+
+    return {name: columns[name] for name in COLUMNS}
+
+def generate(profile: Dict[str, Any], n_patients: int, n_rows: Optional[int] = None, seed: int = 42,
+             chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """
+    Gera o conjunto em chunks de aproximadamente chunk_rows linhas (pacientes inteiros)
+
+    Cada bloco de BLOCK_PATIENTS pacientes usa a semente (seed, 1, bloco).
+    """
+    hours = patient_hours(profile, n_patients, n_rows, seed)
+    blocks = []
+    pending = 0
+    for block, start in enumerate(range(0, n_patients, BLOCK_PATIENTS)):
+        block_hours = hours[start:start + BLOCK_PATIENTS]
+        blocks.append(generate_block(profile, block_hours, start + 1, np.random.default_rng([seed, 1, block])))
+        pending += int(block_hours.sum())
+        if pending >= chunk_rows:
+            yield pd.DataFrame({name: np.concatenate([b[name] for b in blocks]) for name in COLUMNS})
+            blocks, pending = [], 0
+    if blocks:
+        yield pd.DataFrame({name: np.concatenate([b[name] for b in blocks]) for name in COLUMNS})
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados horários sintéticos de pacientes de UTI")
+    parser.add_argument("--rows", type=int, help="Total de linhas horárias (ex.: 1000000 a 100000000)")
+    parser.add_argument("--patients", type=int, help="Número de pacientes (padrão: rows / duração média)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="data/synthetic_hourly.csv")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Padrão: pela extensão de --output")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="Linhas por chunk escrito")
+    parser.add_argument("--source", help=f"CSV horário para ajustar o perfil ou perfil .json (padrão: {DEFAULT_SOURCE})")
+    parser.add_argument("--save-profile", help="Salva o perfil usado em JSON (sem dados de pacientes)")
+    args = parser.parse_args()
+
+    if args.rows is None and args.patients is None:
+        parser.error("informe --rows e/ou --patients")
+
+    profile = load_profile(args.source)
+    print(f"Perfil: {profile['source']}")
+    if args.save_profile:
+        with open(args.save_profile, "w") as profile_file:
+            json.dump(profile, profile_file, indent=2)
+
+    n_patients = args.patients
+    if n_patients is None:
+        mean_hours = np.mean(np.interp(np.linspace(0, 1, 1001), profile["grid"], profile["quantiles"]["hours"]))
+        n_patients = max(1, int(args.rows / mean_hours))
+    file_format = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+
+    start = time.perf_counter()
+    n_rows = write_dataset(generate(profile, n_patients, args.rows, args.seed, args.chunk_rows),
+                           args.output, file_format)
+    elapsed = time.perf_counter() - start
+    print(f"{n_rows} linhas de {n_patients} pacientes em '{args.output}' "
+          f"({elapsed:.1f} s, {n_rows / elapsed:,.0f} linhas/s)")
+
+if __name__ == "__main__":
+    main()
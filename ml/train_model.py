@@ -1,49 +1,77 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import PredefinedSplit, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import joblib
 import os
+import sys
 
-def load_and_preprocess_data():
+# Permite executar como script (python ml/train_model.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.explain import build_tables, save_tables
+from ml.calibration import fit_calibration, calibration_metrics
+from ml.imputation import fit_imputation, FeatureImputer
+from ml.drift import build_reference, save_reference, reference_frame
+from ml.features import FEATURE_COLUMNS, FOLD, LABEL, load_features, split_masks
+
+# Dados de treino: tabela de features com folds (ml/features.py), tabela agregada
+# sem folds ou dados horários
+TRAINING_DATA = 'data/dataset_processado.csv'
+
+# Dados de referência do monitor de drift (se ausente, usa os dados de treino)
+DRIFT_REFERENCE_DATA = 'artifacts/dataset/sepsis_data_cleaned.csv'
+
+def load_and_preprocess_data(path=TRAINING_DATA):
     print("Carregando dados... AGORA FOI")
     
-    # Carrega o dataset
-    df = pd.read_csv('data/dataset_processado.csv')
+    # Carrega o dataset (com o fold de cada paciente)
+    df = load_features(path)
     
     print(f"Dataset carregado com {len(df)} registros e {len(df.columns)} colunas")
     print(f"Colunas disponíveis: {list(df.columns)}")
     
-    feature_columns = [
-        'HR_mean', 'O2Sat_mean', 'Temp_mean', 
-        'SBP_mean', 'DBP_mean', 'MAP_mean', 'Resp_mean',
-        'Age_mean', 'Gender_mean', 'Unit1_mean', 'Unit2_mean',
-        'HospAdmTime_mean', 'ICULOS_mean'
-    ]
-    
-    available_features = [col for col in feature_columns if col in df.columns]
+    available_features = [col for col in FEATURE_COLUMNS if col in df.columns]
     print(f"Features disponíveis: {available_features}")
     
     X = df[available_features].copy()
-    y = df['SepsisLabel']
+    y = df[LABEL]
+    folds = df[FOLD]
     
-    mask = ~(X.isnull().any(axis=1) | y.isnull())
+    # Features ausentes são imputadas (medianas do treino); só o rótulo é obrigatório
+    mask = ~y.isnull()
     X = X[mask]
     y = y[mask]
+    folds = folds[mask]
     
     print(f"Dados após limpeza: {len(X)} registros")
+    print(f"Valores ausentes por feature: {X.isnull().sum()[lambda counts: counts > 0].to_dict()}")
     print(f"Distribuição das classes: {y.value_counts().to_dict()}")
+    print(f"Pacientes com sepse por fold: {y.groupby(folds).mean().round(4).to_dict()}")
     
-    return X, y
+    return X, y, folds
 
-def train_random_forest(X, y):
+def train_random_forest(X, y, folds):
     print("Treinando modelo Random Forest...")
     
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    # Partes pelos folds de paciente: um fold para teste, um para calibrar as probabilidades
+    fit_mask, calib_mask, test_mask = split_masks(folds)
+    X_fit, y_fit = X[fit_mask], y[fit_mask]
+    X_calib, y_calib = X[calib_mask], y[calib_mask]
+    X_test, y_test = X[test_mask], y[test_mask]
+    
+    # Medianas por unidade calculadas só na parte de ajuste e aplicadas a todas as partes,
+    # como na inferência
+    imputation = fit_imputation(X_fit)
+    imputer = FeatureImputer(X.columns, imputation)
+    
+    def impute(frame):
+        values = frame.to_numpy(dtype=np.float64, copy=True)
+        imputer.transform(values)
+        return pd.DataFrame(values, columns=frame.columns, index=frame.index)
+    
+    X, X_fit, X_calib, X_test = impute(X), impute(X_fit), impute(X_calib), impute(X_test)
     
     # Inicializa o modelo
     rf_model = RandomForestClassifier(
@@ -56,7 +84,10 @@ def train_random_forest(X, y):
     )
     
     # Treina o modelo
-    rf_model.fit(X_train, y_train)
+    rf_model.fit(X_fit, y_fit)
+    
+    # Calibração isotônica nos dados separados, avaliada no teste
+    calibration = fit_calibration(y_calib.values, rf_model.predict_proba(X_calib)[:, 1])
     
     # Faz predições
     y_pred = rf_model.predict(X_test)
@@ -66,8 +97,15 @@ def train_random_forest(X, y):
     accuracy = accuracy_score(y_test, y_pred)
     print(f"Acurácia: {accuracy:.4f}")
     
-    # Cross-validation
-    cv_scores = cross_val_score(rf_model, X, y, cv=5)
+    y_pred_calibrated = np.interp(y_pred_proba, calibration["x"], calibration["y"])
+    calibration["metrics"] = {
+        "raw": calibration_metrics(y_test.values, y_pred_proba),
+        "calibrated": calibration_metrics(y_test.values, y_pred_calibrated)
+    }
+    print(f"Calibração (teste): {calibration['metrics']}")
+    
+    # Cross-validation sobre os mesmos folds de paciente
+    cv_scores = cross_val_score(rf_model, X, y, cv=PredefinedSplit(np.asarray(folds)))
     print(f"Cross-validation scores: {cv_scores}")
     print(f"CV média: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
     
@@ -86,9 +124,30 @@ def train_random_forest(X, y):
     print("\nFeature Importance:")
     print(feature_importance)
     
-    return rf_model, X.columns.tolist()
+    return rf_model, X.columns.tolist(), calibration, imputation
+
+def build_drift_reference(model, feature_names, calibration, imputation, X):
+    """
+    Distribuições de referência para o monitor de drift (GET /monitoring/drift)
+    
+    Usa DRIFT_REFERENCE_DATA quando disponível; senão, os dados de treino X
+    (antes da imputação). As probabilidades são calculadas como na inferência:
+    imputação seguida da calibração.
+    """
+    # O CSV versionado pode ser apenas um placeholder vazio
+    if os.path.exists(DRIFT_REFERENCE_DATA) and os.path.getsize(DRIFT_REFERENCE_DATA) > 2:
+        values, source = reference_frame(DRIFT_REFERENCE_DATA, feature_names), DRIFT_REFERENCE_DATA
+    else:
+        values, source = X[feature_names].to_numpy(dtype=np.float64), TRAINING_DATA
+    
+    X_model = values.copy()
+    FeatureImputer(feature_names, imputation).transform(X_model)
+    probabilities = model.predict_proba(pd.DataFrame(X_model, columns=feature_names))[:, 1]
+    if calibration is not None:
+        probabilities = np.interp(probabilities, calibration["x"], calibration["y"])
+    return build_reference(values, feature_names, probabilities, source)
 
-def save_model(model, feature_names):
+def save_model(model, feature_names, calibration=None, imputation=None, drift_reference=None):
 
     print("Salvando modelo...")
     
@@ -100,23 +159,41 @@ def save_model(model, feature_names):
 
     feature_info = {
         'feature_names': feature_names,
-        'feature_importance': dict(zip(feature_names, model.feature_importances_))
+        'feature_importance': dict(zip(feature_names, model.feature_importances_)),
+        # Medianas por unidade usadas para imputar features ausentes na inferência
+        'imputation': imputation
     }
     joblib.dump(feature_info, 'ml/feature_info.joblib')
     
+    # Tabelas por nó usadas pelo endpoint /predict/explain
+    save_tables(build_tables(model), 'ml/explainer.joblib')
+    
+    # Tabela de interpolação da calibração isotônica
+    if calibration is not None:
+        joblib.dump(calibration, 'ml/calibration.joblib')
+        print("Calibração salva em 'ml/calibration.joblib'")
+    
+    # Distribuições de referência do monitor de drift
+    if drift_reference is not None:
+        save_reference(drift_reference, 'ml/drift_reference.joblib')
+        print("Referência de drift salva em 'ml/drift_reference.joblib'")
+    
     print("Modelo salvo em 'ml/model.joblib'")
     print("Informações das features salvas em 'ml/feature_info.joblib'")
+    print("Tabelas de explicação salvas em 'ml/explainer.joblib'")
 
 def main():
     print("=== TREINAMENTO DO MODELO DE DETECÇÃO DE SEPSE ===\n")
     
     try:
 
-        X, y = load_and_preprocess_data() 
+        X, y, folds = load_and_preprocess_data(sys.argv[1] if len(sys.argv) > 1 else TRAINING_DATA)
 
-        model, feature_names = train_random_forest(X, y)
+        model, feature_names, calibration, imputation = train_random_forest(X, y, folds)
+        
+        drift_reference = build_drift_reference(model, feature_names, calibration, imputation, X)
         
-        save_model(model, feature_names)
+        save_model(model, feature_names, calibration, imputation, drift_reference)
         
         print("\n✅ Modelo treinado e salvo com sucesso!")
         print(f"Features utilizadas: {feature_names}")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compara JSON, Arrow IPC e MessagePack no /predict/batch.
+
+Roda a API no mesmo processo (TestClient, sem rede) e mede, para cada
+formato, o tempo de ponta a ponta (codificação no cliente, requisição,
+decodificação da resposta), o tamanho do payload e a diferença máxima
+entre as probabilidades retornadas e as do caminho JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASE_ROW = {
+    "hr": 95, "o2sat": 98, "temp": 37.2, "sbp": 120, "dbp": 80, "map": 93, "resp": 18,
+    "age": 45, "gender": 1, "unit1": 1, "unit2": 0, "hosp_adm_time": 24, "iculos": 48
+}
+
+def make_columns(n_rows: int, seed: int = 42):
+    """Lote sintético válido, em colunas"""
+    rng = np.random.default_rng(seed)
+    sbp = rng.integers(90, 160, n_rows).astype(np.float64)
+    dbp = rng.integers(50, 95, n_rows).astype(np.float64)
+    columns = {name: np.full(n_rows, value, dtype=np.float64) for name, value in BASE_ROW.items()}
+    columns.update({
+        "hr": rng.integers(50, 150, n_rows).astype(np.float64),
+        "o2sat": rng.integers(88, 100, n_rows).astype(np.float64),
+        "temp": np.round(rng.uniform(35.5, 40.5, n_rows), 1),
+        "sbp": sbp,
+        "dbp": dbp,
+        "map": np.round((sbp + 2 * dbp) / 3),
+        "resp": rng.integers(12, 32, n_rows).astype(np.float64),
+        "age": rng.integers(18, 95, n_rows).astype(np.float64),
+        "iculos": rng.integers(1, 300, n_rows).astype(np.float64),
+    })
+    return columns
+
+def json_roundtrip(client, columns, n_rows):
+    rows = [{name: float(values[i]) for name, values in columns.items()} for i in range(n_rows)]
+    body = json.dumps({"patients": rows}).encode()
+    response = client.post("/predict/batch", content=body, headers={"content-type": "application/json"})
+    response.raise_for_status()
+    return np.asarray(response.json()["predictions"]), len(body)
+
+def arrow_roundtrip(client, columns, n_rows):
+    import pyarrow as pa
+
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    body = sink.getvalue().to_pybytes()
+
+    media_type = "application/vnd.apache.arrow.stream"
+    response = client.post("/predict/batch", content=body,
+                           headers={"content-type": media_type, "accept": media_type})
+    response.raise_for_status()
+    result = pa.ipc.open_stream(response.content).read_all()
+    return result.column("prediction").to_numpy(), len(body)
+
+def msgpack_roundtrip(client, columns, n_rows):
+    import msgpack
+
+    body = msgpack.packb({
+        "columns": {name: values.astype("<f8").tobytes() for name, values in columns.items()},
+        "dtypes": {name: "<f8" for name in columns}
+    })
+    media_type = "application/x-msgpack"
+    response = client.post("/predict/batch", content=body,
+                           headers={"content-type": media_type, "accept": media_type})
+    response.raise_for_status()
+    result = msgpack.unpackb(response.content)
+    return np.frombuffer(result["columns"]["prediction"], dtype=result["dtypes"]["prediction"]), len(body)
+
+FORMATS = {"json": json_roundtrip, "arrow": arrow_roundtrip, "msgpack": msgpack_roundtrip}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000, help="Pacientes por lote")
+    parser.add_argument("--repeat", type=int, default=10, help="Repetições por formato")
+    args = parser.parse_args()
+
+    # Isola a medição dos limites de uso da API
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("MODEL_LOAD_MODE", "eager")
+    os.environ.setdefault("MAX_BATCH_SIZE", str(args.rows))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("TRACE_EXPORTER", "none")
+
+    from fastapi.testclient import TestClient
+    from api.main import app
+
+    columns = make_columns(args.rows)
+    print(f"📦 Lote de {args.rows} pacientes, {args.repeat} repetições por formato")
+
+    with TestClient(app) as client:
+        reference = None
+        for name, roundtrip in FORMATS.items():
+            try:
+                roundtrip(client, columns, args.rows)  # aquecimento
+            except ImportError as e:
+                print(f"   {name:8s} indisponível ({e})")
+                continue
+
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                predictions, size = roundtrip(client, columns, args.rows)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            if reference is None:
+                reference = predictions
+            max_diff = float(np.max(np.abs(predictions - reference)))
+            median = statistics.median(timings)
+            print(f"   {name:8s} {median:8.1f} ms (mediana)  {median * 1000 / args.rows:6.1f} µs/linha"
+                  f"  payload {size / 1024:8.1f} KiB  dif. máx. {max_diff:.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Compara a latência do gRPC com a do REST (FastAPI) para predições unitárias.
+
+Sobe os dois servidores no mesmo processo, em portas locais efêmeras,
+compartilhando o modelo carregado, e mede com clientes síncronos:
+
+- REST   POST /predict (conexão keep-alive)
+- gRPC   Predict (unário)
+- gRPC   PredictStream (uma mensagem por vez, esperando cada resposta)
+- gRPC   PredictStream (vazão com todas as mensagens enviadas de uma vez)
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE = {
+    "hr": 95, "o2sat": 98, "temp": 37.2, "sbp": 120, "dbp": 80, "map": 93, "resp": 18,
+    "age": 45, "gender": 1, "unit1": 1, "unit2": 0, "hosp_adm_time": 24, "iculos": 48
+}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def summarize(name: str, timings_ms):
+    timings_ms = sorted(timings_ms)
+    p95 = timings_ms[int(len(timings_ms) * 0.95) - 1]
+    print(f"   {name:28s} p50 {statistics.median(timings_ms):6.2f} ms   p95 {p95:6.2f} ms")
+
+def bench_rest(port: int, n: int):
+    import httpx
+
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            client.post("/predict", json=SAMPLE).raise_for_status()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def bench_grpc(port: int, n: int):
+    import grpc
+    import queue
+    from api.rpc import sepsis_pb2, sepsis_pb2_grpc
+
+    results = {}
+    with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+        stub = sepsis_pb2_grpc.SepsisPredictorStub(channel)
+        request = sepsis_pb2.PredictRequest(**SAMPLE)
+
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            stub.Predict(request)
+            timings.append((time.perf_counter() - start) * 1000)
+        results["gRPC Predict"] = timings
+
+        # Ping-pong no fluxo: envia uma mensagem e espera a resposta
+        outgoing: "queue.Queue" = queue.Queue()
+        responses = stub.PredictStream(iter(outgoing.get, None))
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            outgoing.put(request)
+            next(responses)
+            timings.append((time.perf_counter() - start) * 1000)
+        outgoing.put(None)
+        results["gRPC PredictStream (1 a 1)"] = timings
+
+        start = time.perf_counter()
+        count = sum(1 for _ in stub.PredictStream(iter([request] * n)))
+        elapsed = time.perf_counter() - start
+        results["stream_throughput"] = count / elapsed
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500, help="Requisições por cenário")
+    args = parser.parse_args()
+
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("MODEL_LOAD_MODE", "eager")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("TRACE_EXPORTER", "none")
+
+    import uvicorn
+    from api.main import app
+    from api.rpc.server import create_server
+    from api.services.sepsis_service import sepsis_service
+
+    sepsis_service.load_model()
+
+    rest_port = free_port()
+    rest_server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=rest_port, log_level="warning"))
+    threading.Thread(target=rest_server.run, daemon=True).start()
+    while not rest_server.started:
+        time.sleep(0.05)
+
+    async def run():
+        server, grpc_port = await create_server("127.0.0.1:0")
+        loop = asyncio.get_running_loop()
+        # Aquecimento dos dois caminhos
+        await loop.run_in_executor(None, bench_rest, rest_port, 20)
+        await loop.run_in_executor(None, bench_grpc, grpc_port, 20)
+
+        rest = await loop.run_in_executor(None, bench_rest, rest_port, args.requests)
+        grpc_results = await loop.run_in_executor(None, bench_grpc, grpc_port, args.requests)
+        await server.stop(None)
+        return rest, grpc_results
+
+    rest, grpc_results = asyncio.run(run())
+    rest_server.should_exit = True
+
+    print(f"📡 {args.requests} predições sequenciais por cenário")
+    summarize("REST POST /predict", rest)
+    summarize("gRPC Predict", grpc_results["gRPC Predict"])
+    summarize("gRPC PredictStream (1 a 1)", grpc_results["gRPC PredictStream (1 a 1)"])
+    print(f"   {'gRPC PredictStream (vazão)':28s} {grpc_results['stream_throughput']:8.0f} predições/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Mede o tempo de importação da API (python -X importtime) para uso no CI.
+
+Falha se o tempo total ultrapassar o limite ou se módulos pesados
+(pandas, sklearn, joblib) forem importados junto com api.main.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Módulos que não devem ser importados antes do carregamento do modelo. O numpy é
+# permitido: a validação (ml.limits), a imputação e as faixas de risco usadas pela
+# API já dependem dele, e ele custa pouco perto destes (~150 ms contra ~1,2 s)
+HEAVY_MODULES = ["pandas", "sklearn", "joblib"]
+
+def measure(module: str):
+    """Executa a importação em um processo limpo e retorna (total_us, [(us, módulo)])"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    check = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=root, capture_output=True, text=True, check=True
+    )
+    
+    entries = []
+    for line in result.stderr.splitlines():
+        # Formato: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative), name.rstrip()[1:]))
+    
+    total_us = sum(us for us, name in entries if not name.startswith(" "))
+    heavy = [m for m in result.stdout.strip().split(",") if m]
+    return total_us, entries, heavy
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="api.main", help="Módulo a importar")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ.get("IMPORT_BUDGET_MS", 1500)),
+                        help="Tempo máximo de importação (ms)")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de módulos listados")
+    args = parser.parse_args()
+    
+    total_us, entries, heavy = measure(args.module)
+    total_ms = total_us / 1000
+    
+    print(f"⏱️ Importação de {args.module}: {total_ms:.1f} ms (limite {args.budget_ms:.0f} ms)")
+    for us, name in sorted(entries, reverse=True)[:args.top]:
+        print(f"   {us / 1000:8.1f} ms  {name.strip()}")
+    
+    ok = True
+    if heavy:
+        print(f"❌ Módulos pesados importados: {', '.join(heavy)}")
+        ok = False
+    if total_ms > args.budget_ms:
+        print("❌ Tempo de importação acima do limite")
+        ok = False
+    
+    if ok:
+        print("✅ Tempo de importação dentro do limite")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
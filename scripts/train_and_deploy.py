@@ -93,15 +93,19 @@ def test_api():
     time.sleep(5)
     
     try:
-        # Testa endpoint de saúde
+        # Testa endpoint de saúde (o modelo é carregado em segundo plano)
         import requests
-        response = requests.get("http://localhost:8000/health", timeout=10)
+        for _ in range(30):
+            response = requests.get("http://localhost:8000/health", timeout=10)
+            if response.json().get("status") != "loading":
+                break
+            time.sleep(1)
         
         if response.status_code == 200:
             print("✅ API funcionando corretamente")
             health_data = response.json()
             print(f"Status: {health_data.get('status')}")
-            print(f"Modelo carregado: {health_data.get('model_loaded')}")
+            print(f"Modelo carregado: {health_data.get('ml_model_loaded')}")
         else:
             print(f"❌ API retornou status {response.status_code}")
             return False
@@ -79,6 +79,14 @@ setup(
             "docker>=6.0.0",
             "docker-compose>=1.29.0",
         ],
+        "columnar": [
+            "pyarrow>=14.0.0",
+            "msgpack>=1.0.0",
+        ],
+        "grpc": [
+            "grpcio>=1.62.0",
+            "protobuf>=4.21.6,<5",
+        ],
     },
     
     # Scripts de linha de comando
@@ -86,6 +94,7 @@ setup(
         "console_scripts": [
             "sepsis-train=ml.train_model:main",
             "sepsis-api=api.main:main",
+            "sepsis-grpc=api.rpc.server:main",
             "sepsis-frontend=frontend.app:main",
         ],
     },
@@ -0,0 +1,66 @@
+"""
+Testes do controle de admissão (identificação do cliente e vagas de inferência)
+"""
+import asyncio
+
+import pytest
+
+from api.services import admission
+from api.services.admission import (
+    InferenceLimiter, InMemoryRateLimiter, AdmissionRejected, PRIORITY_ALERT, PRIORITY_BATCH, identify_client
+)
+
+@pytest.fixture
+def behind_proxy(monkeypatch):
+    monkeypatch.setattr(admission, "TRUST_FORWARDED_FOR", True)
+    monkeypatch.setattr(admission, "TRUSTED_PROXY_HOPS", 1)
+
+@pytest.mark.unit
+def test_forwarded_for_uses_entry_appended_by_proxy(behind_proxy):
+    # O proxy acrescenta o IP real à direita do que o cliente enviou
+    client_id, _ = identify_client({"x-forwarded-for": "1.2.3.4, 203.0.113.7"}, "10.0.0.1")
+    assert client_id == "ip:203.0.113.7"
+
+@pytest.mark.unit
+def test_forwarded_for_respects_proxy_hops(behind_proxy, monkeypatch):
+    monkeypatch.setattr(admission, "TRUSTED_PROXY_HOPS", 2)
+    client_id, _ = identify_client({"x-forwarded-for": "1.2.3.4, 203.0.113.7, 10.0.0.2"}, "10.0.0.1")
+    assert client_id == "ip:203.0.113.7"
+
+@pytest.mark.unit
+def test_spoofed_forwarded_for_does_not_renew_bucket(behind_proxy):
+    limiter = InMemoryRateLimiter(rate=0.001, burst=2)
+
+    async def attempts():
+        results = []
+        for i in range(5):
+            headers = {"x-forwarded-for": f"198.51.100.{i}, 203.0.113.7"}
+            client_id, _ = identify_client(headers, "10.0.0.1")
+            allowed, _ = await limiter.acquire(client_id)
+            results.append(allowed)
+        return results
+
+    assert asyncio.run(attempts()) == [True, True, False, False, False]
+    assert list(limiter._buckets) == ["ip:203.0.113.7"]
+
+@pytest.mark.unit
+def test_timeout_on_evicted_waiter_keeps_counters(monkeypatch):
+    """Timeout no mesmo instante em que a espera é recusada não devolve uma vaga nunca ocupada"""
+    limiter = InferenceLimiter(max_concurrent=1, max_batch=1, queue_size=1, timeout=0.05)
+
+    async def evicted_then_timeout(awaitable, timeout):
+        # A espera batch é recusada por _evict_lower e o timeout dispara no mesmo tick
+        assert limiter._evict_lower(PRIORITY_ALERT)
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        async with limiter.slot(PRIORITY_ALERT):
+            monkeypatch.setattr(admission.asyncio, "wait_for", evicted_then_timeout)
+            with pytest.raises(AdmissionRejected):
+                async with limiter.slot(PRIORITY_BATCH):
+                    pass
+            monkeypatch.undo()
+            assert limiter.active == 1 and limiter.active_batch == 0
+        assert limiter.active == 0 and limiter.active_batch == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,47 @@
+"""
+Testes da decodificação de lotes colunares (patient_id no MessagePack e no Arrow)
+"""
+import pytest
+
+# Extra "columnar" (pip install .[columnar])
+msgpack = pytest.importorskip("msgpack")
+pa = pytest.importorskip("pyarrow")
+
+from api.services.columnar import PayloadError, decode_batch, FORMAT_ARROW, FORMAT_MSGPACK
+
+def msgpack_body(patient_ids):
+    return msgpack.packb({"columns": {"hr": [90.0, 110.0], "patient_id": patient_ids}})
+
+def arrow_body(patient_ids):
+    table = pa.table({"hr": [90.0, 110.0], "patient_id": patient_ids})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+@pytest.mark.unit
+def test_msgpack_patient_ids_accept_text_and_null():
+    batch = decode_batch(msgpack_body(["p1", None]), FORMAT_MSGPACK)
+    assert batch.patient_ids == ["p1", None]
+
+@pytest.mark.unit
+@pytest.mark.parametrize("patient_ids", [[1, 2], ["p1", 2], ["p1", b"p2"], ["p1", ["p2"]]])
+def test_msgpack_non_text_patient_ids_are_payload_errors(patient_ids):
+    with pytest.raises(PayloadError) as error:
+        decode_batch(msgpack_body(patient_ids), FORMAT_MSGPACK)
+    assert error.value.errors and error.value.errors[0]["field"] == "patient_id"
+
+@pytest.mark.unit
+@pytest.mark.parametrize("patient_ids", [12, "p1", {"0": "p1"}])
+def test_msgpack_patient_id_column_must_be_a_list(patient_ids):
+    with pytest.raises(PayloadError):
+        decode_batch(msgpack_body(patient_ids), FORMAT_MSGPACK)
+
+@pytest.mark.unit
+def test_arrow_patient_ids_are_cast_to_text():
+    assert decode_batch(arrow_body([1, None]), FORMAT_ARROW).patient_ids == ["1", None]
+
+@pytest.mark.unit
+def test_arrow_patient_ids_that_cannot_be_text_are_payload_errors():
+    with pytest.raises(PayloadError):
+        decode_batch(arrow_body([[1], [2]]), FORMAT_ARROW)
@@ -0,0 +1,55 @@
+"""
+Testes dos folds estratificados e da agregação por paciente em lotes
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.features import (
+    HOURLY_FEATURES, LABEL, FOLD, build_feature_store, build_features, iter_patient_groups, patient_folds
+)
+
+def hourly_frame(n_patients=500, seed=0):
+    rng = np.random.default_rng(seed)
+    hours = rng.integers(1, 6, n_patients)
+    ids = np.repeat([f"p{i:05d}" for i in range(n_patients)], hours)
+    frame = pd.DataFrame(rng.normal(80, 10, (len(ids), len(HOURLY_FEATURES))), columns=HOURLY_FEATURES)
+    frame.insert(0, "Patient_ID", ids)
+    septic = rng.random(n_patients) < 0.07
+    frame[LABEL] = np.repeat(septic, hours).astype(int)
+    return frame
+
+@pytest.mark.unit
+def test_folds_are_stratified_and_deterministic():
+    labels = (np.random.default_rng(1).random(6604) < 0.075).astype(int)
+    ids = [f"p{i}" for i in range(len(labels))]
+    folds = patient_folds(ids, 5, labels)
+
+    for label in (0, 1):
+        per_fold = np.bincount(folds[labels == label], minlength=5)
+        assert per_fold.max() - per_fold.min() <= 1
+    assert np.array_equal(folds, patient_folds(list(reversed(ids)), 5, labels[::-1])[::-1])
+
+@pytest.mark.unit
+@pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+def test_feature_store_matches_in_memory_table(tmp_path, suffix):
+    hourly = hourly_frame()
+    source = tmp_path / f"hourly{suffix}"
+    hourly.to_parquet(source) if suffix == ".parquet" else hourly.to_csv(source, index=False)
+    output = tmp_path / f"features{suffix}"
+
+    stats = build_feature_store(str(source), str(output), batch_rows=97)
+    stored = pd.read_parquet(output) if suffix == ".parquet" else pd.read_csv(output)
+    expected = build_features(hourly)
+
+    assert stats["patients"] == len(expected) == len(stored)
+    assert np.array_equal(stored[FOLD].to_numpy(), expected[FOLD].to_numpy())
+    assert np.allclose(stored["HR_mean"], expected["HR_mean"])
+    assert not list(tmp_path.glob("*.partial.*"))
+
+@pytest.mark.unit
+def test_patient_split_across_non_adjacent_batches_is_rejected():
+    frame = pd.DataFrame({"ID": [1, 1, 2, 2, 3, 3, 1, 1]})
+    batches = [frame.iloc[:4], frame.iloc[4:6], frame.iloc[6:]]
+    with pytest.raises(ValueError):
+        list(iter_patient_groups(iter(batches), "ID"))
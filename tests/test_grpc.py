@@ -0,0 +1,102 @@
+"""
+Testes do servidor gRPC em um servidor local no próprio processo (start_local_server)
+"""
+import asyncio
+
+import pytest
+
+# Extra "grpc" (pip install .[grpc])
+grpc = pytest.importorskip("grpc")
+
+from api.rpc import sepsis_pb2, sepsis_pb2_grpc
+from api.rpc import server as rpc_server
+from api.rpc.server import start_local_server
+from api.services.sepsis_service import sepsis_service
+from ml.risk import RISK_LEVELS
+
+SAMPLE = {
+    "hr": 95, "o2sat": 98, "temp": 37.2, "sbp": 120, "dbp": 80, "map": 93, "resp": 18,
+    "age": 45, "gender": 1, "unit1": 1, "unit2": 0, "hosp_adm_time": 24, "iculos": 48
+}
+
+@pytest.fixture(scope="module", autouse=True)
+def model():
+    if not sepsis_service.load_model():
+        pytest.skip("Artefatos do modelo indisponíveis")
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    # O rate limiter é global: os testes não devem depender dos tokens restantes
+    monkeypatch.setattr(rpc_server, "RATE_LIMIT_ENABLED", False)
+
+def run_with_stub(scenario):
+    """Sobe o servidor local, executa scenario(stub) e encerra servidor e canal"""
+    async def main():
+        server, channel = await start_local_server()
+        try:
+            return await scenario(sepsis_pb2_grpc.SepsisPredictorStub(channel))
+        finally:
+            await channel.close()
+            await server.stop(None)
+
+    return asyncio.run(main())
+
+@pytest.mark.integration
+def test_unary_predict():
+    async def scenario(stub):
+        return await stub.Predict(sepsis_pb2.PredictRequest(request_id="r1", **SAMPLE))
+
+    response = run_with_stub(scenario)
+
+    assert response.request_id == "r1"
+    assert 0.0 <= response.prediction <= 1.0
+    assert response.risk_level == RISK_LEVELS[response.risk_code]
+    assert not response.error
+
+@pytest.mark.integration
+def test_unary_invalid_request_aborts_with_status():
+    async def scenario(stub):
+        with pytest.raises(grpc.aio.AioRpcError) as error:
+            await stub.Predict(sepsis_pb2.PredictRequest(request_id="bad", **dict(SAMPLE, hr=500)))
+        return error.value.code()
+
+    assert run_with_stub(scenario) == grpc.StatusCode.INVALID_ARGUMENT
+
+@pytest.mark.integration
+def test_stream_answers_in_order_and_keeps_going_after_bad_message():
+    requests = [sepsis_pb2.PredictRequest(request_id=f"r{i}", **SAMPLE) for i in range(5)]
+    requests[2] = sepsis_pb2.PredictRequest(request_id="r2", **dict(SAMPLE, hr=500))
+
+    async def scenario(stub):
+        call = stub.PredictStream()
+        responses = []
+        # Uma mensagem por vez: a inválida não pode encerrar o fluxo
+        for request in requests:
+            await call.write(request)
+            responses.append(await call.read())
+        await call.done_writing()
+        assert await call.read() == grpc.aio.EOF
+        assert await call.code() == grpc.StatusCode.OK
+        return responses
+
+    responses = run_with_stub(scenario)
+
+    assert [response.request_id for response in responses] == [f"r{i}" for i in range(5)]
+    bad = responses[2]
+    assert bad.error and bad.error_code == grpc.StatusCode.INVALID_ARGUMENT.value[0]
+    for response in responses[:2] + responses[3:]:
+        assert not response.error and 0.0 <= response.prediction <= 1.0
+
+@pytest.mark.integration
+def test_stream_micro_batch_matches_unary():
+    requests = [sepsis_pb2.PredictRequest(request_id=f"r{i}", **dict(SAMPLE, hr=80 + i)) for i in range(20)]
+
+    async def scenario(stub):
+        streamed = [response async for response in stub.PredictStream(iter(requests))]
+        unary = [await stub.Predict(request) for request in requests]
+        return streamed, unary
+
+    streamed, unary = run_with_stub(scenario)
+
+    assert [response.request_id for response in streamed] == [request.request_id for request in requests]
+    assert [response.prediction for response in streamed] == pytest.approx([response.prediction for response in unary])
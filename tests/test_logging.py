@@ -0,0 +1,34 @@
+"""
+Testes das estatísticas de logs (rate limit e endpoint de administração)
+"""
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import main
+from api.services.log import RateLimitFilter
+
+def record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+@pytest.mark.unit
+def test_rate_limit_filter_counts_suppressed_records():
+    rate_filter = RateLimitFilter(limit=3, window=60)
+    passed = [rate_filter.filter(record("repetida")) for _ in range(10)]
+
+    assert passed.count(True) == 3
+    assert rate_filter.suppressed == 7
+
+@pytest.mark.unit
+def test_logging_stats_endpoint_requires_admin_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    client = TestClient(main.app)
+
+    assert client.get("/admin/logging").status_code == 403
+    response = client.get("/admin/logging", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats.keys() == main.get_logging_stats().keys()
+    if stats["enabled"]:
+        assert stats["dropped"] >= 0 and stats["suppressed"] >= 0
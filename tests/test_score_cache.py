@@ -0,0 +1,80 @@
+"""
+O cache de scores por faixas de limiares deve reproduzir o modelo bit a bit
+"""
+import os
+
+import numpy as np
+import pytest
+
+from ml.predict import SepsisPredictor
+
+ML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ml")
+
+@pytest.fixture(scope="module")
+def predictors():
+    if not os.path.exists(os.path.join(ML_DIR, "model.joblib")):
+        pytest.skip("Artefatos do modelo indisponíveis")
+    plain = SepsisPredictor.from_directory(ML_DIR)
+    cached = SepsisPredictor.from_directory(ML_DIR)
+    cached.enable_score_cache(max_size=1000)
+    return plain, cached
+
+def random_rows(predictor, n, seed=0):
+    """Linhas em torno das medianas de imputação, com ruído e valores repetidos"""
+    rng = np.random.default_rng(seed)
+    X = np.full((n, len(predictor.input_keys)), np.nan)
+    predictor.impute(X)
+    scale = np.maximum(np.abs(X[0]) * 0.2, 1.0)
+    X = X + rng.normal(0, 1, X.shape) * scale
+    return np.round(X, 1)
+
+def threshold_rows(predictor, per_feature=40, seed=1):
+    """Linhas com uma feature exatamente no limiar e nos float32 vizinhos"""
+    rng = np.random.default_rng(seed)
+    base = random_rows(predictor, 1, seed)[0]
+    rows = []
+    for j, thresholds in enumerate(predictor.score_cache.thresholds):
+        for t in rng.choice(thresholds, min(per_feature, len(thresholds)), replace=False):
+            t32 = np.float32(t)
+            for value in (t, t32, np.nextafter(t32, np.float32(-np.inf)), np.nextafter(t32, np.float32(np.inf))):
+                row = base.copy()
+                row[j] = value
+                rows.append(row)
+    return np.array(rows)
+
+def assert_same_scores(plain, cached, X):
+    expected = plain.predict_proba_matrix(X.copy())
+    # Duas passadas: a primeira preenche o cache, a segunda usa os scores guardados
+    for _ in range(2):
+        assert np.array_equal(cached.predict_proba_matrix(X.copy()), expected)
+
+@pytest.mark.unit
+def test_cache_matches_model_on_random_rows(predictors):
+    plain, cached = predictors
+    assert_same_scores(plain, cached, random_rows(plain, 2000))
+    assert cached.score_cache.hits > 0
+
+@pytest.mark.unit
+def test_cache_matches_model_on_threshold_rows(predictors):
+    plain, cached = predictors
+    X = threshold_rows(cached)
+    assert_same_scores(plain, cached, X)
+
+    # Mesma faixa => mesmo score, em qualquer ordem de chegada ao cache
+    shuffled = np.random.default_rng(2).permutation(len(X))
+    assert np.array_equal(cached.predict_proba_matrix(X[shuffled]), plain.predict_proba_matrix(X)[shuffled])
+
+@pytest.mark.unit
+def test_cache_does_not_answer_non_finite_rows(predictors):
+    plain, cached = predictors
+    X = random_rows(plain, 3)
+    # Acima do maior limiar a linha cai na última faixa, a mesma em que o searchsorted põe NaN
+    X[1, 0] = cached.score_cache.thresholds[0][-1] + 1
+    cached.predict_proba_matrix(X.copy())
+    X[1, 0] = np.nan
+
+    # Sem faixa para NaN, a linha vai ao modelo (que a recusa) em vez de herdar um score do cache
+    with pytest.raises(ValueError):
+        plain.predict_proba_matrix(X.copy())
+    with pytest.raises(ValueError):
+        cached.predict_proba_matrix(X.copy())
@@ -0,0 +1,46 @@
+"""
+Testes do header traceparent no middleware de tracing
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.services.tracing import tracer, InMemorySpanExporter, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+@pytest.fixture
+def client(monkeypatch):
+    # Exportador em memória com amostragem total, para o traceparent ser sempre lido
+    monkeypatch.setattr(tracer, "exporter", InMemorySpanExporter())
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    return TestClient(app)
+
+@pytest.mark.unit
+@pytest.mark.parametrize("header", [
+    "garbage",
+    "00-abc",
+    "00-abc-def",
+    f"00-{TRACE_ID}-short-01",
+    f"00-{TRACE_ID[:-1]}z-{PARENT_ID}-01",
+    f"00-{'0' * 32}-{PARENT_ID}-01",
+    "---",
+])
+def test_malformed_traceparent_starts_new_trace(client, header):
+    response = client.get("/", headers={"traceparent": header})
+
+    assert response.status_code == 200
+    assert parse_traceparent(header) is None
+    spans = tracer.exporter.get_spans()
+    assert spans and spans[-1]["parent_span_id"] is None
+    assert spans[-1]["trace_id"] != TRACE_ID
+
+@pytest.mark.unit
+def test_valid_traceparent_continues_trace(client):
+    response = client.get("/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    assert response.status_code == 200
+    span = tracer.exporter.get_spans()[-1]
+    assert span["trace_id"] == TRACE_ID
+    assert span["parent_span_id"] == PARENT_ID
@@ -0,0 +1,77 @@
+"""
+Testes do índice por unidade (heap indexado, top-K e descarte LRU)
+"""
+import random
+
+import pytest
+
+from api.services.ward_index import WardIndex, WARDS, WARD_ALL, WARD_UNIT1, WARD_UNIT2, WARD_OTHER
+
+UNITS = [WARD_UNIT1, WARD_UNIT2, WARD_OTHER]
+
+def expected_top(latest, ward, k):
+    scores = [(patient_id, record["prediction"]) for patient_id, record in latest.items()
+              if ward == WARD_ALL or record["ward"] == ward]
+    return sorted(scores, key=lambda item: -item[1])[:k]
+
+def assert_matches(index, latest):
+    for ward in WARDS:
+        for k in (1, 5, 50, len(latest) + 1):
+            top = index.get_top(ward, k)
+            expected = expected_top(latest, ward, k)
+            # Empates podem sair em qualquer ordem: compara os scores na ordem e os IDs como conjunto
+            assert [patient["prediction"] for patient in top["patients"]] == \
+                [round(score, 4) for _, score in expected]
+            if k > len(latest):
+                assert {patient["patient_id"] for patient in top["patients"]} == \
+                    {patient_id for patient_id, _ in expected}
+            assert top["total_patients"] == sum(1 for record in latest.values()
+                                                if ward == WARD_ALL or record["ward"] == ward)
+        heap = index._heaps[ward]
+        for i in range(1, len(heap)):
+            assert heap.scores[(i - 1) // 2] >= heap.scores[i]
+        assert all(heap.keys[position] == key for key, position in heap.positions.items())
+
+@pytest.mark.unit
+def test_top_k_matches_sorted_after_random_updates():
+    rng = random.Random(0)
+    index = WardIndex(max_patients=10000)
+    latest = {}
+    for step in range(3000):
+        patient_id = f"p{rng.randrange(300)}"
+        # Re-scores e mudanças de unidade para pacientes já vistos
+        ward = rng.choice(UNITS)
+        score = rng.random() if rng.random() < 0.8 else round(rng.random(), 1)
+        index.update(patient_id, ward, score, "low", str(step))
+        latest[patient_id] = {"ward": ward, "prediction": score}
+        if rng.random() < 0.05:
+            removed = rng.choice(list(latest))
+            index.remove(removed)
+            del latest[removed]
+        if step % 500 == 0:
+            assert_matches(index, latest)
+    assert_matches(index, latest)
+
+@pytest.mark.unit
+def test_eviction_past_max_patients_drops_least_recently_updated():
+    rng = random.Random(1)
+    index = WardIndex(max_patients=50)
+    latest = {}
+    for step in range(2000):
+        patient_id = f"p{rng.randrange(200)}"
+        ward = rng.choice(UNITS)
+        score = rng.random()
+        index.update(patient_id, ward, score, "low", str(step))
+        latest.pop(patient_id, None)
+        latest[patient_id] = {"ward": ward, "prediction": score}
+        while len(latest) > 50:
+            del latest[next(iter(latest))]
+
+        assert list(index._latest) == list(latest)
+        if step % 200 == 0:
+            assert_matches(index, latest)
+
+    assert_matches(index, latest)
+    assert index.evictions > 0
+    assert len(index._heaps[WARD_ALL]) == 50
+    assert sum(len(index._heaps[ward]) for ward in UNITS) == 50